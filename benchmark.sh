@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+from __future__ import print_function, division
+import argparse
+import sys
+
+from ecosim import benchmark
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest='command')
+
+    run_parser = sub.add_parser('run', help='run the benchmarks and store the results')
+    run_parser.add_argument('out', help='Path of the results .json file.')
+    run_parser.add_argument('--configs', nargs='+', default=None,
+                            help='config files to step, default=examples/*.config')
+    run_parser.add_argument('--filter', default=None,
+                            help='only run benchmarks whose name contains this')
+    run_parser.add_argument('--warmup', type=int, default=50,
+                            help='steps before timing a simulation, default=50')
+    run_parser.add_argument('--steps', type=int, default=50,
+                            help='simulation steps timed, default=50')
+    run_parser.add_argument('--quick', action='store_true',
+                            help='only the smaller spatial index densities')
+    run_parser.add_argument('--no_memory', action='store_true',
+                            help='skip the tracemalloc pass for peak memory')
+
+    compare_parser = sub.add_parser('compare', help='compare two results files')
+    compare_parser.add_argument('old', help='Baseline results .json file.')
+    compare_parser.add_argument('new', help='New results .json file.')
+    compare_parser.add_argument('--threshold', type=float, default=.1,
+                                help='relative slowdown reported as a regression, default=.1')
+
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        configs = args.configs or benchmark.default_configs()
+        suite = benchmark.benchmarks(configs, args.warmup, args.steps, args.quick)
+        results = benchmark.run(suite, args.filter, not args.no_memory)
+        benchmark.save(results, args.out)
+
+    elif args.command == 'compare':
+        regressions = benchmark.compare(benchmark.load(args.old), \
+                                        benchmark.load(args.new), args.threshold)
+        if regressions:
+            print(len(regressions), 'regressions')
+            sys.exit(1)
+
+    else:
+        parser.print_help()
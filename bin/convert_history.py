@@ -0,0 +1,17 @@
+#!/usr/bin/env python
+from __future__ import print_function, division
+import argparse
+
+from ecosim.history import convert_to_delta
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Convert a HistoryFull archive to the delta encoded format.')
+    parser.add_argument('source', help='HistoryFull archive, directory or .npz.')
+    parser.add_argument('out', help='Path of the new archive directory.')
+    parser.add_argument('--quantum', type=float, default=1/256,
+                        help='radius resolution, default=1/256')
+    parser.add_argument('--flush_interval', type=int, default=100,
+                        help='steps per chunk, default=100')
+    args = parser.parse_args()
+
+    convert_to_delta(args.source, args.out, args.quantum, args.flush_interval)
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+""" Render frames of a HistoryFull (or delta) archive after the run, split
+    over a pool of processes that each take a contiguous range of steps.
+"""
+from __future__ import print_function, division
+import sys, os
+import argparse
+import multiprocessing
+from math import pi
+from os.path import join as pjoin
+import numpy as np
+sys.path.append(os.path.abspath('.'))
+
+from ecosim.history import open_history
+from ecosim.render import FrameArchive, rasterize, save_image
+
+def read_run_size(archive_path):
+    """ World (width, height) from the config.txt main writes next to the
+        archives.
+    """
+    config_path = pjoin(os.path.dirname(os.path.abspath(archive_path)), 'config.txt')
+    config = dict(line.rstrip('\n').split('\t', 1) for line in open(config_path))
+    return float(config['width']), float(config['height'])
+
+def render_range(args):
+    """ Pool worker, render the given steps.
+    """
+    archive_path, steps, out, region, scale, archive = args
+    history = open_history(archive_path)
+    x0, y0, x1, y1 = region
+    w, h = int((x1 - x0) * scale), int((y1 - y0) * scale)
+
+    # Genome id -> color, through the sorted ids of the genome table.
+    order = np.argsort(history.genome_ints[:, 0], kind='stable')
+    genome_ids = np.asarray(history.genome_ints[order, 0])
+    colors = np.asarray(history.genome_ints[order, 2:5], dtype='uint8')
+
+    sink = FrameArchive(out) if archive else None
+
+    for step in steps:
+        frame = history.frame(step)
+        index = np.searchsorted(genome_ids, frame.genome_ids)
+        radius = np.sqrt(np.asarray(frame.area, dtype='float64') / pi)
+        x = np.asarray(frame.x, dtype='float64') - x0
+        y = np.asarray(frame.y, dtype='float64') - y0
+
+        image = rasterize(w, h, x, y, radius, colors[index], scale=scale)
+
+        if sink is not None:
+            sink.write(image, step)
+        else:
+            save_image(image, pjoin(out, '%06d.jpg' % step))
+
+    if sink is not None:
+        sink.close()
+
+    return len(steps)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('archive_path', help='Path to a HistoryFull or delta archive.')
+    parser.add_argument('out', help='Directory for the frames.')
+    parser.add_argument('--scale', type=float, default=3.0,
+                        help='world to pixel scale, default=3')
+    parser.add_argument('--start', type=int, default=0, help='first step, default=0')
+    parser.add_argument('--stop', type=int, default=None, help='last step (exclusive), default=all')
+    parser.add_argument('--every', type=int, default=1,
+                        help='render every n\'th step, default=1')
+    parser.add_argument('--region', type=float, nargs=4, default=None,
+                        metavar=('X0', 'Y0', 'X1', 'Y1'),
+                        help='world region to render, default=whole world')
+    parser.add_argument('--size', type=float, nargs=2, default=None,
+                        metavar=('WIDTH', 'HEIGHT'),
+                        help='world size, default=read from config.txt beside the archive')
+    parser.add_argument('--archive', action='store_true',
+                        help='write chunked frame archives instead of jpgs')
+    parser.add_argument('--processes', type=int, default=None,
+                        help='number of worker processes, default=all cores')
+    args = parser.parse_args()
+
+    n_steps = len(open_history(args.archive_path))
+    steps = np.arange(args.start, n_steps if args.stop is None else args.stop, args.every)
+
+    region = args.region
+    if region is None:
+        width, height = args.size or read_run_size(args.archive_path)
+        region = (0, 0, width, height)
+
+    if not os.path.exists(args.out):
+        os.makedirs(args.out)
+
+    n_workers = args.processes or multiprocessing.cpu_count()
+    ranges = [r for r in np.array_split(steps, n_workers) if len(r)]
+    tasks = [(args.archive_path, r.tolist(), args.out, region, args.scale, args.archive) \
+             for r in ranges]
+
+    pool = multiprocessing.Pool(n_workers)
+    n_done = sum(pool.map(render_range, tasks))
+    pool.close()
+    pool.join()
+
+    print('Rendered %i frames to %s' % (n_done, args.out))
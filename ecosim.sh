@@ -1,14 +1,8 @@
 #!/usr/bin/env python
 from __future__ import print_function, division
-from os import path
 import argparse
 
-# 2/3 compatability
-try:
-    import ConfigParser as configparser
-except ImportError:
-    import configparser
-
+from ecosim.config import read_config
 from ecosim.main import main
 
 if __name__ == '__main__':
@@ -26,30 +20,31 @@ if __name__ == '__main__':
                         help='number of iterations between each archive, default=1000')
     parser.add_argument('--img_interval', type=int, default=100,
                         help='number of iterations between each image, default=100')
+    parser.add_argument('--checkpoint_interval', type=int, default=10000,
+                        help='number of iterations between each checkpoint, default=10000')
+    parser.add_argument('--resume', action='store_true',
+                        help='continue from the checkpoint in out, start a new run if out does not exist')
+    parser.add_argument('--video', action='store_true',
+                        help='encode images into one video (or frame archive if ffmpeg is missing) instead of jpgs')
+    parser.add_argument('--fps', type=int, default=30,
+                        help='video frame rate, default=30')
+    parser.add_argument('--frame_decimate', type=int, default=1,
+                        help='keep every n\'th image in the video, default=1')
+    parser.add_argument('--frame_downscale', type=int, default=1,
+                        help='shrink video frames by this factor, default=1')
+    parser.add_argument('--profile_csv', default=None,
+                        help='append the step profile of every log interval to this csv file')
+    parser.add_argument('--history', choices=['summary', 'full', 'delta'], default='summary',
+                        help='archive per genome totals, every individual, or every individual delta encoded, default=summary')
     args = parser.parse_args()
 
-    config = configparser.ConfigParser(allow_no_value=True)
-
-    if not path.exists(args.config):
-        raise ValueError('That is not a valid to a config file:'+args.config)
+    run_config = read_config(args.config)
 
-    config.read(args.config)
+    video = None
+    if args.video:
+        video = {'fps': args.fps, 'decimate': args.frame_decimate,
+                 'downscale': args.frame_downscale}
 
-    run_config = {
-        'width': config.getint('simulation', 'width'),
-        'height': config.getint('simulation', 'height'),
-        'n_start': config.getint('simulation', 'n_start'),
-        'p_death': config.getfloat('simulation', 'p_death'),
-        'n_randseed': config.getint('simulation', 'n_randseed'),
-        # 'bias_areas':  parse_bias_areas(config.get('simulation', 'bias_areas')),
-        'bias_map': config.get('simulation', 'bias_map'),
-        'p_disturbance': config.getfloat('simulation', 'p_disturbance'),
-        'disturbance_power': config.getfloat('simulation', 'disturbance_power'),
-        'seed_cost_multiplier': config.getfloat('simulation', 'seed_cost_multiplier'),
-        'growth_cost_multiplier': config.getfloat('simulation', 'growth_cost_multiplier'),
-        'n_attributes': config.getint('genome', 'n_attributes'),
-        'seed_size_range': (config.getfloat('genome', 'min_seed_size'),
-                            config.getfloat('genome', 'max_seed_size')),
-    }
     main(run_config, args.steps, args.out, args.log_interval, args.img_interval,\
-         args.draw_scale, args.archive_interval)
+         args.draw_scale, args.archive_interval, args.checkpoint_interval, \
+         args.resume, video, args.profile_csv, args.history)
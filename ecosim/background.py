@@ -0,0 +1,58 @@
+""" Writing files on a background thread so the simulation keeps stepping
+    while frames and archives are encoded and saved.
+"""
+from __future__ import print_function, division
+import threading
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+class BackgroundWriter(object):
+    """ Calls the submitted functions in order on a background thread.
+        submit() blocks while max_pending calls are waiting, so a slow disk
+        cannot exhaust memory. The first error stops the writer and is
+        raised by the next submit(), wait() or close().
+    """
+    def __init__(self, max_pending):
+        self.queue = queue.Queue(max_pending)
+        self.error = None
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                self.queue.task_done()
+                break
+
+            if self.error is None:
+                function, args = item
+                try:
+                    function(*args)
+                except Exception as e:
+                    self.error = e
+            self.queue.task_done()
+
+    def _check(self):
+        if self.error is not None:
+            raise self.error
+
+    def submit(self, function, *args):
+        self._check()
+        self.queue.put((function, args))
+
+    def wait(self):
+        """ Block until every submitted call has run.
+        """
+        self.queue.join()
+        self._check()
+
+    def close(self):
+        """ Run the pending calls and stop the thread.
+        """
+        self.queue.put(None)
+        self.thread.join()
+        self._check()
@@ -0,0 +1,284 @@
+""" Benchmarks of the simulation hot paths: spatial index operations,
+    individual updates and combat, whole steps of the example configs and
+    history logging. Results (rates and peak traced memory) are stored as
+    JSON so runs before and after a change can be compared.
+"""
+from __future__ import print_function, division
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from glob import glob
+from math import pi
+from os import path
+
+import numpy as np
+
+from .collisiongrid.collision_gridx import CollisionGrid
+from .collisiongrid.multi_gridx import MultiGrid
+from .config import read_config
+from .history import History, HistoryDelta, HistoryFull
+from .individual import Individual
+from .population import Population
+from .rng import RandomStream
+from .genomes import Genome
+from .simulation import Simulation
+
+################################################################################
+# Benchmarks. Each returns a list of (name, count, seconds, unit).
+
+def random_circles(n, size, distribution, seed=0):
+    rand = np.random.RandomState(seed)
+    xs = rand.random_sample(n) * size
+    ys = rand.random_sample(n) * size
+
+    if distribution == 'seeds':
+        rs = .5 + rand.random_sample(n)
+    elif distribution == 'mixed':
+        # Long tail of large individuals, as in a mature run.
+        rs = np.minimum(100, .6 * (rand.pareto(1.2, n) + 1))
+    else:
+        raise ValueError(distribution)
+
+    return xs, ys, rs
+
+def bench_index(cls, n, distribution, size=400):
+    xs, ys, rs = random_circles(n, size, distribution)
+    points = list(zip(range(n), xs.tolist(), ys.tolist(), rs.tolist()))
+    results = []
+    world = cls(size, size, 2)
+
+    start = time.perf_counter()
+    for id, x, y, r in points:
+        world.insertParticle(id, x, y, r)
+    results.append(('insert', n, time.perf_counter() - start, 'ops/s'))
+
+    start = time.perf_counter()
+    for id, x, y, r in points:
+        world.updateRadius(id, r * 1.05)
+    results.append(('updateRadius', n, time.perf_counter() - start, 'ops/s'))
+
+    start = time.perf_counter()
+    for id, x, y, r in points:
+        world.queryCircle(x, y, r)
+    results.append(('queryCircle', n, time.perf_counter() - start, 'ops/s'))
+
+    qx, qy, qr = random_circles(n, size, 'seeds', seed=1)
+    start = time.perf_counter()
+    for x, y, r in zip(qx.tolist(), qy.tolist(), qr.tolist()):
+        world.isEmpty(x, y, r)
+    results.append(('isEmpty', n, time.perf_counter() - start, 'ops/s'))
+
+    start = time.perf_counter()
+    for id, x, y, r in points:
+        world.removeParticle(id)
+    results.append(('remove', n, time.perf_counter() - start, 'ops/s'))
+
+    return results
+
+def bench_individuals(n=20000, n_attributes=5):
+    rand = np.random.RandomState(0)
+    genome = Genome(0, 0, .3, .4, .3, 2, np.ones(n_attributes), (0, 0, 0))
+    rng = RandomStream(np.random.default_rng(0))
+    radius = 1 + rand.random_sample(n) * 10
+    results = []
+
+    individuals = [Individual(id, genome, rand.random_sample(n_attributes), 0, 0, \
+                              r, pi * r * r, 20, 20, False) \
+                   for id, r in enumerate(radius.tolist())]
+
+    start = time.perf_counter()
+    for ind in individuals:
+        ind.update()
+    results.append(('Individual.update', n, time.perf_counter() - start, 'ops/s'))
+
+    start = time.perf_counter()
+    for ind, other in zip(individuals, individuals[1:]):
+        ind.combat(other, rng)
+    results.append(('Individual.combat', n - 1, time.perf_counter() - start, 'ops/s'))
+
+    pop = Population({0: genome}, n_attributes, 20, 20)
+    for id, r in enumerate(radius.tolist()):
+        pop.add(id, genome, rand.random_sample(n_attributes), 0, 0, r, pi * r * r, False)
+    slots = pop.live_slots()
+
+    start = time.perf_counter()
+    pop.update(slots)
+    results.append(('Population.update', n, time.perf_counter() - start, 'ops/s'))
+
+    views = pop.values()
+    start = time.perf_counter()
+    for ind, other in zip(views, views[1:]):
+        ind.combat(other, rng)
+    results.append(('IndividualView.combat', n - 1, time.perf_counter() - start, 'ops/s'))
+
+    return results
+
+def make_sim(config_path, options):
+    config = read_config(config_path)
+    config['seed'] = 0
+    config.update(options)
+    return Simulation(config)
+
+def bench_simulation(config_path, options, warmup, steps):
+    sim = make_sim(config_path, options)
+    for _ in range(warmup):
+        sim.step()
+
+    start = time.perf_counter()
+    for _ in range(steps):
+        sim.step()
+    seconds = time.perf_counter() - start
+
+    return [('step', steps, seconds, 'steps/s')]
+
+def bench_history(config_path, options, warmup, generations):
+    sim = make_sim(config_path, options)
+    for _ in range(warmup):
+        sim.step()
+
+    directory = tempfile.mkdtemp()
+    results = []
+    try:
+        for name, log in (('History', History()),
+                          ('HistoryFull', HistoryFull(directory)),
+                          ('HistoryDelta', HistoryDelta(directory))):
+            start = time.perf_counter()
+            for _ in range(generations):
+                log.addGeneration(sim)
+            results.append((name, generations, time.perf_counter() - start, 'generations/s'))
+    finally:
+        shutil.rmtree(directory)
+
+    return results
+
+def benchmarks(configs, warmup=50, steps=50, quick=False):
+    """ List of (name, function) of the whole suite.
+    """
+    densities = (2000,) if quick else (2000, 20000)
+    suite = []
+
+    for cls in (CollisionGrid, MultiGrid):
+        for distribution in ('seeds', 'mixed'):
+            for n in densities:
+                name = 'index/%s/%s/%i' % (cls.__name__, distribution, n)
+                suite.append((name, lambda c=cls, n=n, d=distribution: bench_index(c, n, d)))
+
+    suite.append(('individuals', bench_individuals))
+
+    for config_path in configs:
+        config_name = path.splitext(path.basename(config_path))[0]
+        for backend in ('objects', 'arrays'):
+            options = {'population': backend}
+            suite.append(('simulation/%s/%s' % (config_name, backend),
+                          lambda c=config_path, o=options: \
+                              bench_simulation(c, o, warmup, steps)))
+
+        suite.append(('history/%s' % config_name,
+                      lambda c=config_path: bench_history(c, {}, warmup, 20)))
+
+    return suite
+
+################################################################################
+# Running and comparing.
+
+def peak_memory(function):
+    """ Peak traced allocation in bytes while running function.
+    """
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def git_revision():
+    try:
+        root = path.dirname(path.dirname(path.abspath(__file__)))
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=root, \
+                                       stderr=subprocess.STDOUT).decode().strip()
+    except Exception:
+        return None
+
+def run(suite, filter=None, memory=True):
+    """ Run the benchmarks whose name contains filter. Returns the results
+        dict stored as JSON. A benchmark that raises is recorded with its
+        error and the others still run.
+    """
+    results = dict()
+
+    for name, function in suite:
+        if filter and filter not in name:
+            continue
+
+        print(name)
+        sys.stdout.flush()
+
+        try:
+            measurements = function()
+            peak = peak_memory(function) if memory else None
+        except Exception as e:
+            print('  failed:', repr(e))
+            results[name] = {'error': repr(e)}
+            continue
+
+        for op, count, seconds, unit in measurements:
+            key = name + '/' + op
+            results[key] = {'count': count, 'seconds': seconds, \
+                            'rate': count / max(seconds, 1e-12), 'unit': unit, \
+                            'peak_bytes': peak}
+            print('  %-24s %12.1f %s' % (op, results[key]['rate'], unit))
+
+    return {
+        'meta': {
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'git': git_revision(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cwd': os.getcwd()
+        },
+        'results': results
+    }
+
+def compare(old, new, threshold=.1):
+    """ Print the rates of two result dicts side by side. Returns the names
+        whose rate dropped by more than threshold.
+    """
+    regressions = []
+    print('%-60s %12s %12s %8s' % ('benchmark', 'old', 'new', 'change'))
+
+    for name in sorted(set(old['results']) | set(new['results'])):
+        a = old['results'].get(name, {}).get('rate')
+        b = new['results'].get(name, {}).get('rate')
+
+        if a is None or b is None:
+            print('%-60s %12s %12s' % (name, '-' if a is None else '%.1f' % a, \
+                                       '-' if b is None else '%.1f' % b))
+            continue
+
+        change = b / a - 1
+        flag = ''
+        if change < -threshold:
+            regressions.append(name)
+            flag = ' <-'
+        print('%-60s %12.1f %12.1f %+7.1f%%%s' % (name, a, b, 100 * change, flag))
+
+    return regressions
+
+def default_configs():
+    root = path.dirname(path.dirname(path.abspath(__file__)))
+    return sorted(glob(path.join(root, 'examples', '*.config')))
+
+def save(results, filepath):
+    with open(filepath, 'w') as fout:
+        json.dump(results, fout, indent=1, sort_keys=True)
+
+def load(filepath):
+    with open(filepath) as fin:
+        return json.load(fin)
@@ -0,0 +1,29 @@
+""" Checkpoints of a running simulation. The Simulation is pickled whole:
+    population arrays (or Individual objects), genomes, counters, the
+    spatial index with its cell order and the RNG streams, so a resumed run
+    continues exactly as the uninterrupted one would.
+"""
+from __future__ import print_function, division
+import os
+import pickle
+from os import path
+
+def save_checkpoint(filepath, sim, log, step):
+    """ Write the state needed to continue main's loop after step. The file
+        is replaced atomically so a crash while writing keeps the old one.
+    """
+    tmp_path = filepath + '.tmp'
+
+    with open(tmp_path, 'wb') as fout:
+        pickle.dump({'sim': sim, 'log': log, 'step': step}, fout, protocol=-1)
+
+    os.rename(tmp_path, filepath)
+
+def load_checkpoint(filepath):
+    """ Returns the dict written by save_checkpoint, None if there is none.
+    """
+    if not path.exists(filepath):
+        return None
+
+    with open(filepath, 'rb') as fin:
+        return pickle.load(fin)
@@ -1,18 +1,68 @@
 from cymem.cymem cimport Pool
 
-# Singly linked list structure.
-cdef struct Entry:
-    int value
-    Entry *next
+# Growable array of the ids in one grid cell. Capacity is kept when ids are
+# removed so steady state insert/remove does not allocate.
+cdef struct Cell:
+    int *ids
+    int size
+    int capacity
 
-cdef class CollisionGrid:
+# Inclusive range of cells covered by a circle's bounding box.
+cdef struct Box:
+    int x0, y0, x1, y1
+
+cdef int cell_add(Cell *cell, int id) except -1
+cdef int cell_remove(Cell *cell, int id) except -1
+
+# Base of the spatial indexes: a particle table indexed by id, grown on demand.
+cdef class ParticleIndex:
+    cdef double *particle_x
+    cdef double *particle_y
+    cdef double *particle_r
+    cdef unsigned char *particle_used
+    cdef int table_size, n_particles
+
+    # Coverage raster: per cell the number of particles containing it whole.
+    cdef int *coverage
+    cdef int cover_nx, cover_ny
+    cdef double cover_size
+
+    # Work done since creation: queries, cells they visited, particles they
+    # tested and ids added to or removed from cells. See counters().
+    cdef public long long n_queries, n_cells_visited, n_candidates, n_cell_updates
+
+    cdef void reserve(self, int id) except *
+    cdef void cover_init(self, double width, double height, double size) except *
+    cdef void cover_row(self, double x, double y, double r, int cy, int *x0,
+                        int *x1) noexcept
+    cdef void cover_change(self, double x, double y, double r_old,
+                           double r_new) noexcept
+    cdef bint covered(self, double x, double y) noexcept
+    cdef bint has_particle(self, int id)
+    cdef int collect(self, double x, double y, double r, Cell *out) except -1
+    cdef int collect_sorted(self, double x, double y, double r, Cell *out) except -1
+    cdef Cell *cell_array(self, int *n)
+    cdef void cells_restored(self) except *
+
+    cpdef bint isEmpty(self, double x, double y, double r) except *
+    cpdef void insertParticle(self, int id, double x, double y, double r) except *
+    cpdef void updateRadius(self, int id, double r) except *
+    cpdef object tryInsertMany(self, int first_id, double[:] xs, double[:] ys,
+                               double[:] rs)
+    cpdef tuple overlaps(self, int[:] ids)
+    cpdef tuple counters(self)
+    cpdef dict getState(self)
+    cpdef void setState(self, dict state) except *
+
+cdef class CollisionGrid(ParticleIndex):
     cdef Pool mem
-    cdef Entry **grid
+    cdef Cell *grid
     cdef public double blocksize
     cdef public int width, height, nx, ny
-    cdef public dict particles
 
     # Internal helpers.
+    cdef Box cell_box(self, double x, double y, double r)
+    cdef void box_apply(self, int id, Box box, Box skip, bint add) except *
     cpdef list get_block(self, int ix, int iy)
     cpdef void grid_add(self, int id, int ix, int iy) except *
     cpdef void grid_remove(self, int id, int ix, int iy) except *
@@ -6,11 +6,409 @@
 
 from __future__ import print_function
 
-from cpython.mem cimport PyMem_Malloc, PyMem_Free
-from libc.math cimport abs, floor, sqrt
+from cpython.mem cimport PyMem_Malloc, PyMem_Realloc, PyMem_Free
+from libc.math cimport abs, ceil, fabs, floor, sqrt
+from libc.stdlib cimport qsort
+import numpy as np
 # from cymem.cymem cimport Pool
 
-cdef class CollisionGrid:
+cdef int cell_add(Cell *cell, int id) except -1:
+    """ Append id to a cell, growing its array if it is full.
+    """
+    cdef int *ids
+    cdef int capacity
+
+    if cell.size == cell.capacity:
+        capacity = max(4, 2 * cell.capacity)
+        ids = <int *>PyMem_Realloc(<void*>cell.ids, capacity * sizeof(int))
+
+        if not ids:
+            raise MemoryError()
+
+        cell.ids = ids
+        cell.capacity = capacity
+
+    cell.ids[cell.size] = id
+    cell.size += 1
+    return 0
+
+cdef int cell_remove(Cell *cell, int id) except -1:
+    """ Remove id from a cell by swapping it with the last one. Assumes it
+        only occures once.
+    """
+    cdef int j
+
+    for j in range(cell.size):
+        if cell.ids[j] == id:
+            cell.size -= 1
+            cell.ids[j] = cell.ids[cell.size]
+            return 0
+
+    raise KeyError(id)
+
+# Coverage is computed for radii shrunk by this factor, so a point in a covered
+# cell is inside the circle despite rounding in the exact tests.
+cdef double COVER_MARGIN = 1 - 1e-9
+
+cdef int compare_ints(const void *a, const void *b) noexcept nogil:
+    return (<int *>a)[0] - (<int *>b)[0]
+
+cdef class ParticleIndex:
+    """ Particle positions and radii in C arrays indexed by id. Shared by the
+        spatial indexes, which implement the queries.
+    """
+    def __cinit__(self, *args, **kwargs):
+        self.table_size = 0
+        self.n_particles = 0
+        self.coverage = NULL
+        self.cover_nx = self.cover_ny = 0
+        self.n_queries = self.n_cells_visited = self.n_candidates = 0
+        self.n_cell_updates = 0
+        self.reserve(1023)
+
+    def __dealloc__(self):
+        PyMem_Free(<void*>self.coverage)
+        PyMem_Free(<void*>self.particle_x)
+        PyMem_Free(<void*>self.particle_y)
+        PyMem_Free(<void*>self.particle_r)
+        PyMem_Free(<void*>self.particle_used)
+
+    property particles:
+        """ Read-only mapping of id to (x, y, r).
+        """
+        def __get__(self):
+            return ParticleTable(self)
+
+    property coverage_raster:
+        """ Copy of the coverage raster as a (rows, columns) array.
+        """
+        def __get__(self):
+            raster = np.zeros((self.cover_ny, self.cover_nx), dtype='int32')
+            cdef int[:, :] r = raster
+            cdef int cx, cy
+            for cy in range(self.cover_ny):
+                for cx in range(self.cover_nx):
+                    r[cy, cx] = self.coverage[cx + cy*self.cover_nx]
+            return raster
+
+    cdef void reserve(self, int id) except *:
+        """ Grow the particle table so it can hold id.
+        """
+        cdef int size, i
+        cdef void *p
+
+        if id < 0:
+            raise ValueError(id)
+
+        if id < self.table_size:
+            return
+
+        size = max(id + 1, 2 * self.table_size)
+
+        p = PyMem_Realloc(<void*>self.particle_x, size * sizeof(double))
+        if not p:
+            raise MemoryError()
+        self.particle_x = <double *>p
+
+        p = PyMem_Realloc(<void*>self.particle_y, size * sizeof(double))
+        if not p:
+            raise MemoryError()
+        self.particle_y = <double *>p
+
+        p = PyMem_Realloc(<void*>self.particle_r, size * sizeof(double))
+        if not p:
+            raise MemoryError()
+        self.particle_r = <double *>p
+
+        p = PyMem_Realloc(<void*>self.particle_used, size * sizeof(unsigned char))
+        if not p:
+            raise MemoryError()
+        self.particle_used = <unsigned char *>p
+
+        for i in range(self.table_size, size):
+            self.particle_used[i] = 0
+
+        self.table_size = size
+
+    cdef void cover_init(self, double width, double height, double size) except *:
+        """ Allocate an empty coverage raster of square cells of size.
+        """
+        cdef int i
+
+        self.cover_size = size
+        self.cover_nx = max(1, <int>ceil(width / size))
+        self.cover_ny = max(1, <int>ceil(height / size))
+        self.coverage = <int *>PyMem_Malloc(self.cover_nx * self.cover_ny * sizeof(int))
+
+        if not self.coverage:
+            raise MemoryError()
+
+        for i in range(self.cover_nx * self.cover_ny):
+            self.coverage[i] = 0
+
+    cdef void cover_row(self, double x, double y, double r, int cy, int *x0,
+                        int *x1) noexcept:
+        """ The cells [x0, x1] of raster row cy inside the circle, x1 < x0
+            if there are none. A negative r is no circle.
+        """
+        cdef double s = self.cover_size
+        cdef double dy = max(fabs(cy*s - y), fabs((cy+1)*s - y))
+        cdef double h
+
+        r *= COVER_MARGIN
+        x0[0], x1[0] = 0, -1
+
+        if r <= dy:
+            return
+
+        h = sqrt(r*r - dy*dy)
+        x0[0] = max(0, <int>ceil((x - h) / s))
+        x1[0] = min(self.cover_nx-1, <int>floor((x + h) / s) - 1)
+
+        if x1[0] < x0[0]:
+            x0[0], x1[0] = 0, -1
+
+    cdef void cover_change(self, double x, double y, double r_old,
+                           double r_new) noexcept:
+        """ Update the raster for a circle changing radius, a negative
+            radius is no circle so inserts and removals are changes too.
+            Only the cells entering or leaving each row's span are touched.
+        """
+        cdef double r = max(r_old, r_new)
+        cdef int cy, cx, a0, a1, b0, b1
+        cdef int *row
+
+        # Too small to contain a whole cell.
+        if r * COVER_MARGIN * sqrt(2) <= self.cover_size or self.coverage == NULL:
+            return
+
+        for cy in range(max(0, <int>floor((y-r) / self.cover_size)),
+                        min(self.cover_ny-1, <int>floor((y+r) / self.cover_size)) + 1):
+            self.cover_row(x, y, r_old, cy, &a0, &a1)
+            self.cover_row(x, y, r_new, cy, &b0, &b1)
+
+            if a0 == b0 and a1 == b1:
+                continue
+
+            row = self.coverage + cy*self.cover_nx
+
+            # Empty spans are (0, -1) so the ranges below stay valid.
+            for cx in range(a0, min(a1, b0-1) + 1):
+                row[cx] -= 1
+            for cx in range(max(a0, b1+1), a1 + 1):
+                row[cx] -= 1
+            for cx in range(b0, min(b1, a0-1) + 1):
+                row[cx] += 1
+            for cx in range(max(b0, a1+1), b1 + 1):
+                row[cx] += 1
+
+    cdef bint covered(self, double x, double y) noexcept:
+        """ Whether the point is inside a particle, by one raster lookup.
+            False is not conclusive.
+        """
+        cdef int cx = <int>floor(x / self.cover_size)
+        cdef int cy = <int>floor(y / self.cover_size)
+
+        if cx < 0 or cy < 0 or cx >= self.cover_nx or cy >= self.cover_ny:
+            return False
+
+        return self.coverage[cx + cy*self.cover_nx] > 0
+
+    cdef bint has_particle(self, int id):
+        return id >= 0 and id < self.table_size and self.particle_used[id]
+
+    cpdef tuple counters(self):
+        """ (queries, cells, candidates, cell_updates) done so far: queries
+            of every kind including the ones of isEmpty and overlaps, the
+            cells they visited and the particles in them that were tested,
+            and the ids added to or removed from cells.
+        """
+        return (self.n_queries, self.n_cells_visited, self.n_candidates, \
+                self.n_cell_updates)
+
+    cdef int collect(self, double x, double y, double r, Cell *out) except -1:
+        """ Append to out the ids of the particles overlapping the circle,
+            possibly more than once.
+        """
+        raise NotImplementedError()
+
+    cdef int collect_sorted(self, double x, double y, double r, Cell *out) except -1:
+        """ Set out to the sorted ids of the particles overlapping the
+            circle, each once.
+        """
+        cdef int j, n = 0
+
+        out.size = 0
+        self.collect(x, y, r, out)
+        qsort(out.ids, out.size, sizeof(int), compare_ints)
+
+        for j in range(out.size):
+            if n == 0 or out.ids[j] != out.ids[n-1]:
+                out.ids[n] = out.ids[j]
+                n += 1
+
+        out.size = n
+        return 0
+
+    cdef Cell *cell_array(self, int *n):
+        """ The cells of the index and their number, for getState.
+        """
+        n[0] = 0
+        return NULL
+
+    cdef void cells_restored(self) except *:
+        """ Called by setState after the cells are filled.
+        """
+        pass
+
+    cpdef bint isEmpty(self, double x, double y, double r) except *:
+        raise NotImplementedError()
+
+    cpdef void insertParticle(self, int id, double x, double y, double r) except *:
+        raise NotImplementedError()
+
+    cpdef void updateRadius(self, int id, double r) except *:
+        raise NotImplementedError()
+
+    cpdef object tryInsertMany(self, int first_id, double[:] xs, double[:] ys,
+                               double[:] rs):
+        """ Insert every candidate circle that does not overlap a particle
+            already in the grid or a candidate accepted before it, in order.
+            Accepted candidates get consecutive ids starting at first_id.
+            Returns a boolean mask of the accepted candidates.
+        """
+        cdef Py_ssize_t i, n = xs.shape[0]
+        cdef int id = first_id
+
+        if ys.shape[0] != n or rs.shape[0] != n:
+            raise ValueError()
+
+        accepted = np.zeros(n, dtype='uint8')
+        cdef unsigned char[:] mask = accepted
+
+        for i in range(n):
+            if self.isEmpty(xs[i], ys[i], rs[i]):
+                self.insertParticle(id, xs[i], ys[i], rs[i])
+                mask[i] = 1
+                id += 1
+
+        return accepted.view(bool)
+
+    cpdef dict getState(self):
+        """ Particles and cell contents as arrays. Cells keep their order so
+            an index rebuilt with setState answers queries in the same order.
+        """
+        cdef int n, i, j, k = 0
+        cdef Cell *cells = self.cell_array(&n)
+
+        ids = np.zeros(self.n_particles, dtype='int32')
+        xyr = np.zeros((self.n_particles, 3))
+        sizes = np.zeros(n, dtype='int32')
+        cdef int[:] ids_v = ids
+        cdef double[:, :] xyr_v = xyr
+        cdef int[:] sizes_v = sizes
+
+        for i in range(self.table_size):
+            if self.particle_used[i]:
+                ids_v[k] = i
+                xyr_v[k, 0] = self.particle_x[i]
+                xyr_v[k, 1] = self.particle_y[i]
+                xyr_v[k, 2] = self.particle_r[i]
+                k += 1
+
+        for i in range(n):
+            sizes_v[i] = cells[i].size
+
+        cell_ids = np.zeros(sizes.sum(), dtype='int32')
+        cdef int[:] cell_ids_v = cell_ids
+        k = 0
+        for i in range(n):
+            for j in range(cells[i].size):
+                cell_ids_v[k] = cells[i].ids[j]
+                k += 1
+
+        return {'ids': ids, 'xyr': xyr, 'sizes': sizes, 'cell_ids': cell_ids}
+
+    cpdef void setState(self, dict state) except *:
+        """ Fill an empty index from the output of getState.
+        """
+        cdef int n, i, j, k = 0
+        cdef Cell *cells = self.cell_array(&n)
+        cdef int[:] ids = state['ids']
+        cdef double[:, :] xyr = state['xyr']
+        cdef int[:] sizes = state['sizes']
+        cdef int[:] cell_ids = state['cell_ids']
+
+        if self.n_particles != 0 or sizes.shape[0] != n:
+            raise ValueError('State does not fit this index.')
+
+        for i in range(ids.shape[0]):
+            self.reserve(ids[i])
+            self.particle_x[ids[i]] = xyr[i, 0]
+            self.particle_y[ids[i]] = xyr[i, 1]
+            self.particle_r[ids[i]] = xyr[i, 2]
+            self.particle_used[ids[i]] = 1
+        self.n_particles = ids.shape[0]
+
+        for i in range(ids.shape[0]):
+            self.cover_change(xyr[i, 0], xyr[i, 1], -1, xyr[i, 2])
+
+        for i in range(n):
+            for j in range(sizes[i]):
+                cell_add(&cells[i], cell_ids[k])
+                k += 1
+
+        self.cells_restored()
+
+    def __reduce__(self):
+        return (type(self), (self.width, self.height, self.blocksize), \
+                self.getState())
+
+    def __setstate__(self, state):
+        self.setState(state)
+
+    cpdef tuple overlaps(self, int[:] ids):
+        """ The other particles overlapping each of ids, in the CSR form
+            (offsets, neighbours): the sorted ids overlapping ids[i] are
+            neighbours[offsets[i]:offsets[i+1]].
+        """
+        cdef Py_ssize_t i, n = ids.shape[0]
+        cdef int j, id
+        cdef Cell found = Cell(NULL, 0, 0)
+        cdef Cell result = Cell(NULL, 0, 0)
+        cdef int[:] nbrs
+
+        offsets = np.zeros(n+1, dtype='int32')
+        cdef int[:] off = offsets
+
+        try:
+            for i in range(n):
+                id = ids[i]
+
+                if not self.has_particle(id):
+                    raise KeyError(id)
+
+                self.collect_sorted(self.particle_x[id], self.particle_y[id], \
+                                    self.particle_r[id], &found)
+
+                for j in range(found.size):
+                    if found.ids[j] != id:
+                        cell_add(&result, found.ids[j])
+
+                off[i+1] = result.size
+
+            neighbours = np.empty(result.size, dtype='int32')
+            nbrs = neighbours
+            for j in range(result.size):
+                nbrs[j] = result.ids[j]
+
+        finally:
+            PyMem_Free(<void*>found.ids)
+            PyMem_Free(<void*>result.ids)
+
+        return offsets, neighbours
+
+cdef class CollisionGrid(ParticleIndex):
     """ Fast collision detection in mass particle system.
     """
     def __cinit__(self, width, height, blocksize):
@@ -24,98 +422,135 @@ cdef class CollisionGrid:
         self.nx = int(width / blocksize)
         self.ny = int(height / blocksize)
 
-        self.grid = <Entry **>PyMem_Malloc(self.nx * self.ny * sizeof(Entry *))
+        self.grid = <Cell *>PyMem_Malloc(self.nx * self.ny * sizeof(Cell))
 
         if not self.grid:
             raise MemoryError()
 
         cdef int i = 0
         for i in range(self.nx * self.ny):
-            self.grid[i] = NULL
+            self.grid[i].ids = NULL
+            self.grid[i].size = 0
+            self.grid[i].capacity = 0
 
-        self.particles = dict()
+        self.cover_init(width, height, blocksize)
 
         print('Created CollisionGrid', (self.nx, self.ny))
 
     def __dealloc__(self):
-        cdef Entry *head
-        cdef Entry *temp
         cdef int i = 0
 
-        for i in range(self.nx * self.ny):
-            head = self.grid[i]
+        if self.grid == NULL:
+            return
 
-            while head != NULL:
-                temp = head
-                head = head.next
-                PyMem_Free(<void*>temp)
+        for i in range(self.nx * self.ny):
+            PyMem_Free(<void*>self.grid[i].ids)
 
         PyMem_Free(<void*>self.grid)
 
+    cdef Cell *cell_array(self, int *n):
+        n[0] = self.nx * self.ny
+        return self.grid
+
+    cdef Box cell_box(self, double x, double y, double r):
+        """ Cells overlapped by the bounding box of a circle.
+        """
+        cdef Box box
+        box.x0 = max(0, <int>floor((x-r) / self.blocksize))
+        box.y0 = max(0, <int>floor((y-r) / self.blocksize))
+        box.x1 = min(self.nx-1, <int>floor(min(self.width-1, x+r) / self.blocksize))
+        box.y1 = min(self.ny-1, <int>floor(min(self.height-1, y+r) / self.blocksize))
+        return box
+
+    cdef void box_apply(self, int id, Box box, Box skip, bint add) except *:
+        """ Add id to (or remove it from) every cell in box that is not also
+            in skip. Only the rows and columns outside skip are visited, so a
+            circle that grows or shrinks only touches the changed ring.
+        """
+        cdef int cx, cy, sx0, sx1
+
+        for cy in range(box.y0, box.y1+1):
+            if cy >= skip.y0 and cy <= skip.y1:
+                sx0 = skip.x0
+                sx1 = skip.x1
+            else:
+                sx0 = box.x1 + 1
+                sx1 = box.x1
+
+            for cx in range(box.x0, min(box.x1+1, sx0)):
+                if add:
+                    self.grid_add(id, cx, cy)
+                else:
+                    self.grid_remove(id, cx, cy)
+
+            for cx in range(max(box.x0, sx1+1), box.x1+1):
+                if add:
+                    self.grid_add(id, cx, cy)
+                else:
+                    self.grid_remove(id, cx, cy)
+
     cpdef list get_block(self, int ix, int iy):
-        """ Debug function to return linked list as python list.
+        """ Debug function to return a cell as python list, most recently
+            added first.
         """
-        cdef Entry *p = self.grid[ix + iy*self.nx]
+        cdef Cell *cell = &self.grid[ix + iy*self.nx]
         cdef list result = []
+        cdef int j
 
-        while p != NULL:
-            result.append(p.value)
-            p = p.next
+        for j in range(cell.size-1, -1, -1):
+            result.append(cell.ids[j])
 
         return result
 
     cpdef void grid_add(self, int id, int ix, int iy) except *:
-        """ Helper function to prepend value to linked list.
+        """ Helper function to append value to a cell.
         """
-        cdef int i = ix + iy*self.nx
-
         if ix < 0 or ix >= self.nx:
             raise ValueError()
 
         if iy < 0 or iy >= self.ny:
             raise ValueError()
 
-        cdef Entry *e = <Entry *>PyMem_Malloc(sizeof(Entry))
-
-        if not e:
-            raise MemoryError()
-
-        e.value = id
-        e.next = self.grid[i]
-
-        self.grid[i] = e
+        cell_add(&self.grid[ix + iy*self.nx], id)
+        self.n_cell_updates += 1
 
     cpdef void grid_remove(self, int id, int ix, int iy) except *:
-        """ Helper function to remove value from linked list.
-            Assumes it only occures once.
+        """ Helper function to remove value from a cell.
         """
-        cdef int i = ix + iy*self.nx
-        cdef Entry *temp = self.grid[i]
-        cdef Entry *prev
+        cell_remove(&self.grid[ix + iy*self.nx], id)
+        self.n_cell_updates += 1
 
-        if temp == NULL:
-            raise KeyError(id)
+    cdef int collect(self, double x, double y, double r, Cell *out) except -1:
+        cdef Box box = self.cell_box(x, y, r)
+        cdef int cx, cy, id, j
+        cdef Cell *cell
+        cdef double dx, dy
 
-        elif temp.value == id:
-            # Need to remove head of list.
-            self.grid[i] = temp.next
-            PyMem_Free(<void*>temp)
-            return
+        self.n_queries += 1
+        for cy in range(box.y0, box.y1+1):
+            for cx in range(box.x0, box.x1+1):
+                cell = &self.grid[cx + cy*self.nx]
+                self.n_cells_visited += 1
+                self.n_candidates += cell.size
 
-        while temp is not NULL and temp.value != id:
-            prev = temp
-            temp = temp.next
+                for j in range(cell.size):
+                    id = cell.ids[j]
+                    dx = x - self.particle_x[id]
+                    dy = y - self.particle_y[id]
 
-        if temp is NULL:
-            raise KeyError(id)
+                    if sqrt(dx*dx + dy*dy) < r+self.particle_r[id]:
+                        cell_add(out, id)
 
-        prev.next = temp.next
-        PyMem_Free(temp)
+        return 0
 
     cpdef bint isEmpty(self, double x, double y, double r) except *:
-        cdef int cx, cy, id0
-        cdef Entry *p
-        cdef double x2, y2, r2, dx, dy
+        cdef int cx, cy, id0, j
+        cdef Cell *cell
+        cdef double dx, dy
+
+        self.n_queries += 1
+        if self.covered(x, y):
+            return False
 
         cy = max(0, <int>floor((y-r) / self.blocksize))
         while (cy * self.blocksize) <= min( self.height-1, y+r):
@@ -123,26 +558,25 @@ cdef class CollisionGrid:
             cx = max(0, <int>floor((x-r) / self.blocksize))
             while (cx * self.blocksize) <= min( self.width-1, x+r):
 
-                p = self.grid[cx + cy*self.nx]
+                cell = &self.grid[cx + cy*self.nx]
+                self.n_cells_visited += 1
 
-                while p != NULL:
-                    id0 = p.value
-                    x2, y2, r2 = self.particles[id0]
-                    dx = x - x2
-                    dy = y - y2
+                for j in range(cell.size):
+                    id0 = cell.ids[j]
+                    self.n_candidates += 1
+                    dx = x - self.particle_x[id0]
+                    dy = y - self.particle_y[id0]
 
-                    if sqrt(dx*dx + dy*dy) < r+r2:
+                    if sqrt(dx*dx + dy*dy) < r+self.particle_r[id0]:
                         return False
 
-                    p = p.next
-
                 cx += 1
             cy += 1
 
         return True
 
     cpdef void insertParticle(self, int id, double x, double y, double r) except *:
-        cdef int cx, cy
+        cdef Box none = Box(0, 0, -1, -1)
 
         if x < 0 or x >= self.width:
             raise ValueError()
@@ -150,81 +584,79 @@ cdef class CollisionGrid:
         if y < 0 or y >= self.height:
             raise ValueError()
 
-        if id in self.particles:
+        if self.has_particle(id):
             raise ValueError()
 
         if r < 0:
             raise ValueError()
 
-        self.particles[id] = (x, y, r)
-
-        cy = max(0, <int>floor((y-r) / self.blocksize))
-        while (cy * self.blocksize) <= min( self.height-1, y+r):
-            cx = max(0, <int>floor((x-r) / self.blocksize))
-            while (cx * self.blocksize) <= min( self.width-1, x+r):
-
-                self.grid_add(id, cx, cy)
+        self.reserve(id)
+        self.particle_x[id] = x
+        self.particle_y[id] = y
+        self.particle_r[id] = r
+        self.particle_used[id] = 1
+        self.n_particles += 1
 
-                cx += 1
-            cy += 1
+        self.box_apply(id, self.cell_box(x, y, r), none, True)
+        self.cover_change(x, y, -1, r)
 
     cpdef void removeParticle(self, int id) except *:
         cdef double x, y, r
-        cdef int cx, cy
+        cdef Box none = Box(0, 0, -1, -1)
 
-        x, y, r = self.particles[id]
-        del self.particles[id]
-
-        cy = max(0, <int>floor((y-r) / self.blocksize))
-        while (cy * self.blocksize) <= min( self.height-1, y+r):
-
-            cx = max(0, <int>floor((x-r) / self.blocksize))
-            while (cx * self.blocksize) <= min( self.width-1, x+r):
+        if not self.has_particle(id):
+            raise KeyError(id)
 
-                self.grid_remove(id, cx, cy)
+        x = self.particle_x[id]
+        y = self.particle_y[id]
+        r = self.particle_r[id]
+        self.particle_used[id] = 0
+        self.n_particles -= 1
 
-                cx += 1
-            cy += 1
+        self.box_apply(id, self.cell_box(x, y, r), none, False)
+        self.cover_change(x, y, r, -1)
 
     cpdef void updateRadius(self, int id, double r)  except *:
-
+        """ Change a particle's radius. Only the cells entering or leaving
+            its bounding box are updated: the new ring when growing and the
+            vacated ring when shrinking.
+        """
         if r < 0:
             raise ValueError()
 
-        cdef double x, y, r0
-        x, y, r0 = self.particles[id]
+        if not self.has_particle(id):
+            raise KeyError(id)
 
-        cdef int cy = <int>floor((y-r) / self.blocksize)
-        cdef int cy0 = <int>floor((y-r0) / self.blocksize)
-        cdef int cx = <int>floor((x-r) / self.blocksize)
-        cdef int cx0 = <int>floor((x-r0) / self.blocksize)
+        cdef double x = self.particle_x[id]
+        cdef double y = self.particle_y[id]
+        cdef Box old = self.cell_box(x, y, self.particle_r[id])
+        cdef Box new = self.cell_box(x, y, r)
 
-        cdef int ey = <int>floor((y+r) / self.blocksize)
-        cdef int ey0 = <int>floor((y+r0) / self.blocksize)
-        cdef int ex = <int>floor((x+r) / self.blocksize)
-        cdef int ex0 = <int>floor((x+r0) / self.blocksize)
+        self.cover_change(x, y, self.particle_r[id], r)
+        self.particle_r[id] = r
 
-        if cy == cy0 and cx == cx0 and ey == ey0 and ex == ex0:
-            self.particles[id] = (x, y, r)
-        else:
-            self.removeParticle(id)
-            self.insertParticle(id, x, y, r)
+        if old.x0 != new.x0 or old.y0 != new.y0 or \
+           old.x1 != new.x1 or old.y1 != new.y1:
+            self.box_apply(id, new, old, True)
+            self.box_apply(id, old, new, False)
 
     cpdef set query(self, double x0, double y0, double x1, double y1):
         cdef set seen = set()
-        cdef int cx, cy
-        cdef Entry *p
+        cdef int cx, cy, j
+        cdef Cell *cell
 
+        self.n_queries += 1
         cy = max(0, <int>floor(y0 / self.blocksize))
         while (cy * self.blocksize) <= min( self.height-1, y1):
 
             cx = max(0, <int>floor(x0 / self.blocksize))
             while (cx * self.blocksize) <= min( self.width-1, x1):
 
-                p = self.grid[cx + cy*self.nx]
-                while p != NULL:
-                    seen.add(p.value)
-                    p = p.next
+                cell = &self.grid[cx + cy*self.nx]
+                self.n_cells_visited += 1
+                self.n_candidates += cell.size
+                for j in range(cell.size):
+                    seen.add(cell.ids[j])
 
                 cx += 1
             cy += 1
@@ -234,30 +666,63 @@ cdef class CollisionGrid:
     cpdef set queryCircle(self, double x, double y, double r):
         """ Return set of all particle that overlap circle.
         """
-        cdef int cx, cy, id
-        cdef double x0, y0, r0, dx, dy
+        cdef int cx, cy, id, j
+        cdef double dx, dy
         cdef set seen = set()
-        cdef Entry *p
+        cdef Cell *cell
 
+        self.n_queries += 1
         cy = max(0, <int>floor((y-r) / self.blocksize))
         while (cy * self.blocksize) <= min( self.height-1, y+r):
 
             cx = max(0, <int>floor((x-r) / self.blocksize))
             while (cx * self.blocksize) <= min( self.width-1, x+r):
-                p = self.grid[cx + cy*self.nx]
+                cell = &self.grid[cx + cy*self.nx]
+                self.n_cells_visited += 1
+                self.n_candidates += cell.size
 
-                while p is not NULL:
-                    id = p.value
+                for j in range(cell.size):
+                    id = cell.ids[j]
 
-                    x0, y0, r0 = self.particles[id]
-                    dx = x - x0
-                    dy = y - y0
+                    dx = x - self.particle_x[id]
+                    dy = y - self.particle_y[id]
 
-                    if sqrt(dx*dx + dy*dy) < r+r0:
+                    if sqrt(dx*dx + dy*dy) < r+self.particle_r[id]:
                         seen.add(id)
 
-                    p = p.next
-
                 cx += 1
             cy += 1
         return seen
+
+cdef class ParticleTable:
+    """ Read-only dict-like view of the particle table of a ParticleIndex.
+    """
+    cdef ParticleIndex grid
+
+    def __cinit__(self, ParticleIndex grid):
+        self.grid = grid
+
+    def __len__(self):
+        return self.grid.n_particles
+
+    def __contains__(self, int id):
+        return self.grid.has_particle(id)
+
+    def __getitem__(self, int id):
+        if not self.grid.has_particle(id):
+            raise KeyError(id)
+
+        return (self.grid.particle_x[id], self.grid.particle_y[id], \
+                self.grid.particle_r[id])
+
+    def __iter__(self):
+        cdef int id
+        for id in range(self.grid.table_size):
+            if self.grid.particle_used[id]:
+                yield id
+
+    def keys(self):
+        return list(self)
+
+    def items(self):
+        return [(id, self[id]) for id in self]
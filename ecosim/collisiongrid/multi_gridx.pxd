@@ -0,0 +1,31 @@
+from .collision_gridx cimport Cell, ParticleIndex
+
+cdef class MultiGrid(ParticleIndex):
+    cdef Cell *cells
+    cdef int n_cells
+    cdef public double blocksize
+    cdef public int width, height, n_levels
+
+    # Per level cell size, shape, offset into cells and particle count.
+    cdef double *level_size
+    cdef int *level_nx
+    cdef int *level_ny
+    cdef int *level_offset
+    cdef int *level_count
+
+    # Internal helpers.
+    cdef int level_of(self, double r)
+    cdef Cell *cell_of(self, int level, double x, double y)
+    cdef void level_range(self, int level, double x0, double y0, double x1,
+                          double y1, int *box)
+    cdef int collect(self, double x, double y, double r, Cell *out) except -1
+    cdef Cell *cell_array(self, int *n)
+    cdef void cells_restored(self) except *
+
+    # Public methods.
+    cpdef bint isEmpty(self, double x, double y, double r) except *
+    cpdef void insertParticle(self, int id, double x, double y, double r) except *
+    cpdef void removeParticle(self, int id) except *
+    cpdef void updateRadius(self, int id, double r) except *
+    cpdef set query(self, double x0, double y0, double x1, double y1)
+    cpdef set queryCircle(self, double x, double y, double r)
@@ -0,0 +1,331 @@
+# cython: boundscheck=False
+# cython: wraparound=False
+# cython: initializedcheck=False
+# cython: nonecheck=False
+# cython: cdivision=True
+
+from __future__ import print_function
+
+from cpython.mem cimport PyMem_Malloc, PyMem_Free
+from libc.math cimport floor, sqrt
+
+from .collision_gridx cimport cell_add, cell_remove
+
+cdef class MultiGrid(ParticleIndex):
+    """ Multi-resolution grid for particles of very different sizes. Level k
+        has cells of blocksize * 2**k and holds the particles whose diameter
+        fits in one of its cells, each stored once in the cell containing its
+        center. Inserting, removing and resizing a particle touches one cell
+        whatever its radius, queries visit a few cells per level.
+    """
+    def __cinit__(self, width, height, blocksize):
+        cdef int k
+        cdef double size = blocksize
+
+        self.width = width
+        self.height = height
+        self.blocksize = blocksize
+
+        # The top level is a single cell so holds particles of any size.
+        self.n_levels = 1
+        while size < max(width, height):
+            size *= 2
+            self.n_levels += 1
+
+        self.level_size = <double *>PyMem_Malloc(self.n_levels * sizeof(double))
+        self.level_nx = <int *>PyMem_Malloc(self.n_levels * sizeof(int))
+        self.level_ny = <int *>PyMem_Malloc(self.n_levels * sizeof(int))
+        self.level_offset = <int *>PyMem_Malloc(self.n_levels * sizeof(int))
+        self.level_count = <int *>PyMem_Malloc(self.n_levels * sizeof(int))
+
+        if not (self.level_size and self.level_nx and self.level_ny and \
+                self.level_offset and self.level_count):
+            raise MemoryError()
+
+        size = blocksize
+        for k in range(self.n_levels):
+            self.level_size[k] = size
+            self.level_nx[k] = max(1, <int>((width + size - 1) // size))
+            self.level_ny[k] = max(1, <int>((height + size - 1) // size))
+            self.level_offset[k] = self.n_cells
+            self.level_count[k] = 0
+            self.n_cells += self.level_nx[k] * self.level_ny[k]
+            size *= 2
+
+        self.cells = <Cell *>PyMem_Malloc(self.n_cells * sizeof(Cell))
+
+        if not self.cells:
+            raise MemoryError()
+
+        for k in range(self.n_cells):
+            self.cells[k].ids = NULL
+            self.cells[k].size = 0
+            self.cells[k].capacity = 0
+
+        self.cover_init(width, height, blocksize)
+
+        print('Created MultiGrid', (self.level_nx[0], self.level_ny[0]), \
+              self.n_levels, 'levels')
+
+    def __dealloc__(self):
+        cdef int k
+
+        if self.cells != NULL:
+            for k in range(self.n_cells):
+                PyMem_Free(<void*>self.cells[k].ids)
+
+        PyMem_Free(<void*>self.cells)
+        PyMem_Free(<void*>self.level_size)
+        PyMem_Free(<void*>self.level_nx)
+        PyMem_Free(<void*>self.level_ny)
+        PyMem_Free(<void*>self.level_offset)
+        PyMem_Free(<void*>self.level_count)
+
+    cdef Cell *cell_array(self, int *n):
+        n[0] = self.n_cells
+        return self.cells
+
+    cdef void cells_restored(self) except *:
+        cdef int k, i
+        for k in range(self.n_levels):
+            self.level_count[k] = 0
+            for i in range(self.level_nx[k] * self.level_ny[k]):
+                self.level_count[k] += self.cells[self.level_offset[k] + i].size
+
+    cdef int level_of(self, double r):
+        """ Lowest level whose cells fit the particle's diameter.
+        """
+        cdef int k = 0
+        while k < self.n_levels - 1 and 2*r > self.level_size[k]:
+            k += 1
+        return k
+
+    cdef Cell *cell_of(self, int level, double x, double y):
+        cdef double size = self.level_size[level]
+        cdef int cx = min(self.level_nx[level]-1, <int>floor(x / size))
+        cdef int cy = min(self.level_ny[level]-1, <int>floor(y / size))
+        return &self.cells[self.level_offset[level] + cx + cy*self.level_nx[level]]
+
+    cdef void level_range(self, int level, double x0, double y0, double x1,
+                          double y1, int *box):
+        """ Cells of a level that may hold a particle overlapping the
+            rectangle, given particle centers are at most half a cell outside
+            of their cell.
+        """
+        cdef double size = self.level_size[level]
+        cdef double reach = size / 2
+
+        box[0] = max(0, <int>floor((x0 - reach) / size))
+        box[1] = max(0, <int>floor((y0 - reach) / size))
+        box[2] = min(self.level_nx[level]-1, <int>floor((x1 + reach) / size))
+        box[3] = min(self.level_ny[level]-1, <int>floor((y1 + reach) / size))
+
+        # Everything is in the single top level cell.
+        if level == self.n_levels - 1:
+            box[0] = box[1] = 0
+            box[2] = box[3] = 0
+
+    cdef int collect(self, double x, double y, double r, Cell *out) except -1:
+        cdef int k, cx, cy, j, id
+        cdef int box[4]
+        cdef Cell *cell
+        cdef double dx, dy
+
+        self.n_queries += 1
+        for k in range(self.n_levels):
+            if self.level_count[k] == 0:
+                continue
+
+            self.level_range(k, x-r, y-r, x+r, y+r, box)
+
+            for cy in range(box[1], box[3]+1):
+                for cx in range(box[0], box[2]+1):
+                    cell = &self.cells[self.level_offset[k] + cx + \
+                                       cy*self.level_nx[k]]
+                    self.n_cells_visited += 1
+                    self.n_candidates += cell.size
+
+                    for j in range(cell.size):
+                        id = cell.ids[j]
+                        dx = x - self.particle_x[id]
+                        dy = y - self.particle_y[id]
+
+                        if sqrt(dx*dx + dy*dy) < r+self.particle_r[id]:
+                            cell_add(out, id)
+
+        return 0
+
+    cpdef bint isEmpty(self, double x, double y, double r) except *:
+        cdef int k, cx, cy, j, id
+        cdef int box[4]
+        cdef Cell *cell
+        cdef double dx, dy
+
+        self.n_queries += 1
+        if self.covered(x, y):
+            return False
+
+        for k in range(self.n_levels):
+            if self.level_count[k] == 0:
+                continue
+
+            self.level_range(k, x-r, y-r, x+r, y+r, box)
+
+            for cy in range(box[1], box[3]+1):
+                for cx in range(box[0], box[2]+1):
+                    cell = &self.cells[self.level_offset[k] + cx + \
+                                       cy*self.level_nx[k]]
+                    self.n_cells_visited += 1
+
+                    for j in range(cell.size):
+                        id = cell.ids[j]
+                        self.n_candidates += 1
+                        dx = x - self.particle_x[id]
+                        dy = y - self.particle_y[id]
+
+                        if sqrt(dx*dx + dy*dy) < r+self.particle_r[id]:
+                            return False
+
+        return True
+
+    cpdef void insertParticle(self, int id, double x, double y, double r) except *:
+        cdef int level
+
+        if x < 0 or x >= self.width:
+            raise ValueError()
+
+        if y < 0 or y >= self.height:
+            raise ValueError()
+
+        if self.has_particle(id):
+            raise ValueError()
+
+        if r < 0:
+            raise ValueError()
+
+        self.reserve(id)
+        self.particle_x[id] = x
+        self.particle_y[id] = y
+        self.particle_r[id] = r
+        self.particle_used[id] = 1
+        self.n_particles += 1
+
+        level = self.level_of(r)
+        cell_add(self.cell_of(level, x, y), id)
+        self.level_count[level] += 1
+        self.n_cell_updates += 1
+        self.cover_change(x, y, -1, r)
+
+    cpdef void removeParticle(self, int id) except *:
+        cdef int level
+
+        if not self.has_particle(id):
+            raise KeyError(id)
+
+        level = self.level_of(self.particle_r[id])
+        cell_remove(self.cell_of(level, self.particle_x[id], \
+                                 self.particle_y[id]), id)
+        self.level_count[level] -= 1
+        self.n_cell_updates += 1
+        self.cover_change(self.particle_x[id], self.particle_y[id], \
+                          self.particle_r[id], -1)
+
+        self.particle_used[id] = 0
+        self.n_particles -= 1
+
+    cpdef void updateRadius(self, int id, double r) except *:
+        """ Change a particle's radius, moving it to another level if its
+            size class changed.
+        """
+        cdef int old, new
+        cdef double x, y
+
+        if r < 0:
+            raise ValueError()
+
+        if not self.has_particle(id):
+            raise KeyError(id)
+
+        x = self.particle_x[id]
+        y = self.particle_y[id]
+        old = self.level_of(self.particle_r[id])
+        new = self.level_of(r)
+
+        self.cover_change(x, y, self.particle_r[id], r)
+        self.particle_r[id] = r
+
+        if old != new:
+            cell_remove(self.cell_of(old, x, y), id)
+            self.level_count[old] -= 1
+            cell_add(self.cell_of(new, x, y), id)
+            self.level_count[new] += 1
+            self.n_cell_updates += 2
+
+    cpdef set query(self, double x0, double y0, double x1, double y1):
+        """ Return set of all particles whose bounding box overlaps the
+            rectangle.
+        """
+        cdef set seen = set()
+        cdef int k, cx, cy, j, id
+        cdef int box[4]
+        cdef Cell *cell
+        cdef double r
+
+        self.n_queries += 1
+        for k in range(self.n_levels):
+            if self.level_count[k] == 0:
+                continue
+
+            self.level_range(k, x0, y0, x1, y1, box)
+
+            for cy in range(box[1], box[3]+1):
+                for cx in range(box[0], box[2]+1):
+                    cell = &self.cells[self.level_offset[k] + cx + \
+                                       cy*self.level_nx[k]]
+                    self.n_cells_visited += 1
+                    self.n_candidates += cell.size
+
+                    for j in range(cell.size):
+                        id = cell.ids[j]
+                        r = self.particle_r[id]
+
+                        if self.particle_x[id] + r >= x0 and \
+                           self.particle_x[id] - r <= x1 and \
+                           self.particle_y[id] + r >= y0 and \
+                           self.particle_y[id] - r <= y1:
+                            seen.add(id)
+
+        return seen
+
+    cpdef set queryCircle(self, double x, double y, double r):
+        """ Return set of all particle that overlap circle.
+        """
+        cdef set seen = set()
+        cdef int k, cx, cy, j, id
+        cdef int box[4]
+        cdef Cell *cell
+        cdef double dx, dy
+
+        self.n_queries += 1
+        for k in range(self.n_levels):
+            if self.level_count[k] == 0:
+                continue
+
+            self.level_range(k, x-r, y-r, x+r, y+r, box)
+
+            for cy in range(box[1], box[3]+1):
+                for cx in range(box[0], box[2]+1):
+                    cell = &self.cells[self.level_offset[k] + cx + \
+                                       cy*self.level_nx[k]]
+                    self.n_cells_visited += 1
+                    self.n_candidates += cell.size
+
+                    for j in range(cell.size):
+                        id = cell.ids[j]
+                        dx = x - self.particle_x[id]
+                        dy = y - self.particle_y[id]
+
+                        if sqrt(dx*dx + dy*dy) < r+self.particle_r[id]:
+                            seen.add(id)
+
+        return seen
@@ -0,0 +1,296 @@
+# cython: boundscheck=False
+# cython: wraparound=False
+# cython: initializedcheck=False
+# cython: nonecheck=False
+# cython: cdivision=True
+
+""" Combat resolution kernels. combat_serial is the serial combat loop on the
+    Population arrays, the tiled ones run without the GIL on population
+    arrays compacted to id order (rank i is the i'th living individual by id).
+"""
+from __future__ import print_function, division
+from cpython.mem cimport PyMem_Free
+from libc.math cimport fabs, sqrt, hypot
+from libc.math cimport M_PI as pi
+from math import hypot as py_hypot
+import numpy as np
+
+from .collisiongrid.collision_gridx cimport Cell, ParticleIndex
+from .individual cimport update_values
+
+cdef inline unsigned long long splitmix64(unsigned long long z) noexcept nogil:
+    z += 0x9E3779B97F4A7C15ULL
+    z = (z ^ (z >> 30)) * 0xBF58476D1CE4E5B9ULL
+    z = (z ^ (z >> 27)) * 0x94D049BB133111EBULL
+    return z ^ (z >> 31)
+
+cdef inline double roll(unsigned long long key, long long a, long long b) noexcept nogil:
+    cdef unsigned long long h = splitmix64(splitmix64(splitmix64(key) ^ \
+                                <unsigned long long>a) ^ <unsigned long long>b)
+    return (h >> 11) * (1.0 / 9007199254740992.0)
+
+def fight_roll(unsigned long long key, long long a, long long b):
+    """ Uniform number in [0, 1) for the fight of a against b. Depends only
+        on its arguments so fights can be resolved in any order.
+    """
+    return roll(key, a, b)
+
+cdef inline double win_probability(Py_ssize_t i, Py_ssize_t j,
+                                   double[:, :] attributes, double[:] radius,
+                                   double[:] fight) noexcept nogil:
+    """ Individual.combatWinProbability of i against j.
+    """
+    cdef Py_ssize_t k
+    cdef double max_a = attributes[i, 0]
+    cdef double max_b = attributes[j, 0]
+    cdef double max_diff = fabs(max_a - max_b)
+    cdef double w1, w2
+
+    for k in range(attributes.shape[1]):
+        if fabs(attributes[i, k] - attributes[j, k]) > max_diff:
+            max_a = attributes[i, k]
+            max_b = attributes[j, k]
+            max_diff = fabs(max_a - max_b)
+
+    w1 = max_a * (pi * radius[i] * radius[i] * fight[i])
+    w2 = max_b * (pi * radius[j] * radius[j] * fight[j])
+
+    if w1 == w2: # handle 0 case too.
+        return .5
+    else:
+        return w1 / (w1 + w2)
+
+def win_probabilities(long long[:] a, long long[:] b, double[:, :] attributes,
+                      double[:] radius, double[:] fight):
+    """ Individual.combatWinProbability of a[k] against b[k] for every k,
+        both indexing rows of the population arrays.
+    """
+    cdef Py_ssize_t k, n = a.shape[0]
+    out = np.empty(n)
+    cdef double[:] p = out
+
+    with nogil:
+        for k in range(n):
+            p[k] = win_probability(a[k], b[k], attributes, radius, fight)
+
+    return out
+
+cdef inline Py_ssize_t rank_of(long long[:] ids, long long id) noexcept nogil:
+    """ Position of id in the sorted ids, which must hold it.
+    """
+    cdef Py_ssize_t lo = 0, hi = ids.shape[0] - 1, mid
+
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if ids[mid] < id:
+            lo = mid + 1
+        else:
+            hi = mid
+
+    return lo
+
+def combat_serial(ParticleIndex world, pop, double[:] genome_area, rng,
+                  death=None, double p_death=0):
+    """ The combat loop of Simulation.stepCombat on the arrays of the
+        Population pop, for every individual in id order. Fights draw from
+        the RandomStream rng and update the spatial index world and the total
+        area of each genome in genome_area, in the same order as stepCombat
+        so the results are identical.
+
+        With death, the RandomStream of random death, this is the
+        interleaved step: every individual that has not lost a fight yet
+        rolls death with p_death and grows before its own fights.
+
+        Returns (killed, died, n_fights), the slots killed in combat and by
+        random death, and the number of fights.
+    """
+    cdef bint interleaved = death is not None
+    cdef long long[:] slots = pop.live_slots()
+    cdef long long[:] ids = pop.id.take(slots)
+    cdef double[:] x = pop.x, y = pop.y, radius = pop.radius
+    cdef double[:] start_radius = pop.start_radius, energy = pop.energy
+    cdef double[:] grow = pop.grow, seed = pop.seed, fight = pop.fight
+    cdef long long[:] next_seeds = pop.next_seeds, seed_size = pop.seed_size
+    cdef long long[:] genome = pop.genome
+    cdef unsigned char[:] alive = pop.alive.view('uint8')
+    cdef unsigned char[:] blocked = pop.blocked.view('uint8')
+    cdef double[:, :] attributes = pop.attributes
+    cdef double growth_cost_multiplier = pop.growth_cost_multiplier
+    cdef double seed_cost_multiplier = pop.seed_cost_multiplier
+
+    cdef Py_ssize_t n, k, s, j, winner, loser
+    cdef long long id, other
+    cdef double dist, area_before, p
+    cdef long long n_fights = 0
+    cdef Cell found = Cell(NULL, 0, 0)
+    cdef list killed = [], died = []
+
+    if interleaved:
+        blocked[:] = 0
+
+    try:
+        for n in range(slots.shape[0]):
+            s = slots[n]
+            id = ids[n]
+
+            # Died from combat this turn or already lost a fight
+            if not alive[s] or blocked[s]:
+                continue
+
+            if interleaved:
+                # Chance of random death.
+                if death.random() < p_death:
+                    alive[s] = 0
+                    died.append(s)
+                    continue
+
+                area_before = pi * radius[s] * radius[s]
+                next_seeds[s] = update_values(&radius[s], &energy[s], seed_size[s], \
+                                              grow[s], seed[s], \
+                                              growth_cost_multiplier, \
+                                              seed_cost_multiplier)
+                genome_area[genome[s]] += pi * radius[s] * radius[s] - area_before
+
+            # Query by individuals new size, fought in id order.
+            world.collect_sorted(x[s], y[s], radius[s], &found)
+
+            for k in range(found.size):
+                other = found.ids[k]
+                if other == id:
+                    continue
+
+                j = slots[rank_of(ids, other)]
+
+                if not alive[j]:
+                    continue
+
+                # Python's hypot, as Simulation.distance.
+                dist = py_hypot(x[s] - x[j], y[s] - y[j])
+                p = win_probability(s, j, attributes, radius, fight)
+                n_fights += 1
+
+                if rng.random() < p:
+                    winner, loser = s, j
+                else:
+                    winner, loser = j, s
+
+                # The loser shrinks.
+                blocked[loser] = 1
+
+                area_before = pi * radius[loser] * radius[loser]
+                radius[loser] = (dist - radius[winner]) * .95
+                genome_area[genome[loser]] += pi * radius[loser] * radius[loser] - \
+                                              area_before
+
+                if radius[loser] <= start_radius[loser]:
+                    alive[loser] = 0
+                    killed.append(loser)
+                else:
+                    # Grown radii are already in the grid, only losers change.
+                    world.updateRadius(<int>(id if loser == s else other), radius[loser])
+
+                # Stop checking others if this individual lost.
+                if loser == s:
+                    break
+
+            # The grown radius of a winner.
+            if interleaved and alive[s] and not blocked[s]:
+                world.updateRadius(<int>id, radius[s])
+
+    finally:
+        PyMem_Free(<void*>found.ids)
+
+    return killed, died, n_fights
+
+def components(int[:] offsets, int[:] neighbours, unsigned char[:] alive):
+    """ Label the connected components of the overlap graph of the living
+        individuals. The label is the lowest rank in the component.
+    """
+    cdef Py_ssize_t n = offsets.shape[0] - 1
+    cdef Py_ssize_t i, k
+    cdef int a, b
+
+    labels = np.arange(n, dtype='int32')
+    cdef int[:] parent = labels
+
+    with nogil:
+        for i in range(n):
+            if not alive[i]:
+                continue
+
+            for k in range(offsets[i], offsets[i+1]):
+                if not alive[neighbours[k]]:
+                    continue
+
+                a = <int>i
+                while parent[a] != a:
+                    parent[a] = parent[parent[a]]
+                    a = parent[a]
+
+                b = neighbours[k]
+                while parent[b] != b:
+                    parent[b] = parent[parent[b]]
+                    b = parent[b]
+
+                if a < b:
+                    parent[b] = a
+                elif b < a:
+                    parent[a] = b
+
+        for i in range(n):
+            parent[i] = parent[parent[i]]
+
+    return labels
+
+def resolve_combats(int[:] ranks, int[:] offsets, int[:] neighbours,
+                    double[:] x, double[:] y, double[:] radius,
+                    double[:] start_radius, unsigned char[:] alive,
+                    unsigned char[:] blocked, double[:, :] attributes,
+                    double[:] fight, long long[:] ids, unsigned long long key):
+    """ The combat loop of Simulation.step for the individuals in ranks, in
+        the given order, with fights decided by fight_roll. ranks must hold
+        whole components of the overlap graph, components never interact so
+        disjoint sets of them can be resolved concurrently.
+    """
+    cdef Py_ssize_t n, k, i, j, winner, loser
+    cdef double dx, dy, dist
+
+    with nogil:
+        for n in range(ranks.shape[0]):
+            i = ranks[n]
+
+            # Died from combat this turn or already lost a fight
+            if not alive[i] or blocked[i]:
+                continue
+
+            for k in range(offsets[i], offsets[i+1]):
+                j = neighbours[k]
+
+                if not alive[j]:
+                    continue
+
+                dx = x[i] - x[j]
+                dy = y[i] - y[j]
+
+                # Others shrink when losing so may no longer overlap.
+                if not sqrt(dx*dx + dy*dy) < radius[i] + radius[j]:
+                    continue
+
+                dist = hypot(dx, dy)
+
+                if roll(key, ids[i], ids[j]) < \
+                   win_probability(i, j, attributes, radius, fight):
+                    winner, loser = i, j
+                else:
+                    winner, loser = j, i
+
+                # The loser shrinks.
+                blocked[loser] = 1
+                radius[loser] = (dist - radius[winner]) * .95
+
+                if radius[loser] <= start_radius[loser]:
+                    alive[loser] = 0
+
+                # Stop checking others if this individual lost.
+                if loser == i:
+                    break
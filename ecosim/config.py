@@ -0,0 +1,55 @@
+from __future__ import print_function, division
+from os import path
+
+# 2/3 compatability
+try:
+    import ConfigParser as configparser
+except ImportError:
+    import configparser
+
+def read_config(filepath):
+    """ Parse a .config file into the dict taken by Simulation.
+    """
+    config = configparser.ConfigParser(allow_no_value=True)
+
+    if not path.exists(filepath):
+        raise ValueError('That is not a valid to a config file:'+filepath)
+
+    config.read(filepath)
+
+    def optional(get, option, default):
+        if config.has_option('simulation', option):
+            return get('simulation', option)
+        return default
+
+    def resolve(raster_path):
+        # Relative to the config file, or else to the working directory as
+        # they used to be.
+        if not raster_path or path.isabs(raster_path):
+            return raster_path
+        relative = path.join(path.dirname(path.abspath(filepath)), raster_path)
+        return relative if path.exists(relative) else raster_path
+
+    return {
+        'width': config.getint('simulation', 'width'),
+        'height': config.getint('simulation', 'height'),
+        'n_start': config.getint('simulation', 'n_start'),
+        'p_death': config.getfloat('simulation', 'p_death'),
+        'n_randseed': config.getint('simulation', 'n_randseed'),
+        # 'bias_areas':  parse_bias_areas(config.get('simulation', 'bias_areas')),
+        'start_map': resolve(optional(config.get, 'start_map', '../data/circle.npy')),
+        'bias_map': resolve(optional(config.get, 'bias_map', '')),
+        'p_disturbance': config.getfloat('simulation', 'p_disturbance'),
+        'disturbance_power': config.getfloat('simulation', 'disturbance_power'),
+        'seed_cost_multiplier': config.getfloat('simulation', 'seed_cost_multiplier'),
+        'growth_cost_multiplier': config.getfloat('simulation', 'growth_cost_multiplier'),
+        'n_attributes': config.getint('genome', 'n_attributes'),
+        'seed_size_range': (config.getfloat('genome', 'min_seed_size'),
+                            config.getfloat('genome', 'max_seed_size')),
+        'population': optional(config.get, 'population', 'objects'),
+        'collision_index': optional(config.get, 'collision_index', 'grid'),
+        'step_order': optional(config.get, 'step_order', 'interleaved'),
+        'n_workers': optional(config.getint, 'n_workers', 0),
+        'tile_size': optional(config.getfloat, 'tile_size', 100),
+        'seed': optional(config.getint, 'seed', None),
+    }
@@ -0,0 +1,121 @@
+from __future__ import print_function, division
+from collections import namedtuple
+import numpy as np
+
+Genome = namedtuple('Genome', ['id', 'parent', 'fight', 'grow', 'seed',
+                               'seed_size', 'attributes', 'color'])
+
+class GenomeTable(object):
+    """ Columnar store of the genomes of a simulation indexed by genome id,
+        with the count and total area of the living individuals of each
+        one. Behaves like the dict of `Genome` tuples it replaces. Tuples and
+        bias map attribute vectors are only kept for genomes with living
+        individuals and are evicted when the last one dies; extinct genomes
+        cost one compact row. Histories keep the tuples of the genomes they
+        logged, so nothing is lost for the archives.
+    """
+    def __init__(self, n_attributes, capacity=1024):
+        self.n_attributes = n_attributes
+        self.n = 0
+        self.capacity = 0
+
+        self.parent = np.zeros(0, dtype='int64')
+        self.fight = np.zeros(0)
+        self.grow = np.zeros(0)
+        self.seed = np.zeros(0)
+        self.seed_size = np.zeros(0)
+        self.attributes = np.zeros((0, n_attributes))
+        self.color = np.zeros((0, 3), dtype='uint8')
+
+        # Running count and total area of the living individuals, updated by
+        # the simulation on every birth, death and change of radius.
+        self.count = np.zeros(0, dtype='int64')
+        self.area = np.zeros(0)
+
+        self._tuples = dict() # id -> Genome, live genomes only
+        self._biased = dict() # id -> {bias cell: attributes}
+
+        self._grow(capacity)
+
+    _fields = ('parent', 'fight', 'grow', 'seed', 'seed_size', 'attributes',
+               'color', 'count', 'area')
+
+    def _grow(self, capacity):
+        """ Resize all columns to hold capacity genomes.
+        """
+        assert capacity > self.capacity
+        for name in self._fields:
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.capacity] = old
+            setattr(self, name, new)
+        self.capacity = capacity
+
+    def add(self, fight, grow, seed, seed_size, attributes, color, parent=None):
+        """ Store a new genome and return its `Genome`. Without a parent the
+            genome is its own.
+        """
+        if self.n == self.capacity:
+            self._grow(self.capacity * 2)
+
+        id = self.n
+        parent = id if parent is None else parent
+        self.n += 1
+
+        self.parent[id] = parent
+        self.fight[id] = fight
+        self.grow[id] = grow
+        self.seed[id] = seed
+        self.seed_size[id] = seed_size
+        self.attributes[id] = attributes
+        self.color[id] = color
+
+        return Genome(id, parent, fight, grow, seed, seed_size, attributes, color)
+
+    def live(self):
+        """ Ids of the genomes with living individuals.
+        """
+        return np.flatnonzero(self.count[:self.n])
+
+    def evict(self, id):
+        """ Drop the cached objects of a genome whose last individual died.
+        """
+        self._tuples.pop(id, None)
+        self._biased.pop(id, None)
+
+    def biasedAttributes(self, id, cell, bias):
+        """ Attributes of genome id scaled by the bias of a bias map cell.
+            Cached per (genome, cell) and shared by all individuals there,
+            they must not be modified.
+        """
+        cells = self._biased.setdefault(id, dict())
+        attributes = cells.get(cell)
+        if attributes is None:
+            attributes = cells[cell] = self.attributes[id] * bias
+        return attributes
+
+    ############################################################################
+    # Dict interface.
+
+    def __len__(self):
+        return self.n
+
+    def __contains__(self, id):
+        return 0 <= id < self.n
+
+    def __getitem__(self, id):
+        genome = self._tuples.get(id)
+        if genome is not None:
+            return genome
+
+        if not 0 <= id < self.n:
+            raise KeyError(id)
+
+        genome = Genome(id, self.parent.item(id), self.fight.item(id), \
+                        self.grow.item(id), self.seed.item(id), \
+                        self.seed_size.item(id), self.attributes[id].copy(), \
+                        tuple(self.color[id].tolist()))
+
+        if self.count[id] > 0:
+            self._tuples[id] = genome
+        return genome
@@ -1,74 +1,663 @@
 from __future__ import print_function, division
+import copy
+import os
 import pickle
-import numpy as np
+import shutil
+import struct
+from math import pi
+from os import path, makedirs
 from os.path import join as pjoin
-from collections import Counter
+import numpy as np
+from collections import namedtuple
+
+from .background import BackgroundWriter
+
+def genome_tables(genomes, n_attributes):
+	""" The (genome_ints, genome_floats) tables of an archive for the genomes
+		dict.
+	"""
+	n_ints = 5 + n_attributes
+	genome_ints = np.empty((len(genomes), n_ints), dtype='uint32')
+	genome_floats = np.empty((len(genomes), 4), dtype='float32')
+
+	for i, genome in enumerate(genomes.values()):
+		genome_ints[i, 0] = genome.id
+		genome_ints[i, 1] = genome.parent
+		genome_ints[i, 2:5] = genome.color
+		genome_ints[i, 5:] = genome.attributes
+		
+		genome_floats[i, 0] = genome.fight
+		genome_floats[i, 1] = genome.grow
+		genome_floats[i, 2] = genome.seed
+		genome_floats[i, 3] = genome.seed_size
+
+	return genome_ints, genome_floats
+
+class NpyAppender(object):
+	""" Append rows to a .npy file without holding them in memory. The header
+		has a fixed size and is rewritten with the final shape by close(), so
+		the finished file loads with np.load(mmap_mode='r').
+	"""
+	header_size = 128
+
+	def __init__(self, filepath, dtype, row_shape=()):
+		self.file_path = filepath
+		self.file = open(filepath, 'wb')
+		self.dtype = np.dtype(dtype)
+		self.row_shape = tuple(row_shape)
+		self.n_rows = 0
+		self._write_header()
+
+	def _write_header(self):
+		header = "{'descr': %r, 'fortran_order': False, 'shape': %r, }" % \
+				 (np.lib.format.dtype_to_descr(self.dtype), \
+				  (self.n_rows,) + self.row_shape)
+		header = header.ljust(self.header_size - 11) + '\n'
+		self.file.write(b'\x93NUMPY\x01\x00')
+		self.file.write(struct.pack('<H', len(header)))
+		self.file.write(header.encode('latin1'))
+
+	def __getstate__(self):
+		self.file.flush()
+		state = self.__dict__.copy()
+		del state['file']
+		return state
+
+	def __setstate__(self, state):
+		""" Reopen the file, dropping rows appended after the pickle was made.
+		"""
+		self.__dict__.update(state)
+		self.file = open(self.file_path, 'r+b')
+		self.file.truncate(self.header_size + self.n_rows * self.dtype.itemsize * \
+						   int(np.prod(self.row_shape)))
+		self.file.seek(0, os.SEEK_END)
+
+	def append(self, rows):
+		rows = np.ascontiguousarray(rows, dtype=self.dtype)
+		assert rows.shape[1:] == self.row_shape
+		self.file.write(rows.tobytes())
+		self.n_rows += rows.shape[0]
+
+	def close(self):
+		self.file.seek(0)
+		self._write_header()
+		self.file.close()
 
 class HistoryFull(object):
 	""" Store a complete representation of the run including every individual
 		at each generation. Useful if sections want to generaed later and
 		animated. Takes a large amount of space for longer runs.
+
+		Generations are buffered for flush_interval steps and then appended
+		to .npy files in a staging directory, so memory use does not grow
+		with the length of the run. save() finishes the files and moves them
+		to a directory holding step_breaks.npy, ints.npy, floats.npy,
+		genome_ints.npy and genome_floats.npy (see load_archive).
 	"""
-	def __init__(self):
+	def __init__(self, directory, flush_interval=100):
+		self.directory = directory
+		self.flush_interval = flush_interval
+		self._n_archives = 0
 		self._init()
 
 	def _init(self):
+		# Each archive has its own staging directory, an ArchiveWriter may
+		# still be finishing the previous one.
+		self.staging = pjoin(self.directory, '.history_staging_%i' % self._n_archives)
 		self._genomes = dict()
 		self._stepBreaks = []
 		self._history_ints = []
 		self._history_floats = []
+		self._n_rows = 0
+		self._files = None
 
 	def addGeneration(self, sim):
-		for ind in sim.individuals.values():
-			self._history_ints.append((ind.id, ind.genome.id))
-			self._history_floats.append((ind.x, ind.y, ind.area()))
-			self._genomes[ind.genome.id] = ind.genome
-		
-		self._stepBreaks.append(len(self._history_ints))
+		if sim.population is not None:
+			pop = sim.population
+			slots = pop.live_slots()
+			ints = np.column_stack((pop.id[slots], pop.genome[slots]))
+			floats = np.column_stack((pop.x[slots], pop.y[slots], \
+									  pi * pop.radius[slots] * pop.radius[slots]))
+
+			for gid in np.unique(pop.genome[slots]).tolist():
+				if gid not in self._genomes:
+					self._genomes[gid] = sim.genomes[gid]
+		else:
+			individuals = list(sim.individuals.values())
+			ints = np.array([(ind.id, ind.genome.id) for ind in individuals], \
+							dtype='uint32').reshape(-1, 2)
+			floats = np.array([(ind.x, ind.y, ind.area()) for ind in individuals], \
+							  dtype='float16').reshape(-1, 3)
+
+			for ind in individuals:
+				self._genomes[ind.genome.id] = ind.genome
+
+		self._history_ints.append(ints.astype('uint32'))
+		self._history_floats.append(floats.astype('float16'))
+		self._n_rows += len(ints)
+		self._stepBreaks.append(self._n_rows)
+
+		if len(self._stepBreaks) >= self.flush_interval:
+			self.flush()
+
+	def flush(self):
+		""" Append the buffered generations to the staging files.
+		"""
+		if self._files is None:
+			if path.exists(self.staging):
+				shutil.rmtree(self.staging)
+			makedirs(self.staging)
+			self._files = {
+				'step_breaks': NpyAppender(pjoin(self.staging, 'step_breaks.npy'), 'uint32'),
+				'ints': NpyAppender(pjoin(self.staging, 'ints.npy'), 'uint32', (2,)),
+				'floats': NpyAppender(pjoin(self.staging, 'floats.npy'), 'float16', (3,))
+			}
+
+		if self._stepBreaks:
+			self._files['step_breaks'].append(np.array(self._stepBreaks))
+			self._files['ints'].append(np.concatenate(self._history_ints))
+			self._files['floats'].append(np.concatenate(self._history_floats))
+
+		self._stepBreaks = []
+		self._history_ints = []
+		self._history_floats = []
 
 	def save(self, filepath, config):
+		self.snapshot(filepath, config)()
+
+	def snapshot(self, filepath, config):
+		""" Detach the generations recorded since the last save and return
+			a function writing them to the archive filepath, which may run
+			on another thread (see ArchiveWriter). The history starts over.
+		"""
 		print('Saving the history to:', filepath)
-		
-		step_breaks = np.array(self._stepBreaks, dtype='uint32')
-		history_ints = np.array(self._history_ints, dtype='uint32')
-		history_flaots = np.array(self._history_floats, dtype='float16')
-
-		n_ints = 5 + config['n_attributes']
-		genome_ints = np.empty((len(self._genomes), n_ints), dtype='uint32')
-		genome_floats = np.empty((len(self._genomes), 4), dtype='float32')
-
-		for i, genome in enumerate(self._genomes.values()):
-			genome_ints[i, 0] = genome.id
-			genome_ints[i, 1] = genome.parent
-			genome_ints[i, 2:5] = genome.color
-			genome_ints[i, 5:] = genome.attributes
-			
-			genome_floats[i, 0] = genome.fight
-			genome_floats[i, 1] = genome.grow
-			genome_floats[i, 2] = genome.seed
-			genome_floats[i, 3] = genome.seed_size
-
-		np.savez(filepath, step_breaks, history_ints, history_flaots, \
-													 genome_ints, genome_floats)
+		pending = copy.copy(self)
+		self._n_archives += 1
 		self._init()
+		return lambda: pending._write(filepath, config)
+
+	def _write(self, filepath, config):
+		self.flush()
+
+		for appender in self._files.values():
+			appender.close()
+
+		genome_ints, genome_floats = genome_tables(self._genomes, config['n_attributes'])
+
+		np.save(pjoin(self.staging, 'genome_ints.npy'), genome_ints)
+		np.save(pjoin(self.staging, 'genome_floats.npy'), genome_floats)
+
+		if path.exists(filepath): # Rewritten after resuming a checkpoint.
+			shutil.rmtree(filepath)
+		os.rename(self.staging, filepath)
+
+def load_archive(filepath, mmap_mode='r'):
+	""" Returns (step_breaks, ints, floats, genome_ints, genome_floats) of a
+		HistoryFull archive directory, memory-mapped, or of an old .npz one.
+	"""
+	if path.isdir(filepath):
+		names = ('step_breaks', 'ints', 'floats', 'genome_ints', 'genome_floats')
+		return tuple(np.load(pjoin(filepath, name+'.npy'), mmap_mode=mmap_mode) \
+					 for name in names)
+
+	npzfile = np.load(filepath)
+	return tuple(npzfile['arr_%i' % i] for i in range(5))
+
+Frame = namedtuple('Frame', ['ids', 'genome_ids', 'x', 'y', 'area'])
+
+class GenomeTotals(object):
+	""" Sparse per genome counts and total areas at some steps, see
+		HistoryReader.genome_totals. Entry k is genome row genome[k] (an
+		index into genome_ids) at steps[step[k]], sorted by genome then step.
+		Only pairs with living individuals are stored.
+	"""
+	def __init__(self, steps, n_genomes, genome, step, count, area):
+		self.steps = steps
+		self.n_genomes = n_genomes
+		self.genome = genome
+		self.step = step
+		self.count = count
+		self.area = area
+
+	def max_area(self):
+		""" Largest total area of each genome over the steps.
+		"""
+		out = np.zeros(self.n_genomes)
+		np.maximum.at(out, self.genome, self.area)
+		return out
+
+	def dense(self, rows):
+		""" (count, area) arrays of shape (len(rows), len(steps)) for the
+			genome rows.
+		"""
+		rows = np.asarray(rows, dtype='int64')
+		position = np.full(self.n_genomes, -1, dtype='int64')
+		position[rows] = np.arange(len(rows))
+
+		keep = position[self.genome] != -1
+		index = position[self.genome[keep]] * len(self.steps) + self.step[keep]
+		size = len(rows) * len(self.steps)
+		count = np.bincount(index, self.count[keep], minlength=size)
+		area = np.bincount(index, self.area[keep], minlength=size)
+		shape = (len(rows), len(self.steps))
+		return count.reshape(shape), area.reshape(shape)
+
+	def step_totals(self, exclude=()):
+		""" (count, area) at each step summed over the genomes, except the
+			rows in exclude.
+		"""
+		keep = ~np.isin(self.genome, np.asarray(exclude, dtype='int64'))
+		count = np.bincount(self.step[keep], self.count[keep], minlength=len(self.steps))
+		area = np.bincount(self.step[keep], self.area[keep], minlength=len(self.steps))
+		return count, area
+
+class HistoryReader(object):
+	""" Random access to a HistoryFull archive. The arrays are memory-mapped
+		so opening is free and frames are views into the files.
+	"""
+	def __init__(self, filepath, chunk_rows=1<<24):
+		self.step_breaks, self.ints, self.floats, self.genome_ints, \
+			self.genome_floats = load_archive(filepath)
+		self.chunk_rows = chunk_rows
+
+		self.n_steps = len(self.step_breaks)
+		self.starts = np.zeros(self.n_steps + 1, dtype='int64')
+		self.starts[1:] = self.step_breaks
+
+		# Sorted genome ids, rows of the aggregates are in this order.
+		self._order = np.argsort(self.genome_ints[:, 0], kind='stable')
+		self.genome_ids = np.asarray(self.genome_ints[self._order, 0], dtype='int64')
+		self._first_last = None
+
+	def __len__(self):
+		return self.n_steps
+
+	def frame(self, step):
+		""" Columns of every individual alive at step, no data is copied.
+		"""
+		a, b = self.starts[step], self.starts[step+1]
+		ints, floats = self.ints[a:b], self.floats[a:b]
+		return Frame(ints[:, 0], ints[:, 1], floats[:, 0], floats[:, 1], floats[:, 2])
+
+	def genome_colors(self):
+		""" Dict of genome id to an (r, g, b) tuple in [0, 1].
+		"""
+		colors = np.asarray(self.genome_ints[:, 2:5], dtype='float64') / 255
+		return dict(zip(self.genome_ints[:, 0].tolist(), map(tuple, colors.tolist())))
+
+	def _step_chunks(self, steps):
+		""" Split the sorted steps into runs covering at most chunk_rows rows.
+		"""
+		sizes = self.starts[steps+1] - self.starts[steps]
+		bounds = np.searchsorted(np.cumsum(sizes), \
+								 np.arange(self.chunk_rows, sizes.sum(), self.chunk_rows))
+		return np.split(steps, np.unique(bounds + 1))
+
+	def _rows(self, steps):
+		""" Row indices and their position in steps for the given steps.
+		"""
+		sizes = self.starts[steps+1] - self.starts[steps]
+		which = np.repeat(np.arange(len(steps)), sizes)
+		rows = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes) + \
+			   np.repeat(self.starts[steps], sizes)
+		return rows, which
+
+	def genome_totals(self, start=0, stop=None, step=1, skip_empty=False):
+		""" Per genome count and total area at each of range(start, stop, step)
+			as GenomeTotals, which only hold the steps a genome is alive in.
+			With skip_empty individuals of zero area are left out.
+		"""
+		steps = np.arange(start, self.n_steps if stop is None else stop, step)
+		keys, counts, areas = [], [], []
+
+		offset = 0
+		for chunk in self._step_chunks(steps):
+			if len(chunk) == 0:
+				continue
+			rows, which = self._rows(chunk)
+			if skip_empty:
+				keep = self.floats[rows, 2] != 0
+				rows, which = rows[keep], which[keep]
+			genome = np.searchsorted(self.genome_ids, self.ints[rows, 1])
+
+			# Chunks hold disjoint steps so their keys never collide.
+			key, index = np.unique(genome * len(steps) + which + offset, \
+								   return_inverse=True)
+			keys.append(key)
+			counts.append(np.bincount(index))
+			areas.append(np.bincount(index, self.floats[rows, 2]))
+			offset += len(chunk)
+
+		key = np.concatenate(keys) if keys else np.zeros(0, dtype='int64')
+		order = np.argsort(key, kind='stable')
+		key = key[order]
+		count = np.concatenate(counts)[order] if counts else np.zeros(0)
+		area = np.concatenate(areas)[order] if areas else np.zeros(0)
+
+		return GenomeTotals(steps, len(self.genome_ids), key // len(steps), \
+							key % len(steps), count, area)
+
+	def genome_first_last(self):
+		""" (first, last) arrays with the first and last step each genome in
+			genome_ids appears in. Computed once then cached.
+		"""
+		if self._first_last is None:
+			first = np.full(len(self.genome_ids), -1, dtype='int64')
+			last = np.full(len(self.genome_ids), -1, dtype='int64')
+
+			for chunk in self._step_chunks(np.arange(self.n_steps)):
+				if len(chunk) == 0:
+					continue
+				a, b = self.starts[chunk[0]], self.starts[chunk[-1]+1]
+				genome = np.searchsorted(self.genome_ids, self.ints[a:b, 1])
+				row_step = np.searchsorted(self.starts, np.arange(a, b), 'right') - 1
+
+				uniq, index = np.unique(genome, return_index=True)
+				new = first[uniq] == -1
+				first[uniq[new]] = row_step[index[new]]
+
+				uniq, index = np.unique(genome[::-1], return_index=True)
+				last[uniq] = row_step[::-1][index]
+
+			self._first_last = (first, last)
+
+		return self._first_last
+
+class HistoryDelta(object):
+	""" Same information as HistoryFull but stored as changes. Each step
+		records the ids that died, the births (id, genome, x, y, radius) and
+		for every survivor the change of its radius in units of quantum. The
+		encoder tracks the quantised radius the decoder will see, so the error
+		stays below quantum/2 and never accumulates.
+
+		Steps are grouped into compressed chunk files of flush_interval steps.
+		Each chunk starts with a keyframe of the full state so any step can be
+		rebuilt by replaying at most one chunk, see DeltaHistoryReader.
+	"""
+	def __init__(self, directory, quantum=1/256, flush_interval=100):
+		self.directory = directory
+		self.quantum = quantum
+		self.flush_interval = flush_interval
+		self._n_archives = 0
+		self._init()
+
+	def _init(self):
+		self.staging = pjoin(self.directory, '.history_delta_staging_%i' % self._n_archives)
+		self._genomes = dict()
+		self._n_steps = 0
+		self._staged = False
+
+		# State as the decoder sees it, sorted by id.
+		self._ids = np.zeros(0, dtype='int64')
+		self._genome = np.zeros(0, dtype='uint32')
+		self._xy = np.zeros((0, 2), dtype='float32')
+		self._q = np.zeros(0, dtype='int64')
+
+		self._start_chunk()
+
+	def _start_chunk(self):
+		self._chunk_start = self._n_steps
+		self._keyframe = (self._ids, self._genome, self._xy, self._q)
+		self._deaths = []
+		self._births = []
+		self._deltas = []
+
+	def addGeneration(self, sim):
+		if sim.population is not None:
+			pop = sim.population
+			slots = pop.live_slots()
+			ids, genome_ids = pop.id[slots], pop.genome[slots]
+			x, y, radius = pop.x[slots], pop.y[slots], pop.radius[slots]
+
+			for gid in np.unique(genome_ids).tolist():
+				if gid not in self._genomes:
+					self._genomes[gid] = sim.genomes[gid]
+		else:
+			individuals = list(sim.individuals.values())
+			ids = np.array([ind.id for ind in individuals], dtype='int64')
+			genome_ids = np.array([ind.genome.id for ind in individuals], dtype='int64')
+			x = np.array([ind.x for ind in individuals])
+			y = np.array([ind.y for ind in individuals])
+			radius = np.array([ind.radius for ind in individuals])
+
+			for ind in individuals:
+				self._genomes[ind.genome.id] = ind.genome
+
+		self.addFrame(ids, genome_ids, x, y, radius)
+
+	def addFrame(self, ids, genome_ids, x, y, radius):
+		""" Record the individuals alive at the next step.
+		"""
+		order = np.argsort(ids, kind='stable')
+		ids = np.asarray(ids, dtype='int64')[order]
+		q = np.rint(np.asarray(radius)[order] / self.quantum).astype('int64')
+
+		survived = np.isin(self._ids, ids, assume_unique=True)
+		born = ~np.isin(ids, self._ids, assume_unique=True)
+
+		self._deaths.append(self._ids[~survived])
+		self._deltas.append(q[~born] - self._q[survived])
+		self._births.append((ids[born], np.asarray(genome_ids)[order][born], \
+							 np.asarray(x)[order][born], np.asarray(y)[order][born], \
+							 q[born]))
+
+		# Survivors keep their relative order, births fill the gaps.
+		genome = np.empty(len(ids), dtype='uint32')
+		xy = np.empty((len(ids), 2), dtype='float32')
+		genome[~born], genome[born] = self._genome[survived], self._births[-1][1]
+		xy[~born] = self._xy[survived]
+		xy[born] = np.column_stack(self._births[-1][2:4])
+
+		self._ids, self._genome, self._xy, self._q = ids, genome, xy, q
+		self._n_steps += 1
+
+		if self._n_steps - self._chunk_start >= self.flush_interval:
+			self.flush()
+
+	def flush(self):
+		""" Write the steps since the last flush as one chunk.
+		"""
+		if not self._staged:
+			if path.exists(self.staging):
+				shutil.rmtree(self.staging)
+			makedirs(self.staging)
+			self._staged = True
+
+		if self._n_steps == self._chunk_start:
+			return
+
+		key_ids, key_genome, key_xy, key_q = self._keyframe
+		births = [np.concatenate(column) for column in zip(*self._births)]
+
+		np.savez_compressed(pjoin(self.staging, 'chunk_%09i.npz' % self._chunk_start),
+			quantum=self.quantum, first_step=self._chunk_start,
+			key_ids=key_ids.astype('uint32'), key_genome=key_genome,
+			key_xy=key_xy, key_q=key_q.astype('int32'),
+			death_breaks=np.cumsum([len(d) for d in self._deaths]),
+			death_ids=np.concatenate(self._deaths).astype('uint32'),
+			birth_breaks=np.cumsum([len(b[0]) for b in self._births]),
+			birth_ids=births[0].astype('uint32'),
+			birth_genome=births[1].astype('uint32'),
+			birth_xy=np.column_stack(births[2:4]).astype('float32'),
+			birth_q=births[4].astype('int32'),
+			delta_breaks=np.cumsum([len(d) for d in self._deltas]),
+			deltas=np.concatenate(self._deltas).astype('int32'))
+
+		self._start_chunk()
+
+	def save(self, filepath, config):
+		self.snapshot(filepath, config)()
+
+	def snapshot(self, filepath, config):
+		""" See HistoryFull.snapshot.
+		"""
+		print('Saving the history to:', filepath)
+		pending = copy.copy(self)
+		self._n_archives += 1
+		self._init()
+		return lambda: pending._write(filepath, config)
+
+	def _write(self, filepath, config):
+		genome_ints, genome_floats = genome_tables(self._genomes, config['n_attributes'])
+		self._finish(filepath, genome_ints, genome_floats)
+
+	def _finish(self, filepath, genome_ints, genome_floats):
+		self.flush()
+		np.save(pjoin(self.staging, 'genome_ints.npy'), genome_ints)
+		np.save(pjoin(self.staging, 'genome_floats.npy'), genome_floats)
+		if path.exists(filepath): # Rewritten after resuming a checkpoint.
+			shutil.rmtree(filepath)
+		os.rename(self.staging, filepath)
+		self._init()
+
+class DeltaHistoryReader(object):
+	""" Rebuilds the frames of a HistoryDelta archive. Stepping forward
+		replays one step, jumping elsewhere replays from the keyframe of the
+		chunk holding the step.
+	"""
+	def __init__(self, filepath):
+		self.filepath = filepath
+		self.chunk_files = sorted(f for f in os.listdir(filepath) \
+								  if f.startswith('chunk_'))
+		self.chunk_starts = np.array([int(f[6:-4]) for f in self.chunk_files], \
+									 dtype='int64')
+		self.genome_ints = np.load(pjoin(filepath, 'genome_ints.npy'))
+		self.genome_floats = np.load(pjoin(filepath, 'genome_floats.npy'))
+
+		self.n_steps = 0
+		if self.chunk_files:
+			last = self._load(len(self.chunk_files) - 1)
+			self.n_steps = int(last['first_step']) + len(last['delta_breaks'])
+
+		self._chunk_index = None
+		self._step = None
+
+	def __len__(self):
+		return self.n_steps
+
+	def _load(self, index):
+		with np.load(pjoin(self.filepath, self.chunk_files[index])) as npz:
+			return dict(npz.items())
+
+	def _seek(self, step):
+		index = np.searchsorted(self.chunk_starts, step, 'right') - 1
+		if index != self._chunk_index or self._step is None or self._step > step:
+			self._chunk_index = index
+			self._chunk = chunk = self._load(index)
+			self._quantum = float(chunk['quantum'])
+			self._ids = chunk['key_ids'].astype('int64')
+			self._genome = chunk['key_genome']
+			self._xy = chunk['key_xy']
+			self._q = chunk['key_q'].astype('int64')
+			self._step = int(chunk['first_step']) - 1
+
+		while self._step < step:
+			self._replay(self._step + 1 - int(self._chunk['first_step']))
+			self._step += 1
+
+	def _replay(self, i):
+		chunk = self._chunk
+
+		def part(name):
+			breaks = chunk[name+'_breaks']
+			return slice(breaks[i-1] if i > 0 else 0, breaks[i])
+
+		survived = ~np.isin(self._ids, chunk['death_ids'][part('death')], \
+							assume_unique=True)
+		b = part('birth')
+
+		self._ids = np.concatenate((self._ids[survived], chunk['birth_ids'][b]))
+		self._genome = np.concatenate((self._genome[survived], chunk['birth_genome'][b]))
+		self._xy = np.concatenate((self._xy[survived], chunk['birth_xy'][b]))
+		self._q = np.concatenate((self._q[survived] + chunk['deltas'][part('delta')], \
+								  chunk['birth_q'][b]))
+
+		# Ids only grow so this is rare, but keep frames in id order.
+		if np.any(np.diff(self._ids) < 0):
+			order = np.argsort(self._ids, kind='stable')
+			self._ids, self._genome = self._ids[order], self._genome[order]
+			self._xy, self._q = self._xy[order], self._q[order]
+
+	def frame(self, step):
+		""" Frame of every individual alive at step.
+		"""
+		if not 0 <= step < self.n_steps:
+			raise IndexError(step)
+		self._seek(step)
+		radius = self._q * self._quantum
+		return Frame(self._ids, self._genome, self._xy[:, 0], self._xy[:, 1], \
+					 pi * radius * radius)
+
+	def frames(self, start=0, stop=None):
+		for step in range(start, self.n_steps if stop is None else stop):
+			yield self.frame(step)
+
+def convert_to_delta(source, filepath, quantum=1/256, flush_interval=100):
+	""" Write the HistoryFull archive at source (directory or .npz) to
+		filepath as a HistoryDelta archive.
+	"""
+	history = HistoryReader(source)
+	directory = path.dirname(path.abspath(filepath))
+	writer = HistoryDelta(directory, quantum, flush_interval)
+
+	for step in range(len(history)):
+		frame = history.frame(step)
+		area = np.asarray(frame.area, dtype='float64')
+		writer.addFrame(frame.ids, frame.genome_ids, frame.x, frame.y, \
+						np.sqrt(area / pi))
+
+	writer._finish(filepath, np.asarray(history.genome_ints), \
+				   np.asarray(history.genome_floats))
+
+def open_history(filepath):
+	""" HistoryReader or DeltaHistoryReader for the archive at filepath.
+	"""
+	if path.isdir(filepath) and \
+	   any(name.startswith('chunk_') for name in os.listdir(filepath)):
+		return DeltaHistoryReader(filepath)
+	return HistoryReader(filepath)
 
 class History(object):
 	def __init__(self):
 		self.data = []
 		self.genomes = {}
+		self._seen = np.zeros(0, dtype='int64')
 
 	def addGeneration(self, sim):
-		genome_area = Counter()
-		genome_count = Counter()
-		
-		for ind in sim.individuals.values():
-			genome_area[ind.genome.id] += ind.area()
-			genome_count[ind.genome.id] += 1
-			self.genomes[ind.genome.id] = ind.genome
+		""" Log the count and mean area of every living genome, see
+			Simulation.genomeTotals.
+		"""
+		ids, counts, areas = sim.genomeTotals()
+		areas = areas / counts
 
-		gen_data = [(id, n, genome_area[id]/n) for id,n in genome_count.items()]
+		for id in ids[~np.isin(ids, self._seen)].tolist():
+			self.genomes[id] = sim.genomes[id]
+		self._seen = ids
+
+		gen_data = list(zip(ids.tolist(), counts.tolist(), areas.tolist()))
 		self.data.append(gen_data)
 
 	def save(self, filepath, config):
+		self.snapshot(filepath, config)()
+
+	def snapshot(self, filepath, config):
+		""" Function writing the history so far to filepath, see
+			HistoryFull.snapshot. Unlike the other histories every archive
+			holds the whole run.
+		"""
 		print('Saving the history to:', filepath)
-		pickle.dump((self.data, self.genomes), open(filepath, 'wb'), protocol=-1)
+		data, genomes = list(self.data), dict(self.genomes)
+
+		def write():
+			with open(filepath, 'wb') as fout:
+				pickle.dump((data, genomes), fout, protocol=-1)
+		return write
+
+class ArchiveWriter(BackgroundWriter):
+	""" Runs the functions returned by the snapshot() of the histories on a
+		background thread so the simulation keeps stepping while archives
+		are written, see BackgroundWriter. Each pending snapshot holds the
+		data of its archive.
+	"""
+	def __init__(self, max_pending=2):
+		super(ArchiveWriter, self).__init__(max_pending)
@@ -1,12 +1,47 @@
+from libc.math cimport sqrt
+from libc.math cimport M_PI as pi
+
 cdef class Individual:
     cdef public int id, next_seeds, seed_size
     cdef public object genome
     cdef public double x, y, radius, start_radius, next_radius, energy, grow, \
-                        seed, growth_cost_multiplier, seed_cost_multiplier
+                        seed, fight, growth_cost_multiplier, seed_cost_multiplier
     cdef public bint alive, blocked, has_bias
     cdef public double[:] attributes
 
     cpdef double area(self)
     cpdef void update(self)
-    cpdef double combatWinProbability(self, other)
-    cpdef tuple combat(self, other)
+    cpdef double combatWinProbability(self, Individual other)
+    cpdef tuple combat(self, Individual other, rng)
+
+cpdef void update_many(long long[:] slots, double[:] radius, double[:] energy,
+                       long long[:] next_seeds, long long[:] seed_size,
+                       double[:] grow, double[:] seed,
+                       double growth_cost_multiplier,
+                       double seed_cost_multiplier)
+
+cdef inline int update_values(double *radius, double *energy, long long seed_size,
+                              double grow, double seed,
+                              double growth_cost_multiplier,
+                              double seed_cost_multiplier) noexcept nogil:
+    """ The arithmetic of Individual.update on the values of one
+        individual: grows radius, adds to energy and returns the number of
+        seeds made, their cost taken from energy.
+    """
+    cdef double ind_area = pi * radius[0] * radius[0]
+
+    cdef double new_energy = ind_area**.75
+    cdef double grow_energy = sqrt(new_energy * grow)
+    cdef double seed_energy = sqrt(new_energy * seed)
+
+    grow_energy /= growth_cost_multiplier
+    seed_energy /= seed_cost_multiplier
+    energy[0] += seed_energy
+
+    cdef double new_area = ind_area + grow_energy
+    radius[0] = sqrt(new_area/pi)
+
+    cdef int num_seeds = <int>(energy[0] / seed_size)
+
+    energy[0] -= num_seeds * seed_size
+    return num_seeds
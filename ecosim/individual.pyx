@@ -5,11 +5,12 @@
 # cython: cdivision=True
 
 from __future__ import print_function, division
-from libc.math cimport abs, floor, sqrt
+from libc.math cimport fabs, floor, sqrt
 from libc.math cimport M_PI as pi
 
+import numpy as np
+
 from .utils import area_to_radius
-from random import random
 
 cdef class Individual(object):
     def __init__(self, id, genome, attributes, x, y, radius, energy,\
@@ -29,11 +30,24 @@ cdef class Individual(object):
 
         self.grow = self.genome.grow
         self.seed = self.genome.seed
+        self.fight = self.genome.fight
         self.seed_size = self.genome.seed_size
 
         self.growth_cost_multiplier = growth_cost_multiplier
         self.seed_cost_multiplier = seed_cost_multiplier
 
+    def __reduce__(self):
+        return (Individual, (self.id, self.genome, np.asarray(self.attributes), \
+                             self.x, self.y, self.start_radius, self.energy, \
+                             self.growth_cost_multiplier, \
+                             self.seed_cost_multiplier, self.has_bias), \
+                (self.radius, self.next_radius, self.next_seeds, self.alive, \
+                 self.blocked, self.grow, self.seed, self.fight, self.seed_size))
+
+    def __setstate__(self, state):
+        self.radius, self.next_radius, self.next_seeds, self.alive, \
+            self.blocked, self.grow, self.seed, self.fight, self.seed_size = state
+
     cpdef double area(self):
         return pi * self.radius * self.radius
 
@@ -59,30 +73,50 @@ cdef class Individual(object):
         self.energy -= num_seeds * self.seed_size
         self.next_seeds = num_seeds
 
-    cpdef double combatWinProbability(self, other):
-        cdef double max_a = self.attributes[0]
-        cdef double max_b = other.attributes[0]
-        cdef double max_diff = abs(max_a - max_b)
-        cdef double a1, a2, w1, w2
-
-        for a1, a2 in zip(self.attributes, other.attributes):
-            if abs(a1 - a2) > max_diff:
-                max_a = a1
-                max_b = a2
-                max_diff = abs(a1 - a2)
+    cpdef double combatWinProbability(self, Individual other):
+        cdef double[:] a = self.attributes
+        cdef double[:] b = other.attributes
+        cdef double max_a = a[0]
+        cdef double max_b = b[0]
+        cdef double max_diff = fabs(max_a - max_b)
+        cdef double w1, w2
+        cdef Py_ssize_t k
+
+        for k in range(a.shape[0]):
+            if fabs(a[k] - b[k]) > max_diff:
+                max_a = a[k]
+                max_b = b[k]
+                max_diff = fabs(a[k] - b[k])
 
         w1, w2 = max_a, max_b
 
-        w1 *= self.area() * self.genome.fight
-        w2 *= other.area() * other.genome.fight
+        w1 *= self.area() * self.fight
+        w2 *= other.area() * other.fight
 
         if w1 == w2: # handle 0 case too.
             return .5
         else:
             return w1 / (w1 + w2)
 
-    cpdef tuple combat(self, other):
-        """ Return who outcompetes whom. (winner, loser) tuple.
+    cpdef tuple combat(self, Individual other, rng):
+        """ Return who outcompetes whom. (winner, loser) tuple. rng is the
+            RandomStream the outcome is drawn from.
         """
         cdef double p = self.combatWinProbability(other)
-        return (self, other) if random() < p else (other, self)
+        return (self, other) if rng.random() < p else (other, self)
+
+cpdef void update_many(long long[:] slots, double[:] radius, double[:] energy,
+                       long long[:] next_seeds, long long[:] seed_size,
+                       double[:] grow, double[:] seed,
+                       double growth_cost_multiplier,
+                       double seed_cost_multiplier):
+    """ Individual.update for every slot of a Population in one pass. Same
+        arithmetic in the same order so results are bit-for-bit identical.
+    """
+    cdef Py_ssize_t i, s
+
+    for i in range(slots.shape[0]):
+        s = slots[i]
+        next_seeds[s] = update_values(&radius[s], &energy[s], seed_size[s], \
+                                      grow[s], seed[s], growth_cost_multiplier, \
+                                      seed_cost_multiplier)
@@ -2,20 +2,14 @@ import time
 from os import path, makedirs
 import shutil
 
-from ecosim.draw import PygameDraw
 from ecosim.simulation import Simulation
-from ecosim.history import History, HistoryFull
+from ecosim.history import ArchiveWriter, History, HistoryDelta, HistoryFull
+from ecosim.checkpoint import load_checkpoint, save_checkpoint
+from ecosim.render import FrameWriter, open_frame_sink, render_sim
 
 ################################################################################
 # Util functions.
 
-def draw_sim(view, sim):
-    view.start_draw()
-    for ind in sim.individuals.values():
-        view.draw_circle((ind.x, ind.y), ind.radius, ind.genome.color, 0)
-
-    view.end_draw()
-
 def prepare_dir(dir):
     if path.exists(dir):
         shutil.rmtree(dir)
@@ -24,37 +18,87 @@ def prepare_dir(dir):
 ################################################################################
 
 def main(config, timesteps, out_dir, log_interval, img_interval, draw_scale, \
-         archive_interval):
-
+         archive_interval, checkpoint_interval=-1, resume=False, video=None, \
+         profile_csv=None, history='summary'):
+    """ Run a simulation for timesteps. With video, a dict of
+        render.open_frame_sink options, frames go into one video file per
+        session instead of imgs/. Every log_interval the step profile is
+        printed and, with profile_csv, appended to that file. Archives are
+        written by a background ArchiveWriter while the simulation steps.
+        history picks what they hold: 'summary' the per genome totals of
+        History, 'full' every individual (HistoryFull) and 'delta' the same
+        delta encoded (HistoryDelta). A checkpoint is written every
+        checkpoint_interval steps and after every archive.
+    """
+    if history not in ('summary', 'full', 'delta'):
+        raise ValueError('Unknown history: %s' % history)
+
+    checkpoint = None
     if out_dir is not None:
-        assert not path.exists(out_dir)
+        checkpoint_path = path.join(out_dir, 'checkpoint.pkl')
 
-    assert timesteps > 0
+        if resume:
+            checkpoint = load_checkpoint(checkpoint_path)
 
-    logfull = False
+            # Never delete a run to resume it, it may be all there is.
+            if checkpoint is None and path.exists(out_dir):
+                raise IOError('No checkpoint to resume from in: '+out_dir)
 
-    start = time.time()
+        if checkpoint is None:
+            assert not path.exists(out_dir)
+
+    assert timesteps > 0
 
-    sim = Simulation(config)
+    start = time.time()
 
-    if logfull:
-        log = HistoryFull()
+    if checkpoint is not None:
+        sim, log, first_step = checkpoint['sim'], checkpoint['log'], \
+                               checkpoint['step']
+        print('Resuming from step:', first_step)
     else:
-        log = History()
+        sim = Simulation(config)
+        first_step = 0
+
+        if out_dir is None or history == 'summary':
+            log = History()
+        elif history == 'full':
+            log = HistoryFull(out_dir)
+        else:
+            log = HistoryDelta(out_dir)
 
     if out_dir is not None:
-        scale = draw_scale
-        width = int(config['width']*scale)
-        height = int(config['height']*scale)
-        view = PygameDraw(width, height, scale=scale)
-        prepare_dir(path.join(out_dir, 'imgs'))
-        draw_sim(view, sim)
-
-        with open(path.join(out_dir, 'config.txt'), 'w+') as fconfig:
-            for key, value in config.items():
-                fconfig.write(key+'\t'+str(value)+'\n')
-
-    for i in range(timesteps):
+        archiver = ArchiveWriter()
+
+        if checkpoint is None:
+            makedirs(out_dir)
+
+        if img_interval != -1 and video is not None:
+            sink = open_frame_sink(path.join(out_dir, 'video_%09i' % first_step), \
+                                   **video)
+            writer = FrameWriter(save=sink.write)
+        elif img_interval != -1:
+            writer = FrameWriter()
+            if checkpoint is None:
+                prepare_dir(path.join(out_dir, 'imgs'))
+
+        if checkpoint is None:
+            with open(path.join(out_dir, 'config.txt'), 'w+') as fconfig:
+                for key, value in config.items():
+                    if key == 'seed':
+                        value = sim.seed
+                    fconfig.write(key+'\t'+str(value)+'\n')
+
+    profile_file = None
+    if profile_csv is not None and log_interval != -1:
+        new_file = not path.exists(profile_csv)
+        profile_file = open(profile_csv, 'a')
+        if new_file:
+            profile_file.write(sim.profile.csv_header()+'\n')
+
+    # Report only the steps of this session.
+    sim.profile.reset()
+
+    for i in range(first_step, timesteps):
         sim.step()
 
         if out_dir is not None:
@@ -62,22 +106,55 @@ def main(config, timesteps, out_dir, log_interval, img_interval, draw_scale, \
 
         if log_interval != -1 and i % log_interval  == 0:
             print('Step:', i)
-            genomes = set(ind.genome.id for ind in sim.individuals.values())
             print('n_individuals:', len(sim.individuals))
-            print('n_genomes:', len(genomes))
+            print('n_genomes:', len(sim.liveGenomes()))
+            print(sim.profile.summary())
             print()
 
+            if profile_file is not None:
+                profile_file.write(sim.profile.csv_row(i)+'\n')
+                profile_file.flush()
+            sim.profile.reset()
+
         if out_dir is not None:
             if img_interval != -1 and i % img_interval == 0:
-                if out_dir is not None:
-                    draw_sim(view, sim)
-                    view.save(path.join(out_dir, 'imgs/%06d.jpg'%i))
-
-            if archive_interval != -1 and i % archive_interval == 0 and i > 0:
-                log.save(path.join(out_dir, 'archive_%i'%i), config)
-
-    print('Done in:', time.time() - start)
+                if video is not None:
+                    writer.submit(render_sim(sim, draw_scale), i)
+                else:
+                    writer.submit(render_sim(sim, draw_scale), \
+                                  path.join(out_dir, 'imgs/%06d.jpg'%i))
+
+            archived = archive_interval != -1 and i % archive_interval == 0 and i > 0
+            if archived:
+                archiver.submit(log.snapshot(path.join(out_dir, 'archive_%i'%i), config))
+
+            # The archive takes over the staging files of the history, so
+            # the checkpoints made before it cannot resume anymore.
+            if checkpoint_interval != -1 and ((i+1) % checkpoint_interval == 0 or archived):
+                # A checkpoint never runs ahead of the archives on disk.
+                archiver.wait()
+                save_checkpoint(checkpoint_path, sim, log, i+1)
+
+    if out_dir is not None and img_interval != -1:
+        writer.close()
+        if video is not None:
+            sink.close()
+
+    if profile_file is not None:
+        profile_file.close()
+
+    elapsed = time.time() - start
+    print('Done in:', elapsed)
 
     if out_dir is not None:
-        log.save(path.join(out_dir, 'archive_final'), config)
+        archiver.submit(log.snapshot(path.join(out_dir, 'archive_final'), config))
+        archiver.close()
+
+    return {
+        'steps': sim.step_count,
+        'n_individuals': len(sim.individuals),
+        'n_genomes': len(sim.liveGenomes()),
+        'seed': sim.seed,
+        'time': elapsed
+    }
 
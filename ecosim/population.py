@@ -0,0 +1,270 @@
+from __future__ import print_function, division
+from math import pi, sqrt
+import numpy as np
+
+from .individual import update_many
+
+class Population(object):
+    """ Structure-of-arrays store of individuals. Every per-individual value
+        lives in a contiguous NumPy array indexed by slot, slots of destroyed
+        individuals are recycled. Behaves like the dict of `Individual`
+        objects it replaces: indexing by id and iterating values() returns
+        `IndividualView` objects in id (creation) order.
+    """
+    def __init__(self, genomes, n_attributes, growth_cost_multiplier, \
+                 seed_cost_multiplier, capacity=1024):
+        self.genomes = genomes
+        self.n_attributes = n_attributes
+        self.growth_cost_multiplier = growth_cost_multiplier
+        self.seed_cost_multiplier = seed_cost_multiplier
+
+        self.capacity = 0
+        self._slots = dict() # id -> slot
+        self._free = []
+
+        self.used = np.zeros(0, dtype=bool)
+        self.id = np.zeros(0, dtype='int64')
+        self.genome = np.zeros(0, dtype='int64')
+        self.x = np.zeros(0)
+        self.y = np.zeros(0)
+        self.radius = np.zeros(0)
+        self.start_radius = np.zeros(0)
+        self.energy = np.zeros(0)
+        self.next_seeds = np.zeros(0, dtype='int64')
+        self.seed_size = np.zeros(0, dtype='int64')
+        self.grow = np.zeros(0)
+        self.seed = np.zeros(0)
+        self.fight = np.zeros(0)
+        self.alive = np.zeros(0, dtype=bool)
+        self.blocked = np.zeros(0, dtype=bool)
+        self.has_bias = np.zeros(0, dtype=bool)
+        self.attributes = np.zeros((0, n_attributes))
+
+        self._grow(capacity)
+
+    _fields = ('used', 'id', 'genome', 'x', 'y', 'radius', 'start_radius',
+               'energy', 'next_seeds', 'seed_size', 'grow', 'seed', 'fight',
+               'alive', 'blocked', 'has_bias', 'attributes')
+
+    def _grow(self, capacity):
+        """ Resize all arrays to hold capacity individuals.
+        """
+        assert capacity > self.capacity
+        for name in self._fields:
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.capacity] = old
+            setattr(self, name, new)
+
+        # Pop from the end so low slots are filled first.
+        self._free.extend(range(capacity-1, self.capacity-1, -1))
+        self.capacity = capacity
+
+    def add(self, id, genome, attributes, x, y, radius, energy, has_bias):
+        if id in self._slots:
+            raise ValueError(id)
+
+        if not self._free:
+            self._grow(self.capacity * 2)
+
+        slot = self._free.pop()
+        self._slots[id] = slot
+
+        self.used[slot] = True
+        self.id[slot] = id
+        self.genome[slot] = genome.id
+        self.x[slot] = x
+        self.y[slot] = y
+        self.radius[slot] = radius
+        self.start_radius[slot] = radius
+        self.energy[slot] = energy
+        self.next_seeds[slot] = 0
+        self.seed_size[slot] = int(genome.seed_size)
+        self.grow[slot] = genome.grow
+        self.seed[slot] = genome.seed
+        self.fight[slot] = genome.fight
+        self.alive[slot] = True
+        self.blocked[slot] = False
+        self.has_bias[slot] = has_bias
+        self.attributes[slot] = attributes
+
+        return IndividualView(self, slot)
+
+    def add_many(self, ids, genome_ids, attributes, x, y, radius, energy):
+        """ Vectorised add of len(ids) individuals, returns their slots.
+        """
+        n = len(ids)
+        if n == 0:
+            return np.zeros(0, dtype='int64')
+
+        while len(self._free) < n:
+            self._grow(self.capacity * 2)
+
+        slots = np.array(self._free[:-n-1:-1], dtype='int64')
+        del self._free[-n:]
+        self._slots.update(zip(ids.tolist(), slots.tolist()))
+
+        uniq, inverse = np.unique(genome_ids, return_inverse=True)
+        genomes = [self.genomes[g] for g in uniq.tolist()]
+
+        self.used[slots] = True
+        self.id[slots] = ids
+        self.genome[slots] = genome_ids
+        self.x[slots] = x
+        self.y[slots] = y
+        self.radius[slots] = radius
+        self.start_radius[slots] = radius
+        self.energy[slots] = energy
+        self.next_seeds[slots] = 0
+        self.seed_size[slots] = np.array([int(g.seed_size) for g in genomes], \
+                                         dtype='int64')[inverse]
+        self.grow[slots] = np.array([g.grow for g in genomes])[inverse]
+        self.seed[slots] = np.array([g.seed for g in genomes])[inverse]
+        self.fight[slots] = np.array([g.fight for g in genomes])[inverse]
+        self.alive[slots] = True
+        self.blocked[slots] = False
+        self.has_bias[slots] = False
+        self.attributes[slots] = attributes
+
+        return slots
+
+    def slot(self, id):
+        return self._slots[id]
+
+    def live_slots(self):
+        """ Occupied slots ordered by individual id.
+        """
+        slots = np.flatnonzero(self.used)
+        return slots[np.argsort(self.id[slots], kind='stable')]
+
+    def update(self, slots):
+        """ Batched Individual.update for the given slots. Bit-for-bit
+            identical to calling IndividualView.update on each of them.
+        """
+        update_many(np.asarray(slots, dtype='int64'), self.radius, self.energy, \
+                    self.next_seeds, self.seed_size, self.grow, self.seed, \
+                    self.growth_cost_multiplier, self.seed_cost_multiplier)
+
+    ############################################################################
+    # Dict interface.
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self, id):
+        return id in self._slots
+
+    def __getitem__(self, id):
+        return IndividualView(self, self._slots[id])
+
+    def __delitem__(self, id):
+        slot = self._slots.pop(id)
+        self.used[slot] = False
+        self.alive[slot] = False
+        self._free.append(slot)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def keys(self):
+        return self.id[self.live_slots()].tolist()
+
+    def values(self):
+        return [IndividualView(self, slot) for slot in self.live_slots()]
+
+    def items(self):
+        return [(view.id, view) for view in self.values()]
+
+def _field(name):
+    def fget(self):
+        return getattr(self._pop, name).item(self.slot)
+
+    def fset(self, value):
+        getattr(self._pop, name)[self.slot] = value
+
+    return property(fget, fset)
+
+class IndividualView(object):
+    """ Thin view on one slot of a Population with the attributes and methods
+        of `ecosim.individual.Individual`.
+    """
+    __slots__ = ('_pop', 'slot')
+
+    def __init__(self, population, slot):
+        self._pop = population
+        self.slot = slot
+
+    id = _field('id')
+    x = _field('x')
+    y = _field('y')
+    radius = _field('radius')
+    start_radius = _field('start_radius')
+    energy = _field('energy')
+    next_seeds = _field('next_seeds')
+    seed_size = _field('seed_size')
+    grow = _field('grow')
+    seed = _field('seed')
+    fight = _field('fight')
+    alive = _field('alive')
+    blocked = _field('blocked')
+    has_bias = _field('has_bias')
+
+    @property
+    def genome(self):
+        return self._pop.genomes[self._pop.genome.item(self.slot)]
+
+    @property
+    def attributes(self):
+        return self._pop.attributes[self.slot]
+
+    def area(self):
+        r = self.radius
+        return pi * r * r
+
+    def update(self):
+        """ Same arithmetic as Individual.update.
+        """
+        pop = self._pop
+        ind_area = self.area()
+
+        new_energy = ind_area**.75
+        grow_energy = sqrt(new_energy * self.grow)
+        seed_energy = sqrt(new_energy * self.seed)
+
+        grow_energy /= pop.growth_cost_multiplier
+        seed_energy /= pop.seed_cost_multiplier
+        energy = self.energy + seed_energy
+
+        new_area = ind_area + grow_energy
+        self.radius = sqrt(new_area/pi)
+
+        num_seeds = int(energy / self.seed_size)
+
+        self.energy = energy - num_seeds * self.seed_size
+        self.next_seeds = num_seeds
+
+    def combatWinProbability(self, other):
+        a = self.attributes
+        b = other.attributes
+        max_a, max_b = a.item(0), b.item(0)
+        max_diff = abs(max_a - max_b)
+
+        for a1, a2 in zip(a.tolist(), b.tolist()):
+            if abs(a1 - a2) > max_diff:
+                max_a = a1
+                max_b = a2
+                max_diff = abs(a1 - a2)
+
+        w1 = max_a * (self.area() * self.fight)
+        w2 = max_b * (other.area() * other.fight)
+
+        if w1 == w2: # handle 0 case too.
+            return .5
+        else:
+            return w1 / (w1 + w2)
+
+    def combat(self, other, rng):
+        """ Return who outcompetes whom. (winner, loser) tuple.
+        """
+        p = self.combatWinProbability(other)
+        return (self, other) if rng.random() < p else (other, self)
@@ -0,0 +1,87 @@
+""" Wall time per phase of Simulation.step and counters of the work done in
+    them, accumulated until reset so main can report them per log interval.
+"""
+from __future__ import print_function, division
+import time
+
+PHASES = ('grow', 'combat', 'destroy', 'randseed', 'offspring')
+
+COUNTERS = ('steps', 'deaths', 'queries', 'cells', 'candidates', 'fights',
+            'killed', 'randseed_attempted', 'randseed_accepted',
+            'offspring_attempted', 'offspring_accepted', 'grid_updates')
+
+# The counters reported by the spatial index, in the order of its counters().
+INDEX_COUNTERS = ('queries', 'cells', 'candidates', 'grid_updates')
+
+class StepProfile(object):
+    """ Seconds spent in each of PHASES and totals of COUNTERS.
+
+        grow          random death rolls and growth of the survivors with
+                      step_order batched, part of combat by default
+        combat        stepCombat or stepCombatTiled
+        destroy       removal of the dead from population and grid
+        randseed      seeds of new random genomes
+        offspring     seeds of the living individuals
+
+        queries, cells, candidates and grid_updates are reported by the
+        spatial index for every phase: the queries made (including the
+        emptiness tests of seeding), the cells they visited, the particles
+        in those cells that were tested, and the ids added to or removed
+        from cells. fights is only counted by the serial stepCombat, the
+        tiled kernels do not report it.
+    """
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.seconds = dict.fromkeys(PHASES, 0.0)
+        self.counts = dict.fromkeys(COUNTERS, 0)
+        self._phase = None
+        self._start = None
+
+    def start(self, phase):
+        """ End the current phase, if any, and start timing phase.
+        """
+        now = time.perf_counter()
+        if self._phase is not None:
+            self.seconds[self._phase] += now - self._start
+        self._phase = phase
+        self._start = now
+
+    def stop(self):
+        self.start(None)
+
+    def count(self, name, n=1):
+        self.counts[name] += n
+
+    def count_index(self, before, after):
+        """ Add the work done by a spatial index between two of its
+            counters().
+        """
+        for name, a, b in zip(INDEX_COUNTERS, before, after):
+            self.counts[name] += b - a
+
+    def total(self):
+        return sum(self.seconds.values())
+
+    def summary(self):
+        """ Multi-line report of the share of time per phase and the
+            counters per step.
+        """
+        total = max(self.total(), 1e-12)
+        steps = max(self.counts['steps'], 1)
+
+        lines = ['%-10s %8.4fs %5.1f%%' % (phase, self.seconds[phase], \
+                                          100 * self.seconds[phase] / total) \
+                 for phase in PHASES]
+        lines.append('per step: ' + ', '.join('%s %.1f' % (name, self.counts[name] / steps) \
+                                             for name in COUNTERS[1:]))
+        return '\n'.join(lines)
+
+    def csv_header(self):
+        return ','.join(['step'] + [p + '_seconds' for p in PHASES] + list(COUNTERS))
+
+    def csv_row(self, step):
+        values = [step] + [self.seconds[p] for p in PHASES] + \
+                 [self.counts[c] for c in COUNTERS]
+        return ','.join(str(v) for v in values)
@@ -0,0 +1,80 @@
+""" Rasters stretched over the world: the start map of the probability of a
+    seed taking root and the bias map of attribute multipliers. Files are
+    memory-mapped read-only and cached per process, so a sweep that loads
+    them before forking its pool shares one copy between all workers.
+"""
+from __future__ import print_function, division
+from os import path
+import numpy as np
+
+_cache = dict() # absolute path -> read-only memory-mapped array
+
+def load_raster(filepath):
+    """ Read-only memory map of the .npy file at filepath, loaded once per
+        process.
+    """
+    key = path.abspath(filepath)
+    raster = _cache.get(key)
+    if raster is None:
+        raster = _cache[key] = np.load(key, mmap_mode='r')
+    return raster
+
+def preload(config):
+    """ Load the rasters of a config into the cache, see load_raster.
+    """
+    for key in ('start_map', 'bias_map'):
+        if config.get(key):
+            load_raster(config[key])
+
+class RasterMap(object):
+    """ Raster of shape (rows, cols, ...) covering a width x height world.
+        Positions map to cells as (y // cell_height, x // cell_width).
+    """
+    def __init__(self, raster, width, height, filepath=None):
+        self.raster = raster
+        self.filepath = filepath
+        self.width = width
+        self.height = height
+        self.cell_width = width / raster.shape[1]
+        self.cell_height = height / raster.shape[0]
+
+    @classmethod
+    def open(cls, filepath, width, height):
+        return cls(load_raster(filepath), width, height, path.abspath(filepath))
+
+    @classmethod
+    def uniform(cls, value, width, height):
+        """ Map of a single cell of value.
+        """
+        return cls(np.full((1, 1), value), width, height)
+
+    def cell(self, x, y):
+        return int(y // self.cell_height), int(x // self.cell_width)
+
+    def cells(self, xs, ys):
+        """ Vectorised cell, arrays of rows and cols.
+        """
+        rows = (ys // self.cell_height).astype('int64')
+        cols = (xs // self.cell_width).astype('int64')
+        return rows, cols
+
+    def __getitem__(self, cell):
+        return self.raster[cell]
+
+    def lookup(self, xs, ys):
+        """ Values of the raster at arrays of positions.
+        """
+        return self.raster[self.cells(xs, ys)]
+
+    def __getstate__(self):
+        """ Maps opened from a file are pickled as their path.
+        """
+        state = self.__dict__.copy()
+        if self.filepath is not None:
+            state['raster'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.raster is None:
+            self.raster = load_raster(self.filepath)
@@ -0,0 +1,203 @@
+""" Headless rendering of the simulation into NumPy images, without a display.
+    Frames are rasterised with array operations and written to disk by a
+    background thread so the simulation keeps stepping while they encode.
+"""
+from __future__ import print_function, division
+import os
+import subprocess
+from os import path, makedirs
+try:
+    from shutil import which
+except ImportError:
+    from distutils.spawn import find_executable as which
+
+import numpy as np
+
+from .background import BackgroundWriter
+
+def rasterize(w, h, x, y, r, colors, scale=1, flip_y=True, background=255):
+    """ Draw filled disks into a new (h, w, 3) uint8 image, later disks on
+        top. Uses the same pixel mapping as PygameDraw.draw_circle.
+    """
+    image = np.empty((h, w, 3), dtype='uint8')
+    image[:] = background
+
+    y = np.asarray(y) * scale
+    cx = (np.asarray(x) * scale).astype('int64')
+    cy = (h - y if flip_y else y).astype('int64')
+    rad = (np.asarray(r) * scale).astype('int64')
+
+    # One span per disk per row it covers.
+    n_rows = 2 * rad + 1
+    disk = np.repeat(np.arange(len(rad)), n_rows)
+    dy = np.arange(n_rows.sum()) - np.repeat(np.cumsum(n_rows) - n_rows, n_rows) - \
+         rad[disk]
+    row = cy[disk] + dy
+    half = np.sqrt(rad[disk]**2 + rad[disk]/2 - dy**2).astype('int64')
+    x0 = np.maximum(cx[disk] - half, 0)
+    x1 = np.minimum(cx[disk] + half, w - 1)
+
+    visible = (row >= 0) & (row < h) & (x0 <= x1)
+    disk, row, x0, x1 = disk[visible], row[visible], x0[visible], x1[visible]
+
+    # Expand spans to flat pixel indices.
+    length = x1 - x0 + 1
+    start = row * w + x0
+    pixel = np.arange(length.sum()) - np.repeat(np.cumsum(length) - length, length) + \
+            np.repeat(start, length)
+
+    image.reshape(-1, 3)[pixel] = np.asarray(colors, dtype='uint8')[np.repeat(disk, length)]
+    return image
+
+def population_arrays(sim):
+    """ (x, y, radius, colors) of the living individuals in id order.
+    """
+    if sim.population is not None:
+        pop = sim.population
+        slots = pop.live_slots()
+        genome_ids = pop.genome[slots]
+        x, y, r = pop.x[slots], pop.y[slots], pop.radius[slots]
+    else:
+        individuals = list(sim.individuals.values())
+        genome_ids = np.array([ind.genome.id for ind in individuals], dtype='int64')
+        x = np.array([ind.x for ind in individuals])
+        y = np.array([ind.y for ind in individuals])
+        r = np.array([ind.radius for ind in individuals])
+
+    uniq, inverse = np.unique(genome_ids, return_inverse=True)
+    colors = np.array([sim.genomes[g].color for g in uniq.tolist()], \
+                      dtype='uint8').reshape(-1, 3)[inverse]
+    return x, y, r, colors
+
+def render_sim(sim, scale):
+    """ Image of the simulation, each individual a disc of its genome color.
+    """
+    w, h = int(sim.width * scale), int(sim.height * scale)
+    return rasterize(w, h, *population_arrays(sim), scale=scale)
+
+def save_image(image, filepath):
+    """ Write an (h, w, 3) uint8 image, the format follows the extension.
+    """
+    import pygame
+    surface = pygame.surfarray.make_surface(image.swapaxes(0, 1))
+    pygame.image.save(surface, filepath)
+
+class FrameWriter(BackgroundWriter):
+    """ Writes images on a background thread, see BackgroundWriter.
+    """
+    def __init__(self, max_pending=8, save=save_image):
+        super(FrameWriter, self).__init__(max_pending)
+        self.save = save
+
+    def submit(self, image, filepath):
+        super(FrameWriter, self).submit(self.save, image, filepath)
+
+class FrameSink(object):
+    """ Base of the sinks that collect all frames of a run in a few files
+        instead of one image per frame. Keeps every decimate'th frame it is
+        given, shrunk by the integer factor downscale.
+    """
+    def __init__(self, decimate=1, downscale=1):
+        self.decimate = decimate
+        self.downscale = downscale
+        self.n_seen = 0
+
+    def write(self, image, step):
+        self.n_seen += 1
+        if (self.n_seen - 1) % self.decimate:
+            return
+
+        if self.downscale > 1:
+            image = image[::self.downscale, ::self.downscale]
+
+        self._write(image, step)
+
+    def _write(self, image, step):
+        raise NotImplementedError()
+
+    def close(self):
+        pass
+
+class VideoSink(FrameSink):
+    """ Pipe raw RGB frames to an ffmpeg process encoding one video file.
+    """
+    def __init__(self, filepath, fps=30, decimate=1, downscale=1, ffmpeg='ffmpeg'):
+        super(VideoSink, self).__init__(decimate, downscale)
+        self.filepath = filepath
+        self.fps = fps
+        self.ffmpeg = ffmpeg
+        self.process = None
+
+    def _write(self, image, step):
+        # yuv420p needs even dimensions.
+        h, w = image.shape[0] & ~1, image.shape[1] & ~1
+        image = image[:h, :w]
+
+        if self.process is None:
+            self.shape = image.shape
+            self.process = subprocess.Popen([self.ffmpeg, '-loglevel', 'error',
+                '-y', '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-s', '%ix%i' % (w, h),
+                '-r', str(self.fps), '-i', '-', '-c:v', 'libx264',
+                '-pix_fmt', 'yuv420p', self.filepath], stdin=subprocess.PIPE)
+
+        assert image.shape == self.shape
+        self.process.stdin.write(np.ascontiguousarray(image).tobytes())
+
+    def close(self):
+        if self.process is not None:
+            self.process.stdin.close()
+            if self.process.wait() != 0:
+                raise IOError('ffmpeg failed writing '+self.filepath)
+
+class FrameArchive(FrameSink):
+    """ Store frames in compressed chunks of frames_per_chunk, each one .npz
+        file with 'frames' (n, h, w, 3) and the 'steps' they were taken at.
+        Used when ffmpeg is not available, see read_frame_archive.
+    """
+    def __init__(self, directory, frames_per_chunk=16, decimate=1, downscale=1):
+        super(FrameArchive, self).__init__(decimate, downscale)
+        self.directory = directory
+        self.frames_per_chunk = frames_per_chunk
+        self.frames = []
+        self.steps = []
+
+        if not path.exists(directory):
+            makedirs(directory)
+
+    def _write(self, image, step):
+        self.frames.append(image)
+        self.steps.append(step)
+
+        if len(self.frames) == self.frames_per_chunk:
+            self.flush()
+
+    def flush(self):
+        if self.frames:
+            filepath = path.join(self.directory, 'frames_%09i.npz' % self.steps[0])
+            np.savez_compressed(filepath, frames=np.array(self.frames), \
+                                steps=np.array(self.steps))
+        self.frames = []
+        self.steps = []
+
+    def close(self):
+        self.flush()
+
+def read_frame_archive(directory):
+    """ Yield (step, image) for every frame of a FrameArchive in order.
+    """
+    for name in sorted(os.listdir(directory)):
+        if name.startswith('frames_') and name.endswith('.npz'):
+            with np.load(path.join(directory, name)) as chunk:
+                for step, image in zip(chunk['steps'].tolist(), chunk['frames']):
+                    yield step, image
+
+def open_frame_sink(filepath, fps=30, decimate=1, downscale=1):
+    """ VideoSink writing filepath.mp4 if ffmpeg is on the path, otherwise a
+        FrameArchive in the directory filepath_frames.
+    """
+    ffmpeg = which('ffmpeg')
+    if ffmpeg is not None:
+        return VideoSink(filepath+'.mp4', fps, decimate, downscale, ffmpeg)
+
+    print('ffmpeg not found, writing frames to', filepath+'_frames')
+    return FrameArchive(filepath+'_frames', decimate=decimate, downscale=downscale)
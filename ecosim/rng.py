@@ -0,0 +1,67 @@
+from __future__ import print_function, division
+import numpy as np
+
+class RandomStream(object):
+    """ Uniform numbers from a numpy.random.Generator, buffered so scalar
+        draws are cheap. Scalar and array draws come from the same sequence:
+        random(n) returns exactly what n calls to random() would.
+    """
+    def __init__(self, generator, buffer_size=4096):
+        self.generator = generator
+        self.buffer_size = buffer_size
+        self._buffer = np.zeros(0)
+        self._pos = 0
+
+    def _refill(self):
+        self._buffer = self.generator.random(self.buffer_size)
+        self._pos = 0
+
+    def random(self, size=None):
+        """ A float in [0, 1), or an array of size of them.
+        """
+        if size is None:
+            if self._pos == len(self._buffer):
+                self._refill()
+            self._pos += 1
+            return self._buffer.item(self._pos - 1)
+
+        out = np.empty(size)
+        flat = out.reshape(-1)
+        n = len(flat)
+        done = min(n, len(self._buffer) - self._pos)
+        flat[:done] = self._buffer[self._pos:self._pos + done]
+        self._pos += done
+
+        # The buffer is empty now. Generator.random(a + b) is the same as
+        # random(a) followed by random(b), so large draws skip the buffer.
+        if n - done >= self.buffer_size:
+            flat[done:] = self.generator.random(n - done)
+        elif n > done:
+            self._refill()
+            self._pos = n - done
+            flat[done:] = self._buffer[:self._pos]
+
+        return out
+
+    def uniform(self, low, high, size=None):
+        return low + (high - low) * self.random(size)
+
+    def randbits64(self):
+        """ A random 64 bit unsigned integer, taken from the generator.
+        """
+        return int(self.generator.integers(0, 2**64, dtype=np.uint64))
+
+class RandomStreams(object):
+    """ Independent streams, one per source of randomness in the simulation,
+        spawned from a single seed. Changing how many numbers one part of the
+        simulation draws does not shift the others. A seed of None draws one
+        from the OS, it is kept in .seed so the run can be repeated.
+    """
+    names = ('death', 'combat', 'seeding', 'genomes')
+
+    def __init__(self, seed=None):
+        seed_sequence = np.random.SeedSequence(seed)
+        self.seed = seed_sequence.entropy
+
+        for name, child in zip(self.names, seed_sequence.spawn(len(self.names))):
+            setattr(self, name, RandomStream(np.random.default_rng(child)))
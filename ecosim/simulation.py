@@ -1,17 +1,21 @@
 from __future__ import print_function, division
-from math import pi, sqrt, hypot
-from random import random, randint, uniform, shuffle
-from collections import namedtuple
+from math import pi, hypot
+from multiprocessing.pool import ThreadPool
 import numpy as np
 
 from .collisiongrid.collision_gridx import CollisionGrid
+from .collisiongrid.multi_gridx import MultiGrid
 
 from .individual import Individual
+from .combat import combat_serial, components, resolve_combats
+# Genome lived here, the pickles of old histories still refer to it.
+from .genomes import Genome, GenomeTable
+from .population import IndividualView, Population
+from .profiling import StepProfile
+from .rasters import RasterMap
+from .rng import RandomStreams
 from .utils import area_to_radius, random_color
 
-Genome = namedtuple('Genome', ['id', 'parent', 'fight', 'grow', 'seed',
-                               'seed_size', 'attributes', 'color'])
-
 class Simulation(object):
     def __init__(self, config):
         ########################################################################
@@ -30,17 +34,33 @@ class Simulation(object):
         self.seed_cost_multiplier = config['seed_cost_multiplier']
         self.growth_cost_multiplier = config['growth_cost_multiplier']
         self.max_radius = min(self.width, self.height) / 2.0
-
-        self.start_grid = np.load('../data/circle.npy')
-        # self.start_grid = np.load('../data/circle_gradient.npy')
-        self.grid_width = self.width / self.start_grid.shape[1]
-        self.grid_height = self.height / self.start_grid.shape[0]
-
-
+        self.population_backend = config.get('population', 'objects')
+        self.collision_index = config.get('collision_index', 'grid')
+
+        # 'interleaved' is the model's order where each individual grows
+        # just before its own fights, 'batched' grows every individual before
+        # combat, which changes the results (see stepGrow).
+        self.step_order = config.get('step_order', 'interleaved')
+
+        # Parallel combat over tiles of the world, arrays backend only.
+        self.n_workers = config.get('n_workers', 0)
+        self.tile_size = config.get('tile_size', 100)
+        self.pool = None
+
+        # All randomness comes from these, None seeds from the OS.
+        self.rng = RandomStreams(config.get('seed'))
+        self.seed = self.rng.seed
+
+        # Probability of a seed taking root and multipliers of the attributes
+        # of new individuals, per cell of rasters over the world. Without a
+        # start map seeds take root anywhere.
+        self.start_map = RasterMap.uniform(1.0, self.width, self.height)
+        if config.get('start_map'):
+            self.start_map = RasterMap.open(config['start_map'], self.width, self.height)
 
         self.bias_map = None
         if config['bias_map']:
-            self.bias_map = np.load(config['bias_map'])
+            self.bias_map = RasterMap.open(config['bias_map'], self.width, self.height)
 
         # # print(self.bias_areas)
 
@@ -55,11 +75,49 @@ class Simulation(object):
         self.next_gen_id = 0
         self.step_count = 0
 
+        # Individuals of the objects backend that made seeds this step, in
+        # id order, collected by stepGrow for stepSpreadSeeds.
+        self.seeders = []
+
+        # Time per phase of step and work counters, see ecosim.profiling.
+        self.profile = StepProfile()
+
         ########################################################################
         # Core objects.
-        self.individuals = dict()
-        self.genomes = dict()
-        self.world = CollisionGrid(self.width, self.height, 2)
+        # Genomes with the running count and total area of their living
+        # individuals, indexed by genome id.
+        self.genomes = GenomeTable(self.n_attributes)
+
+        # Individuals are either Individual objects in a dict or rows of a
+        # structure-of-arrays Population with the same dict interface.
+        if self.population_backend == 'objects':
+            self.population = None
+            self.individuals = dict()
+        elif self.population_backend == 'arrays':
+            self.population = Population(self.genomes, self.n_attributes, \
+                                         self.growth_cost_multiplier, \
+                                         self.seed_cost_multiplier)
+            self.individuals = self.population
+        else:
+            raise ValueError('Unknown population backend: %s' % \
+                             self.population_backend)
+
+        if self.n_workers and self.population is None:
+            raise ValueError('n_workers requires the arrays population backend')
+
+        if self.step_order not in ('batched', 'interleaved'):
+            raise ValueError('Unknown step order: %s' % self.step_order)
+
+        if self.n_workers and self.step_order != 'batched':
+            raise ValueError('n_workers requires step_order batched')
+
+        if self.collision_index == 'grid':
+            self.world = CollisionGrid(self.width, self.height, 2)
+        elif self.collision_index == 'multigrid':
+            self.world = MultiGrid(self.width, self.height, 2)
+        else:
+            raise ValueError('Unknown collision index: %s' % \
+                             self.collision_index)
 
         ########################################################################
         # Create intitial population.
@@ -67,24 +125,38 @@ class Simulation(object):
         for _ in range(self.n_start//n_copies):
             g = self.randomGenome()
             for _ in range(n_copies):
-                x = random() * self.width
-                y = random() * self.height
+                x = self.rng.seeding.random() * self.width
+                y = self.rng.seeding.random() * self.height
                 self.createIndividual(g, x, y, g.seed_size)
 
         ########################################################################
 
+    @property
+    def genome_count(self):
+        return self.genomes.count
+
+    @property
+    def genome_area(self):
+        return self.genomes.area
+
+    def __getstate__(self):
+        """ Everything but the worker threads, see ecosim.checkpoint.
+        """
+        state = self.__dict__.copy()
+        state['pool'] = None
+        return state
+
     def randomGenome(self):
-        seed_size = uniform(*self.seed_size_range)
-        fight, grow, seed = random(), random(), random()
+        rng = self.rng.genomes
+        seed_size = rng.uniform(*self.seed_size_range)
+        fight, grow, seed = rng.random(), rng.random(), rng.random()
         s = fight+grow+seed
 
-        attributes = np.random.rand(self.n_attributes)
+        attributes = rng.random(self.n_attributes)
         attributes /= (attributes.sum() / self.n_attributes)
 
-        color = random_color()#saturation=1.0, brightness=.7)
-        id = self.next_gen_id
-        genome = Genome(id, id, fight/s, grow/s, seed/s, seed_size, attributes, color)
-        self.genomes[genome.id] = genome
+        color = random_color(rng=rng)#saturation=1.0, brightness=.7)
+        genome = self.genomes.add(fight/s, grow/s, seed/s, seed_size, attributes, color)
         self.next_gen_id += 1
 
         return genome
@@ -97,19 +169,34 @@ class Simulation(object):
         if not self.world.isEmpty(x, y, radius):
             return None
 
-        row, col = int(y//self.grid_height), int(x//self.grid_width)
-
-        prob_starting = self.start_grid[row, col]
-        if random() > prob_starting:
+        prob_starting = self.start_map[self.start_map.cell(x, y)]
+        if self.rng.seeding.random() > prob_starting:
             return None
 
+        ind = self.addIndividual(self.next_ind_id, genome, x, y, radius)
+        self.next_ind_id += 1
+
+        # Add to spatial grid.
+        self.world.insertParticle(ind.id, x, y, radius)
+
+        return ind
+
+    def addIndividual(self, id, genome, x, y, radius):
+        """ Add an individual to the population but not to the spatial grid.
+        """
         energy = pi * radius * radius
         has_bias = False
-        attributes = genome.attributes.copy()
 
-        if self.bias_map is not None:
+        self.genomes.count[genome.id] += 1
+        self.genomes.area[genome.id] += energy
 
-            attributes *= self.bias_map[row, col]
+        # Shared by the individuals of a genome, never modified.
+        attributes = genome.attributes
+
+        if self.bias_map is not None:
+            cell = self.bias_map.cell(x, y)
+            attributes = self.genomes.biasedAttributes(genome.id, cell, \
+                                                       self.bias_map[cell])
 
         # for (bx, by, br, _), vector in zip(self.bias_areas, self.bias_vectors):
         #     bx *= self.width
@@ -120,26 +207,74 @@ class Simulation(object):
         #         has_bias = True
         #         attributes *= vector
 
-        ind = Individual(self.next_ind_id, genome, attributes, x, y, radius, \
-                         energy, self.growth_cost_multiplier, \
+        if self.population is not None:
+            return self.population.add(id, genome, attributes, x, y, radius, \
+                                       energy, has_bias)
+
+        ind = Individual(id, genome, attributes, x, y, radius, energy, \
+                         self.growth_cost_multiplier, \
                          self.seed_cost_multiplier, has_bias)
+        self.individuals[id] = ind
+        return ind
 
-        self.next_ind_id += 1
-        self.individuals[ind.id] = ind
+    def createIndividuals(self, genome_ids, xs, ys):
+        """ Batched createIndividual. Candidates are tested against the start
+            grid, then inserted into the spatial grid in order, each one
+            also checked against those accepted before it. Returns the number
+            created.
+        """
+        starting = self.rng.seeding.random(len(xs)) <= self.start_map.lookup(xs, ys)
+        genome_ids, xs, ys = genome_ids[starting], xs[starting], ys[starting]
 
-        # Add to spatial grid.
-        self.world.insertParticle(ind.id, x, y, radius)
+        radii = np.sqrt(self.genomes.seed_size[genome_ids] / pi)
 
-        return ind
+        accepted = self.world.tryInsertMany(self.next_ind_id, xs, ys, radii)
+
+        n = int(accepted.sum())
+        ids = np.arange(self.next_ind_id, self.next_ind_id + n)
+        self.next_ind_id += n
+
+        genome_ids, xs, ys = genome_ids[accepted], xs[accepted], ys[accepted]
+        radii = radii[accepted]
+
+        if self.population is not None:
+            attributes = self.genomes.attributes[genome_ids]
+
+            if self.bias_map is not None:
+                bias = self.bias_map.lookup(xs, ys)
+                if bias.ndim == 1:
+                    bias = bias[:, np.newaxis]
+                attributes *= bias
+
+            areas = pi * radii * radii
+            self.population.add_many(ids, genome_ids, attributes, xs, ys, \
+                                     radii, areas)
+            np.add.at(self.genomes.count, genome_ids, 1)
+            np.add.at(self.genomes.area, genome_ids, areas)
+        else:
+            for args in zip(ids.tolist(), genome_ids.tolist(), xs.tolist(), \
+                            ys.tolist(), radii.tolist()):
+                id, gid, x, y, radius = args
+                self.addIndividual(id, self.genomes[gid], x, y, radius)
+
+        return n
 
     def destroyIndividual(self, individual):
+        gid = individual.genome.id
+        genomes = self.genomes
+        genomes.count[gid] -= 1
+        genomes.area[gid] -= individual.area()
+        if genomes.count[gid] == 0:
+            genomes.area[gid] = 0 # Drop accumulated rounding.
+            genomes.evict(gid)
+
         individual.alive = False
         del self.individuals[individual.id]
         self.world.removeParticle(individual.id)
 
     def disturbRectangle(self):
-        x0 = random()*(self.width * (1 - self.disturbance_power))
-        y0 = random()*(self.height * (1 - self.disturbance_power))
+        x0 = self.rng.seeding.random()*(self.width * (1 - self.disturbance_power))
+        y0 = self.rng.seeding.random()*(self.height * (1 - self.disturbance_power))
         x1 = x0 + self.width*self.disturbance_power
         y1 = y0 + self.height*self.disturbance_power
 
@@ -149,22 +284,44 @@ class Simulation(object):
     def stepSpreadSeeds(self):
         """ Spread seeds.
         """
+        profile = self.profile
+        profile.start('randseed')
+
         n_randseed = int(self.n_randseed * max(0, (5000 - self.step_count) / 5000))
+        n_accepted = 0
         # if self.step_count < 5000:
         for _ in range(n_randseed):
             genome = self.randomGenome()
-            x = random() * (self.width)
-            y = random() * self.height
-            self.createIndividual(genome, x, y, genome.seed_size)
-
-        to_seed = []
-        for individual in self.individuals.values():
-            to_seed.append((individual.next_seeds, individual.genome))
-
-        for n, genome in to_seed:
-            for _ in range(n):
-                x, y = random() * self.width, random() * self.height
-                self.createIndividual(genome, x, y, genome.seed_size)
+            x = self.rng.seeding.random() * (self.width)
+            y = self.rng.seeding.random() * self.height
+            if self.createIndividual(genome, x, y, genome.seed_size) is not None:
+                n_accepted += 1
+
+        profile.count('randseed_attempted', n_randseed)
+        profile.count('randseed_accepted', n_accepted)
+        profile.start('offspring')
+
+        if self.population is not None:
+            slots = self.population.live_slots()
+            counts = self.population.next_seeds[slots]
+            parents = self.population.genome[slots]
+        else:
+            # Those killed in combat since stepGrow are gone.
+            seeders = [ind for ind in self.seeders if ind.alive]
+            counts = [ind.next_seeds for ind in seeders]
+            parents = [ind.genome.id for ind in seeders]
+            self.seeders = []
+
+        genome_ids = np.repeat(np.asarray(parents, dtype='int64'), counts)
+        n = len(genome_ids)
+
+        if n > 0:
+            xs = self.rng.seeding.random(n) * self.width
+            ys = self.rng.seeding.random(n) * self.height
+            n_accepted = self.createIndividuals(genome_ids, xs, ys)
+
+            profile.count('offspring_attempted', n)
+            profile.count('offspring_accepted', n_accepted)
 
     def distance(self, x1, y1, x2, y2):
         """ Distance function with periodic boundaries #TODO.
@@ -188,12 +345,81 @@ class Simulation(object):
         return self.world.query(x0, y0, x1, y1)
         # return self.world.queryCircle(individual.x, individual.y, individual.radius)
 
-    def step(self):
-        for individual in self.individuals.values():
-            individual.blocked = False
+    def stepGrow(self):
+        """ Reset blocked flags, roll random death and grow every surviving
+            individual, the first phase of step_order batched. Growth is done
+            for all individuals before any combat so it has no ordering
+            dependency between them. Returns the list of individuals that
+            died.
+
+            This is a different model from the default interleaved order (see
+            stepCombat): an individual that loses a fight this step has still
+            rolled random death, grown and made seeds, and combat sees
+            neighbours that have already grown.
+        """
+        to_kill = []
 
-        # Store in seperate list to avoid editing dict during iteration.
+        if self.population is not None:
+            pop = self.population
+            pop.blocked[:] = False
+
+            slots = pop.live_slots()
+            died = self.rng.death.random(len(slots)) < self.p_death
+            pop.alive[slots[died]] = False
+            to_kill.extend(pop[id] for id in pop.id[slots[died]].tolist())
+
+            growing = slots[~died]
+            area_before = pi * pop.radius[growing] * pop.radius[growing]
+            pop.update(growing)
+            self.addGenomeArea(pop.genome[growing], \
+                               pi * pop.radius[growing] * pop.radius[growing] - \
+                               area_before)
+
+            for id, radius in zip(pop.id[growing].tolist(), \
+                                  pop.radius[growing].tolist()):
+                self.world.updateRadius(id, radius)
+
+        else:
+            seeders = self.seeders = []
+
+            for individual in self.individuals.values():
+                individual.blocked = False
+
+                # Chance of random death.
+                if self.rng.death.random() < self.p_death:
+                    individual.alive = False
+                    to_kill.append(individual)
+                    continue
+
+                area_before = individual.area()
+                individual.update()
+                self.genomes.area[individual.genome.id] += individual.area() - \
+                                                           area_before
+                self.updateRadius(individual)
+
+                if individual.next_seeds:
+                    seeders.append(individual)
+
+        self.profile.count('deaths', len(to_kill))
+        return to_kill
+
+    def stepCombat(self, died=None):
+        """ Every individual, in id order, fights the others it overlaps.
+            Returns the individuals killed.
+
+            With died, a list, this is the interleaved step of the model
+            instead of the combat after stepGrow: every individual that has
+            not lost a fight yet rolls random death, appended to died, and
+            grows right before its own fights. Losers neither grow nor roll
+            death and seed again with the seeds of their last growth.
+        """
+        interleaved = died is not None
         to_kill = []
+        n_fights = 0
+
+        if interleaved:
+            for individual in self.individuals.values():
+                individual.blocked = False
 
         for id, individual in self.individuals.items():
 
@@ -201,18 +427,24 @@ class Simulation(object):
             if not individual.alive or individual.blocked:
                 continue
 
-            # Chance of random death.
-            if random() < self.p_death:
-                individual.alive = False
-                to_kill.append(individual)
-                continue
+            if interleaved:
+                # Chance of random death.
+                if self.rng.death.random() < self.p_death:
+                    individual.alive = False
+                    died.append(individual)
+                    continue
+
+                area_before = individual.area()
+                individual.update()
+                self.genomes.area[individual.genome.id] += individual.area() - \
+                                                           area_before
 
-            # Update individuals.
-            individual.update()
+            # Query by individuals new size. Fought in id order, the set's
+            # order depends on how the index stores particles.
+            candidates = self.world.queryCircle(individual.x, individual.y, \
+                                                individual.radius)
 
-            # Query by individuals new size.
-            for id_other in self.world.queryCircle(individual.x, individual.y, \
-                                                            individual.radius):
+            for id_other in sorted(candidates):
                 if id_other == id:
                     continue
 
@@ -224,12 +456,15 @@ class Simulation(object):
                 dist = self.distance(individual.x, individual.y, ind_other.x, \
                                                                 ind_other.y)
 
-                winner, loser = individual.combat(ind_other)
+                winner, loser = individual.combat(ind_other, self.rng.combat)
+                n_fights += 1
 
                 # The loser shrinks.
                 loser.blocked = True
 
+                area_before = loser.area()
                 loser.radius = (dist - winner.radius) * .95
+                self.genomes.area[loser.genome.id] += loser.area() - area_before
 
                 killed = loser.radius <= loser.start_radius
 
@@ -237,20 +472,195 @@ class Simulation(object):
                     loser.alive = False
                     to_kill.append(loser)
 
+                # Grown radii are already in the grid, only losers change.
+                if not killed:
+                    self.updateRadius(loser)
+
                 # Stop checking others if this individual lost.
                 if loser is individual:
                     break
 
-                if loser is not individual and not killed:
-                    self.updateRadius(loser)
-
-            if individual.alive:
+            # The grown radius of a winner.
+            if interleaved and individual.alive and not individual.blocked:
                 self.updateRadius(individual)
 
+        if interleaved:
+            self.seeders = [ind for ind in self.individuals.values() \
+                            if ind.next_seeds]
+            self.profile.count('deaths', len(died))
+
+        self.profile.count('fights', n_fights)
+        return to_kill
+
+    def stepCombatArrays(self, died=None):
+        """ stepCombat on the population arrays, died as there. The loop runs
+            in combat.combat_serial, which draws from the same streams in
+            the same order, so results are identical to stepCombat.
+        """
+        pop = self.population
+        death = None if died is None else self.rng.death
+
+        killed, died_slots, n_fights = combat_serial(self.world, pop, \
+                                                     self.genomes.area, \
+                                                     self.rng.combat, death, \
+                                                     self.p_death)
+
+        if died is not None:
+            died.extend(IndividualView(pop, slot) for slot in died_slots)
+            self.profile.count('deaths', len(died))
+
+        self.profile.count('fights', n_fights)
+        return [IndividualView(pop, slot) for slot in killed]
+
+    def stepCombatTiled(self):
+        """ Parallel stepCombat. The overlap graph is split into connected
+            components, which never interact. Components inside one tile of
+            the world are resolved concurrently by the worker threads, the
+            ones crossing tile edges afterwards in one deterministic pass.
+            Fights are decided by combat.fight_roll from a key drawn once per
+            step from the combat stream, so results do not depend on the number of workers.
+            Returns the individuals killed.
+        """
+        pop = self.population
+        slots = pop.live_slots()
+        ids = pop.id[slots]
+
+        # Compact to id order, the kernels index by rank.
+        x, y = pop.x[slots], pop.y[slots]
+        radius = pop.radius[slots]
+        start_radius = pop.start_radius[slots]
+        alive = pop.alive[slots].view('uint8')
+        blocked = pop.blocked[slots].view('uint8')
+        attributes = pop.attributes[slots]
+        fight = pop.fight[slots]
+
+        offsets, neighbours = self.world.overlaps(ids.astype('int32'))
+        neighbours = np.searchsorted(ids, neighbours).astype('int32')
+        labels = components(offsets, neighbours, alive)
+
+        # Tile of each component, -1 if it crosses a tile edge.
+        bounds = np.array([x - radius, y - radius, x + radius, y + radius])
+        np.minimum.at(bounds[0], labels, x - radius)
+        np.minimum.at(bounds[1], labels, y - radius)
+        np.maximum.at(bounds[2], labels, x + radius)
+        np.maximum.at(bounds[3], labels, y + radius)
+        tiles = np.floor(bounds / self.tile_size).astype('int64')
+
+        n_tiles_x = int(np.ceil(self.width / self.tile_size))
+        interior = (tiles[0] == tiles[2]) & (tiles[1] == tiles[3])
+        unit = np.where(interior, tiles[1] * n_tiles_x + tiles[0], -1)[labels]
+
+        order = np.argsort(unit, kind='stable').astype('int32')
+        units, starts = np.unique(unit[order], return_index=True)
+        groups = np.split(order, starts[1:])
+
+        boundary = []
+        if len(units) and units[0] == -1:
+            boundary = groups.pop(0)
+
+        radius_before = radius.copy()
+        alive_before = alive.copy()
+        key = self.rng.combat.randbits64()
+
+        def resolve(ranks):
+            resolve_combats(ranks, offsets, neighbours, x, y, radius, \
+                            start_radius, alive, blocked, attributes, fight, \
+                            ids, key)
+
+        if self.pool is None:
+            self.pool = ThreadPool(self.n_workers)
+
+        self.pool.map(resolve, groups)
+
+        if len(boundary):
+            resolve(boundary)
+
+        changed = np.flatnonzero(radius != radius_before)
+        self.addGenomeArea(pop.genome[slots[changed]], \
+                           pi * radius[changed] * radius[changed] - \
+                           pi * radius_before[changed] * radius_before[changed])
+
+        pop.radius[slots] = radius
+        pop.alive[slots] = alive.view(bool)
+        pop.blocked[slots] = blocked.view(bool)
+
+        updated = np.flatnonzero((radius != radius_before) & (alive == 1))
+        for i in updated:
+            self.world.updateRadius(int(ids[i]), radius[i])
+
+        killed = np.flatnonzero((alive_before == 1) & (alive == 0))
+        return [pop[id] for id in ids[killed].tolist()]
+
+    def addGenomeArea(self, genome_ids, delta):
+        """ Add delta[i] to the total area of genome_ids[i].
+        """
+        self.genomes.area += np.bincount(genome_ids, delta, \
+                                         minlength=len(self.genomes.area))
+
+    def liveGenomes(self):
+        """ Ids of the genomes with living individuals.
+        """
+        return self.genomes.live()
+
+    def genomeTotals(self):
+        """ Count and total area of every genome with living individuals,
+            counted afresh rather than read from the running totals, which
+            pick up rounding. Returns (ids, counts, areas) with the genomes
+            in order of their first individual by id and areas summed in id
+            order, as History has always logged them.
+        """
+        if self.population is not None:
+            pop = self.population
+            slots = pop.live_slots()
+            genome_ids = pop.genome[slots]
+            areas = pi * pop.radius[slots] * pop.radius[slots]
+        else:
+            individuals = self.individuals.values()
+            genome_ids = np.array([ind.genome.id for ind in individuals], dtype='int64')
+            areas = np.array([ind.area() for ind in individuals])
+
+        ids, first, inverse = np.unique(genome_ids, return_index=True, \
+                                        return_inverse=True)
+        order = np.argsort(first)
+        counts = np.bincount(inverse, minlength=len(ids))
+        totals = np.bincount(inverse, areas, minlength=len(ids))
+        return ids[order], counts[order], totals[order]
+
+    def step(self):
+        profile = self.profile
+        index_before = self.world.counters()
+
+        # Store in seperate list to avoid editing dict during iteration.
+        if self.step_order == 'interleaved':
+            # Growth happens within combat and is timed as part of it.
+            to_kill = []
+            profile.start('combat')
+            if self.population is not None:
+                killed = self.stepCombatArrays(died=to_kill)
+            else:
+                killed = self.stepCombat(died=to_kill)
+        else:
+            profile.start('grow')
+            to_kill = self.stepGrow()
+
+            profile.start('combat')
+            if self.n_workers:
+                killed = self.stepCombatTiled()
+            elif self.population is not None:
+                killed = self.stepCombatArrays()
+            else:
+                killed = self.stepCombat()
+        to_kill.extend(killed)
+
+        profile.start('destroy')
         for individual in to_kill:
             self.destroyIndividual(individual)
+        profile.count('killed', len(killed))
 
         self.stepSpreadSeeds()
+        profile.stop()
+        profile.count('steps')
+        profile.count_index(index_before, self.world.counters())
 
         self.step_count += 1
 
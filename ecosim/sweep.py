@@ -0,0 +1,163 @@
+""" Run a base config over a grid of parameter values and replicate seeds,
+    packed onto a process pool. Every run gets its own directory under the
+    sweep output dir and writes summary.json once it finishes, so an
+    interrupted sweep can be restarted and only reruns what is missing.
+"""
+from __future__ import print_function, division
+import ast
+import csv
+import itertools
+import json
+import multiprocessing
+import shutil
+import sys
+import traceback
+from os import path, makedirs
+
+from ecosim.main import main
+from ecosim.rasters import preload
+
+def parse_param(base_config, arg):
+    """ 'name=v1,v2,...' -> (name, [v1, v2, ...]). Values are Python
+        literals, like (1.0, 2.0) or None, except for string config keys.
+    """
+    name, _, values = arg.partition('=')
+    if name not in base_config:
+        raise KeyError('Unknown config key: '+name)
+
+    default = base_config[name]
+    if isinstance(default, str):
+        return name, values.split(',')
+
+    try:
+        values = ast.literal_eval('[%s]' % values)
+    except (ValueError, SyntaxError):
+        raise ValueError('Invalid values for %s: %s' % (name, values))
+
+    if isinstance(default, float):
+        values = [float(v) if isinstance(v, int) else v for v in values]
+    return name, values
+
+def expand_grid(base_config, grid, replicates, seed=0):
+    """ Return a list of (name, replicate, seed, config) runs for every
+        combination of the values in grid (a list of (key, values) pairs)
+        times replicates seeds. Replicate i runs with seed + i whatever the
+        grid, so editing the grid does not change the seeds of earlier runs
+        and all combinations share the same seeds.
+    """
+    keys = [key for key, _ in grid]
+    for key in keys:
+        if key not in base_config:
+            raise KeyError('Unknown config key: '+key)
+        if key == 'seed':
+            raise ValueError('seed can not be swept, use replicates')
+
+    runs = []
+    for values in itertools.product(*[values for _, values in grid]):
+        params = dict(zip(keys, values))
+        name = '_'.join('%s=%s' % (k, v) for k, v in zip(keys, values)) or 'base'
+
+        for replicate in range(replicates):
+            config = dict(base_config)
+            config.update(params)
+            config['seed'] = seed + replicate
+            runs.append((name, replicate, config['seed'], config))
+
+    return runs
+
+def run_dir(out_dir, name, replicate):
+    return path.join(out_dir, name, 'rep_%i' % replicate)
+
+def run_one(args):
+    """ Pool worker. Run a single configuration and record its outcome in
+        summary.json, or error.txt if it raised.
+    """
+    out_dir, name, replicate, seed, config, steps, intervals = args
+    log_interval, img_interval, draw_scale, archive_interval = intervals
+    rdir = run_dir(out_dir, name, replicate)
+
+    record = {'run': name, 'replicate': replicate, 'seed': seed}
+
+    try:
+        stats = main(config, steps, path.join(rdir, 'sim'), log_interval,
+                     img_interval, draw_scale, archive_interval)
+    except Exception:
+        with open(path.join(rdir, 'error.txt'), 'w') as ferr:
+            ferr.write(traceback.format_exc())
+        record['status'] = 'failed'
+        return record
+
+    record.update(stats)
+    record['status'] = 'done'
+
+    with open(path.join(rdir, 'summary.json'), 'w') as fsummary:
+        json.dump(record, fsummary)
+
+    return record
+
+def sweep(base_config, grid, steps, out_dir, replicates=1, seed=0,
+          processes=None, log_interval=-1, img_interval=-1, draw_scale=3.0,
+          archive_interval=-1):
+    """ Run every configuration of the sweep that has not finished yet and
+        write summary.csv of all runs to out_dir. Returns the summary rows.
+    """
+    runs = expand_grid(base_config, grid, replicates, seed)
+    intervals = (log_interval, img_interval, draw_scale, archive_interval)
+    keys = [key for key, _ in grid]
+
+    records = dict()
+    todo = []
+
+    for name, replicate, run_seed, config in runs:
+        rdir = run_dir(out_dir, name, replicate)
+        summary_path = path.join(rdir, 'summary.json')
+
+        if path.exists(summary_path):
+            with open(summary_path) as fsummary:
+                record = json.load(fsummary)
+
+            # Done with another seed, the base seed changed since.
+            if record['seed'] == run_seed:
+                records[(name, replicate)] = record
+                continue
+
+        # Skipped or failed runs leave a partial directory behind.
+        if path.exists(rdir):
+            shutil.rmtree(rdir)
+        makedirs(rdir)
+
+        todo.append((out_dir, name, replicate, run_seed, config, steps, intervals))
+
+    print('Sweep: %i runs, %i already done.' % (len(runs), len(records)))
+
+    if todo:
+        # Forked workers inherit the mapped rasters instead of loading their own.
+        for run in todo:
+            preload(run[4])
+
+        pool = multiprocessing.Pool(processes)
+        try:
+            for record in pool.imap_unordered(run_one, todo):
+                records[(record['run'], record['replicate'])] = record
+                print('%s rep %i: %s' % (record['run'], record['replicate'],
+                                        record['status']))
+                sys.stdout.flush()
+        finally:
+            pool.close()
+            pool.join()
+
+    fields = ['run', 'replicate', 'seed'] + keys + \
+             ['status', 'steps', 'n_individuals', 'n_genomes', 'time']
+    rows = []
+
+    for name, replicate, run_seed, config in runs:
+        row = dict(records[(name, replicate)])
+        row.update((key, config[key]) for key in keys)
+        rows.append(row)
+
+    with open(path.join(out_dir, 'summary.csv'), 'w') as fcsv:
+        writer = csv.DictWriter(fcsv, fields, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+
+    return rows
@@ -10,11 +10,13 @@ import colorsys
 def area_to_radius(area):
 	return sqrt(area/pi)
 
-def random_color(base=None, saturation=.50, brightness=.90):
-	""" Returns a 3-tuple of integers in range [0, 255]
+def random_color(base=None, saturation=.50, brightness=.90, rng=None):
+	""" Returns a 3-tuple of integers in range [0, 255]. The hue is drawn
+		from rng (a RandomStream) if given, else the random module.
 	"""
 	if base is None:
-		r, g, b = colorsys.hsv_to_rgb(random(), saturation, brightness)
+		hue = random() if rng is None else rng.random()
+		r, g, b = colorsys.hsv_to_rgb(hue, saturation, brightness)
 		return int(r*255), int(g*255), int(b*255)
 	else:
 		r2, g2, b2 = base
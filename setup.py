@@ -14,7 +14,10 @@ import numpy
 extensions = [
     Extension('ecosim.collisiongrid.collision_gridx',
              ['ecosim/collisiongrid/collision_gridx.pyx']),
+    Extension('ecosim.collisiongrid.multi_gridx',
+             ['ecosim/collisiongrid/multi_gridx.pyx']),
     Extension('ecosim.individual', ['ecosim/individual.pyx']),
+    Extension('ecosim.combat', ['ecosim/combat.pyx']),
 ]
 
 setup(
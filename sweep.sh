@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+from __future__ import print_function, division
+import argparse
+from os import path, makedirs
+
+from ecosim.config import read_config
+from ecosim.sweep import parse_param, sweep
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("steps", help="Number of steps to run for.", type=int)
+    parser.add_argument("out", help="Path for output files.")
+    parser.add_argument("config", help="Path to base config file.")
+
+    parser.add_argument('--param', action='append', default=[],
+                        help='name=v1,v2,... values to sweep, may be repeated')
+    parser.add_argument('--replicates', type=int, default=1,
+                        help='number of seeds per configuration, default=1')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='seed of the first replicate, default=0')
+    parser.add_argument('--processes', type=int, default=None,
+                        help='number of worker processes, default=all cores')
+    parser.add_argument('--draw_scale', type=float, default=3.0,
+                        help='world to pixel scale, default=3')
+    parser.add_argument('--log_interval', type=int, default=-1,
+                        help='number of iterations between print, default=-1')
+    parser.add_argument('--archive_interval', type=int, default=-1,
+                        help='number of iterations between each archive, default=-1')
+    parser.add_argument('--img_interval', type=int, default=-1,
+                        help='number of iterations between each image, default=-1')
+    args = parser.parse_args()
+
+    base_config = read_config(args.config)
+    grid = [parse_param(base_config, p) for p in args.param]
+
+    if not path.exists(args.out):
+        makedirs(args.out)
+
+    sweep(base_config, grid, args.steps, args.out, args.replicates, args.seed,
+          args.processes, args.log_interval, args.img_interval,
+          args.draw_scale, args.archive_interval)
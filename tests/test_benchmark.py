@@ -0,0 +1,69 @@
+import os
+import shutil
+import tempfile
+import unittest
+from ecosim import benchmark
+from ecosim.collisiongrid.collision_gridx import CollisionGrid
+
+CONFIG = """[simulation]
+width = 60
+height = 60
+n_start = 50
+p_death = .0078125
+n_randseed = 4
+p_disturbance = 0.0
+disturbance_power = 0
+seed_cost_multiplier = 40
+growth_cost_multiplier = 20
+start_map =
+bias_map =
+
+[genome]
+n_attributes = 5
+min_seed_size = 1.0
+max_seed_size = 3.0
+"""
+
+class TestBenchmark(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.config = os.path.join(self.dir, 'tiny.config')
+        with open(self.config, 'w') as fout:
+            fout.write(CONFIG)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_run_and_compare(self):
+        def fail():
+            raise ValueError('broken')
+
+        suite = [('index/CollisionGrid/mixed/200',
+                  lambda: benchmark.bench_index(CollisionGrid, 200, 'mixed', size=100)),
+                 ('individuals', lambda: benchmark.bench_individuals(200)),
+                 ('broken', fail)]
+        for name, function in benchmark.benchmarks([self.config], warmup=2, steps=2):
+            if name.startswith(('simulation/', 'history/')):
+                suite.append((name, function))
+
+        results = benchmark.run(suite)
+        self.assertEqual(results['results']['broken'], {'error': "ValueError('broken')"})
+        for name in ('index/CollisionGrid/mixed/200/queryCircle',
+                     'individuals/Population.update', 'simulation/tiny/objects/step',
+                     'simulation/tiny/arrays/step', 'history/tiny/HistoryDelta'):
+            self.assertGreater(results['results'][name]['rate'], 0)
+            self.assertGreater(results['results'][name]['peak_bytes'], 0)
+
+        filepath = os.path.join(self.dir, 'results.json')
+        benchmark.save(results, filepath)
+        old = benchmark.load(filepath)
+        self.assertEqual(old['results'], results['results'])
+        self.assertEqual(benchmark.compare(old, old), [])
+
+        # Half the rate of one benchmark is a regression.
+        new = benchmark.load(filepath)
+        new['results']['individuals/Individual.update']['rate'] /= 2
+        self.assertEqual(benchmark.compare(old, new), ['individuals/Individual.update'])
+
+if __name__ == '__main__':
+    unittest.main()
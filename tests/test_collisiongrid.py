@@ -1,5 +1,10 @@
 import unittest
+import pickle
+import random
+from math import hypot
+import numpy as np
 from ecosim.collisiongrid.collision_gridx import CollisionGrid
+from ecosim.collisiongrid.multi_gridx import MultiGrid
 
 class TestRandomlyDistribute(unittest.TestCase):
     def test_init(self):
@@ -26,6 +31,15 @@ class TestRandomlyDistribute(unittest.TestCase):
         world.grid_remove(1, 0, 0)
         self.assertEqual(world.get_block(0, 0), [])
 
+    def test_grid_grow_and_swap_remove(self):
+        world = CollisionGrid(20, 20, 1)
+        for id in range(10):
+            world.grid_add(id, 3, 4)
+        for id in (0, 5, 9):
+            world.grid_remove(id, 3, 4)
+        self.assertEqual(sorted(world.get_block(3, 4)), [1, 2, 3, 4, 6, 7, 8])
+        self.assertRaises(KeyError, world.grid_remove, 5, 3, 4)
+
     def test_add_particle(self):
         world = CollisionGrid(20, 20, 1)
         world.insertParticle(id=0, x=10, y=10, r=1)
@@ -45,6 +59,135 @@ class TestRandomlyDistribute(unittest.TestCase):
         print(world.isEmpty(5, 5, 1))
         print(world.query(9, 9, 11, 11))
 
+    def test_update_radius_matches_insert(self):
+        def cells(world):
+            return [sorted(world.get_block(x, y)) for y in range(20) for x in range(20)]
+
+        world = CollisionGrid(20, 20, 1)
+        world.insertParticle(id=0, x=10.2, y=9.7, r=.4)
+        world.insertParticle(id=1, x=2.5, y=17.5, r=1)
+
+        for r in (3.1, 6.5, 1.2, 11, .3):
+            world.updateRadius(0, r)
+            world.updateRadius(1, r)
+            fresh = CollisionGrid(20, 20, 1)
+            fresh.insertParticle(id=0, x=10.2, y=9.7, r=r)
+            fresh.insertParticle(id=1, x=2.5, y=17.5, r=r)
+            self.assertEqual(cells(world), cells(fresh))
+
+    def test_particles(self):
+        world = CollisionGrid(20, 20, 1)
+        world.insertParticle(id=3, x=10, y=10, r=1)
+        world.insertParticle(id=5000, x=5, y=5, r=2)
+        world.updateRadius(3, 1.5)
+        world.removeParticle(5000)
+
+        self.assertEqual(len(world.particles), 1)
+        self.assertTrue(3 in world.particles)
+        self.assertFalse(5000 in world.particles)
+        self.assertEqual(world.particles[3], (10, 10, 1.5))
+        self.assertEqual(list(world.particles), [3])
+        self.assertRaises(KeyError, world.removeParticle, 5000)
+
+    def test_try_insert_many(self):
+        world = CollisionGrid(20, 20, 1)
+        world.insertParticle(id=0, x=5, y=5, r=1)
+
+        xs = np.array([5.5, 10.0, 10.5, 15.0])
+        ys = np.array([5.5, 10.0, 10.5, 15.0])
+        rs = np.array([1.0, 1.0, 1.0, 1.0])
+        accepted = world.tryInsertMany(1, xs, ys, rs)
+
+        # Overlaps the existing particle, then the first accepted candidate.
+        self.assertEqual(accepted.tolist(), [False, True, False, True])
+        self.assertEqual(world.queryCircle(10, 10, .1), set([1]))
+        self.assertEqual(world.queryCircle(15, 15, .1), set([2]))
+
+    def test_pickle_keeps_cell_order(self):
+        for cls in (CollisionGrid, MultiGrid):
+            world = cls(20, 20, 1)
+            for id in range(6):
+                world.insertParticle(id, 10 + id * .1, 10, 1 + id)
+            world.removeParticle(1)
+
+            copy = pickle.loads(pickle.dumps(world))
+            self.assertEqual(copy.getState()['cell_ids'].tolist(),
+                             world.getState()['cell_ids'].tolist())
+            self.assertEqual(dict(copy.particles.items()),
+                             dict(world.particles.items()))
+            copy.removeParticle(5)
+            self.assertEqual(copy.queryCircle(10, 10, 1), set([0, 2, 3, 4]))
+
+    def test_coverage_raster(self):
+        def brute_force(points):
+            corners = np.arange(21.0)
+            coverage = np.zeros((20, 20), dtype='int32')
+            for x, y, r in points.values():
+                inside = np.hypot(corners[np.newaxis] - x, corners[:, np.newaxis] - y) < \
+                         r * (1 - 1e-9)
+                coverage += inside[:-1, :-1] & inside[1:, :-1] & \
+                            inside[:-1, 1:] & inside[1:, 1:]
+            return coverage.tolist()
+
+        for cls in (CollisionGrid, MultiGrid):
+            rand = random.Random(1)
+            world = cls(20, 20, 1)
+            points = dict()
+
+            for id in range(60):
+                x, y, r = rand.random() * 20, rand.random() * 20, rand.random() * 4
+                world.insertParticle(id, x, y, r)
+                points[id] = (x, y, r)
+            for id in range(0, 60, 4):
+                world.removeParticle(id)
+                del points[id]
+            for id in range(1, 60, 4):
+                x, y, r = points[id]
+                r = r * rand.choice([.5, 1.5])
+                world.updateRadius(id, r)
+                points[id] = (x, y, r)
+
+            self.assertEqual(world.coverage_raster.tolist(), brute_force(points))
+            copy = pickle.loads(pickle.dumps(world))
+            self.assertEqual(copy.coverage_raster.tolist(), brute_force(points))
+
+            for _ in range(500):
+                x, y, r = rand.random() * 20, rand.random() * 20, rand.random()
+                empty = all(hypot(x - px, y - py) >= r + pr
+                            for px, py, pr in points.values())
+                self.assertEqual(world.isEmpty(x, y, r), empty)
+
+class TestMultiGrid(unittest.TestCase):
+    def test_matches_brute_force(self):
+        rand = random.Random(0)
+        world = MultiGrid(40, 40, 1)
+        points = dict()
+
+        for id in range(300):
+            x, y = rand.random() * 40, rand.random() * 40
+            r = rand.random() ** 4 * 15
+            world.insertParticle(id, x, y, r)
+            points[id] = (x, y, r)
+
+        for id in range(0, 300, 3):
+            world.removeParticle(id)
+            del points[id]
+
+        for id in range(1, 300, 3):
+            x, y, r = points[id]
+            r = rand.random() ** 4 * 15
+            world.updateRadius(id, r)
+            points[id] = (x, y, r)
+
+        for _ in range(200):
+            x, y, r = rand.random() * 40, rand.random() * 40, rand.random() * 5
+            expected = set(id for id, (x2, y2, r2) in points.items()
+                           if hypot(x - x2, y - y2) < r + r2)
+            self.assertEqual(world.queryCircle(x, y, r), expected)
+            self.assertEqual(world.isEmpty(x, y, r), not expected)
+
+        self.assertEqual(len(world.particles), len(points))
+        self.assertEqual(world.query(0, 0, 40, 40), set(points))
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+import numpy as np
+from ecosim.combat import components, fight_roll, resolve_combats, win_probabilities
+from ecosim.individual import Individual
+from ecosim.genomes import Genome
+
+class TestCombat(unittest.TestCase):
+    def test_fight_roll(self):
+        self.assertEqual(fight_roll(1, 2, 3), fight_roll(1, 2, 3))
+        self.assertNotEqual(fight_roll(1, 2, 3), fight_roll(1, 3, 2))
+        rolls = [fight_roll(7, i, 0) for i in range(1000)]
+        self.assertTrue(0 <= min(rolls) and max(rolls) < 1)
+        self.assertAlmostEqual(np.mean(rolls), .5, places=1)
+
+    def test_components(self):
+        # 0-1-2 chain, 3 alone, 4-5 linked only through dead 6.
+        edges = {0: [1], 1: [0, 2], 2: [1], 3: [], 4: [6], 5: [6], 6: [4, 5]}
+        offsets = np.cumsum([0] + [len(edges[i]) for i in range(7)]).astype('int32')
+        neighbours = np.array(sum([edges[i] for i in range(7)], []), dtype='int32')
+        alive = np.array([1, 1, 1, 1, 1, 1, 0], dtype='uint8')
+        labels = components(offsets, neighbours, alive)
+        self.assertEqual(labels.tolist(), [0, 0, 0, 3, 4, 5, 6])
+
+    def test_resolve_combats(self):
+        x = np.array([0.0, 1.5])
+        y = np.array([0.0, 0.0])
+        radius = np.array([1.0, 1.0])
+        start_radius = np.array([.1, .1])
+        alive = np.ones(2, dtype='uint8')
+        blocked = np.zeros(2, dtype='uint8')
+        attributes = np.array([[1.0, 1.0], [1.0, 1.0]])
+        fight = np.array([1.0, 1.0])
+        ids = np.array([10, 11], dtype='int64')
+        offsets = np.array([0, 1, 2], dtype='int32')
+        neighbours = np.array([1, 0], dtype='int32')
+
+        resolve_combats(np.array([0, 1], dtype='int32'), offsets, neighbours,
+                        x, y, radius, start_radius, alive, blocked,
+                        attributes, fight, ids, 3)
+
+        # Equal strength, the roll decides. Exactly one lost and shrank.
+        loser = 1 if fight_roll(3, 10, 11) < .5 else 0
+        self.assertEqual(blocked.tolist(), [loser == 0, loser == 1])
+        self.assertAlmostEqual(radius[loser], (1.5 - 1.0) * .95)
+        self.assertEqual(radius[1 - loser], 1.0)
+
+    def test_win_probabilities(self):
+        rand = np.random.RandomState(0)
+        n = 20
+        attributes = rand.random_sample((n, 4))
+        radius = 1 + rand.random_sample(n) * 5
+        fight = rand.random_sample(n)
+        individuals = [Individual(i, Genome(i, i, fight[i], .5, .5, 2, None, None),
+                                  attributes[i], 0, 0, radius[i], 0, 1, 1, False)
+                       for i in range(n)]
+
+        a = rand.randint(0, n, 50).astype('int64')
+        b = rand.randint(0, n, 50).astype('int64')
+        expected = [individuals[i].combatWinProbability(individuals[j])
+                    for i, j in zip(a.tolist(), b.tolist())]
+        p = win_probabilities(a, b, attributes, radius, fight)
+        self.assertEqual(p.tolist(), expected)
+
+if __name__ == '__main__':
+    unittest.main()
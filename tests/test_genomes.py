@@ -0,0 +1,41 @@
+import unittest
+import numpy as np
+from ecosim.genomes import GenomeTable
+
+class TestGenomeTable(unittest.TestCase):
+    def test_add_and_lookup(self):
+        table = GenomeTable(3, capacity=2)
+        genomes = [table.add(.2, .5, .3, 1.5 + i, np.arange(3.0) + i, (i, 2, 3))
+                   for i in range(5)]
+        self.assertEqual(len(table), 5)
+        self.assertTrue(4 in table)
+        self.assertFalse(5 in table)
+        self.assertRaises(KeyError, lambda: table[5])
+
+        for genome in genomes:
+            stored = table[genome.id]
+            self.assertEqual(stored.parent, genome.id)
+            self.assertEqual(stored.seed_size, genome.seed_size)
+            self.assertEqual(stored.attributes.tolist(), genome.attributes.tolist())
+            self.assertEqual(stored.color, genome.color)
+
+    def test_eviction(self):
+        table = GenomeTable(2)
+        genome = table.add(.2, .5, .3, 1.5, np.ones(2), (0, 0, 0))
+        self.assertIsNot(table[genome.id], table[genome.id])
+
+        table.count[genome.id] = 1
+        self.assertIs(table[genome.id], table[genome.id])
+        biased = table.biasedAttributes(genome.id, (0, 1), np.array([2.0, 3.0]))
+        self.assertEqual(biased.tolist(), [2.0, 3.0])
+        self.assertIs(table.biasedAttributes(genome.id, (0, 1), None), biased)
+        self.assertEqual(table.live().tolist(), [genome.id])
+
+        table.count[genome.id] = 0
+        table.evict(genome.id)
+        self.assertEqual(table._tuples, {})
+        self.assertEqual(table._biased, {})
+        self.assertEqual(table[genome.id].fight, .2)
+
+if __name__ == '__main__':
+    unittest.main()
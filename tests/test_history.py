@@ -0,0 +1,140 @@
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from ecosim.genomes import Genome
+from ecosim.history import ArchiveWriter, DeltaHistoryReader, HistoryDelta, \
+                           HistoryReader, NpyAppender
+
+class TestHistory(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_npy_appender(self):
+        filepath = os.path.join(self.dir, 'rows.npy')
+        appender = NpyAppender(filepath, 'float16', (3,))
+        rows = np.arange(30, dtype='float16').reshape(10, 3)
+        appender.append(rows[:4])
+        appender.append(rows[4:4])
+        appender.append(rows[4:])
+        appender.close()
+
+        loaded = np.load(filepath, mmap_mode='r')
+        self.assertEqual(loaded.dtype, np.float16)
+        self.assertTrue(np.array_equal(loaded, rows))
+
+    def test_npy_appender_resume(self):
+        filepath = os.path.join(self.dir, 'rows.npy')
+        appender = NpyAppender(filepath, 'uint32', (2,))
+        appender.append(np.ones((3, 2)))
+        saved = pickle.dumps(appender)
+        appender.append(np.zeros((5, 2)))
+        appender.file.close()
+
+        # Rows written after the pickle are dropped.
+        appender = pickle.loads(saved)
+        appender.append(np.full((1, 2), 2))
+        appender.close()
+        self.assertEqual(np.load(filepath).tolist(), [[1, 1]] * 3 + [[2, 2]])
+
+    def test_reader(self):
+        # Three steps: genomes 5 and 9, then 9, then 5 and an empty 9.
+        ints = np.array([[0, 5], [1, 9], [1, 9], [2, 5], [3, 9]], dtype='uint32')
+        floats = np.array([[0, 0, 1], [0, 0, 2], [0, 0, 3], [0, 0, 4], [0, 0, 0]],
+                          dtype='float16')
+        genome_ints = np.zeros((2, 6), dtype='uint32')
+        genome_ints[:, 0] = [9, 5]
+        arrays = {'step_breaks': np.array([2, 3, 5], dtype='uint32'),
+                  'ints': ints, 'floats': floats, 'genome_ints': genome_ints,
+                  'genome_floats': np.zeros((2, 4), dtype='float32')}
+        for name, array in arrays.items():
+            np.save(os.path.join(self.dir, name+'.npy'), array)
+
+        history = HistoryReader(self.dir, chunk_rows=2)
+        self.assertEqual(len(history), 3)
+        self.assertEqual(history.frame(1).area.tolist(), [3])
+        self.assertEqual(history.genome_ids.tolist(), [5, 9])
+
+        totals = history.genome_totals()
+        self.assertEqual(totals.steps.tolist(), [0, 1, 2])
+        self.assertEqual(list(zip(totals.genome.tolist(), totals.step.tolist())),
+                         [(0, 0), (0, 2), (1, 0), (1, 1), (1, 2)])
+        count, area = totals.dense([0, 1])
+        self.assertEqual(count.tolist(), [[1, 0, 1], [1, 1, 1]])
+        self.assertEqual(area.tolist(), [[1, 0, 4], [2, 3, 0]])
+        self.assertEqual(totals.max_area().tolist(), [4, 3])
+        self.assertEqual([a.tolist() for a in totals.step_totals(exclude=[0])],
+                         [[1, 1, 1], [2, 3, 0]])
+
+        totals = history.genome_totals(skip_empty=True)
+        self.assertEqual(len(totals.genome), 4)
+        count, area = totals.dense([1])
+        self.assertEqual(count.tolist(), [[1, 1, 0]])
+        self.assertEqual(totals.dense([1, 0])[1].tolist(), [[2, 3, 0], [1, 0, 4]])
+        self.assertEqual(history.genome_totals(1, 3, 1).dense([0])[1].tolist(), [[0, 4]])
+
+        first, last = history.genome_first_last()
+        self.assertEqual(first.tolist(), [0, 0])
+        self.assertEqual(last.tolist(), [2, 2])
+
+    def test_delta_round_trip(self):
+        writer = HistoryDelta(self.dir, quantum=.25, flush_interval=2)
+        frames = [([0, 1], [3, 4], [1.0, 2.0]),
+                  ([0, 1, 2], [3, 4, 3], [1.1, 2.6, .5]),
+                  ([1, 2], [4, 3], [3.0, .6]),
+                  ([1, 2, 5], [4, 3, 4], [3.0, .2, 1.0])]
+        for ids, genome_ids, radius in frames:
+            writer.addFrame(np.array(ids), np.array(genome_ids), np.array(ids) * 2.0,
+                            np.zeros(len(ids)), np.array(radius))
+        archive = os.path.join(self.dir, 'archive')
+        writer._finish(archive, np.zeros((0, 6), 'uint32'), np.zeros((0, 4), 'float32'))
+
+        history = DeltaHistoryReader(archive)
+        self.assertEqual(len(history), 4)
+        for step in (3, 0, 1, 2, 3):
+            ids, genome_ids, radius = frames[step]
+            frame = history.frame(step)
+            self.assertEqual(frame.ids.tolist(), ids)
+            self.assertEqual(frame.genome_ids.tolist(), genome_ids)
+            self.assertEqual(frame.x.tolist(), [id * 2.0 for id in ids])
+            for area, r in zip(frame.area, radius):
+                self.assertLessEqual(abs(np.sqrt(area / np.pi) - r), .125)
+
+    def test_old_history_pickle(self):
+        genome = Genome(3, 3, .2, .5, .3, 1.5, np.ones(2), (1, 2, 3))
+        data = pickle.dumps(([[(3, 1, 2.0)]], {3: genome}), protocol=2)
+
+        # Histories written before genomes.py pickled ecosim.simulation.Genome.
+        old = data.replace(b'ecosim.genomes\nGenome', b'ecosim.simulation\nGenome')
+        self.assertNotEqual(old, data)
+        history, genomes = pickle.loads(old)
+        self.assertEqual(history, [[(3, 1, 2.0)]])
+        self.assertEqual(genomes[3].color, (1, 2, 3))
+
+    def test_archive_writer(self):
+        writer = HistoryDelta(self.dir, flush_interval=2)
+        archiver = ArchiveWriter(max_pending=1)
+        config = {'n_attributes': 1}
+
+        # Recording continues while the previous archive is written.
+        for n in range(1, 4):
+            for step in range(n):
+                writer.addFrame(np.arange(n), np.zeros(n), np.zeros(n),
+                                np.zeros(n), np.ones(n))
+            archiver.submit(writer.snapshot(os.path.join(self.dir, 'archive_%i' % n), config))
+        archiver.close()
+
+        for n in range(1, 4):
+            self.assertEqual(len(DeltaHistoryReader(os.path.join(self.dir, 'archive_%i' % n))), n)
+
+        archiver = ArchiveWriter()
+        archiver.submit(writer.snapshot(os.path.join(self.dir, 'missing', 'archive'), config))
+        self.assertRaises(OSError, archiver.close)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,14 +1,83 @@
-# import unittest
-# from main import randomly_distribute
-
-# class TestRandomlyDistribute(unittest.TestCase):
-#     def test_random_distribute(self):
-#         tokens = 10
-#         for i in range(10):
-#             groups = 5 + i
-#             result = randomly_distribute(tokens, groups)
-#             self.assertEqual(sum(result), tokens)
-#             self.assertEqual(len(result), groups)
-
-# if __name__ == '__main__':
-#     unittest.main()
+import os
+import shutil
+import stat
+import tempfile
+import unittest
+import numpy as np
+from ecosim.history import open_history
+from ecosim.main import main
+from test_simulation import small_config
+
+class TestMain(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.environ['PATH']
+
+    def tearDown(self):
+        os.environ['PATH'] = self.path
+        shutil.rmtree(self.dir)
+
+    @unittest.skipUnless(os.name == 'posix', 'needs a shell script ffmpeg')
+    def test_video(self):
+        # Stand-in ffmpeg that stores the raw frames it is piped.
+        bin_dir = os.path.join(self.dir, 'bin')
+        os.makedirs(bin_dir)
+        ffmpeg = os.path.join(bin_dir, 'ffmpeg')
+        with open(ffmpeg, 'w') as fout:
+            fout.write('#!/bin/sh\nfor last; do :; done\ncat > "$last"\n')
+        os.chmod(ffmpeg, os.stat(ffmpeg).st_mode | stat.S_IEXEC)
+        os.environ['PATH'] = bin_dir + os.pathsep + self.path
+
+        out_dir = os.path.join(self.dir, 'out')
+        video = {'fps': 30, 'decimate': 1, 'downscale': 1}
+        main(small_config(), 20, out_dir, -1, 5, 1.0, -1, video=video)
+
+        self.assertTrue(os.path.exists(os.path.join(out_dir, 'config.txt')))
+        self.assertFalse(os.path.exists(os.path.join(out_dir, 'imgs')))
+        size = os.path.getsize(os.path.join(out_dir, 'video_000000000.mp4'))
+        self.assertEqual(size, 4 * 100 * 100 * 3)
+
+    def test_history(self):
+        for history in ('full', 'delta'):
+            out_dir = os.path.join(self.dir, history)
+            main(small_config(), 30, out_dir, -1, -1, 1.0, 20, history=history)
+            self.assertEqual(len(open_history(os.path.join(out_dir, 'archive_20'))), 21)
+            self.assertEqual(len(open_history(os.path.join(out_dir, 'archive_final'))), 9)
+
+    def test_resume_after_archive(self):
+        # The last checkpoint before the crash at 230 is older than the
+        # archive at step 200, which took over the staged history.
+        for history in ('full', 'delta'):
+            out_dir = os.path.join(self.dir, history)
+            main(small_config(), 230, out_dir, -1, -1, 1.0, 200, 200, history=history)
+            main(small_config(), 240, out_dir, -1, -1, 1.0, 200, 200, resume=True, \
+                 history=history)
+
+            single_dir = os.path.join(self.dir, history+'_single')
+            main(small_config(), 240, single_dir, -1, -1, 1.0, 200, history=history)
+
+            for archive in ('archive_200', 'archive_final'):
+                resumed = open_history(os.path.join(out_dir, archive))
+                single = open_history(os.path.join(single_dir, archive))
+                self.assertEqual(len(resumed), len(single))
+                for step in range(len(single)):
+                    for a, b in zip(resumed.frame(step), single.frame(step)):
+                        self.assertTrue(np.array_equal(a, b))
+
+    def test_resume_without_checkpoint(self):
+        out_dir = os.path.join(self.dir, 'out')
+        os.makedirs(out_dir)
+        with open(os.path.join(out_dir, 'notes.txt'), 'w') as fout:
+            fout.write('keep')
+
+        self.assertRaises(IOError, main, small_config(), 10, out_dir, -1, -1, \
+                          1.0, -1, 5, resume=True)
+        self.assertTrue(os.path.exists(os.path.join(out_dir, 'notes.txt')))
+
+        # Nothing to lose, a resume starts a new run.
+        new_dir = os.path.join(self.dir, 'new')
+        main(small_config(), 10, new_dir, -1, -1, 1.0, -1, 5, resume=True)
+        self.assertTrue(os.path.exists(os.path.join(new_dir, 'checkpoint.pkl')))
+
+if __name__ == '__main__':
+    unittest.main()
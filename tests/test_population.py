@@ -0,0 +1,75 @@
+import unittest
+from collections import namedtuple
+import numpy as np
+from ecosim.population import Population
+
+Genome = namedtuple('Genome', ['id', 'parent', 'fight', 'grow', 'seed',
+                               'seed_size', 'attributes', 'color'])
+
+def make_population(capacity=4):
+    genome = Genome(0, 0, .2, .5, .3, 1.5, np.ones(3), (0, 0, 0))
+    pop = Population({0: genome}, 3, 20, 20, capacity=capacity)
+    return pop, genome
+
+class TestPopulation(unittest.TestCase):
+    def test_add(self):
+        pop, genome = make_population()
+        ind = pop.add(7, genome, np.ones(3), 1.0, 2.0, .5, .25, False)
+        self.assertEqual(len(pop), 1)
+        self.assertTrue(7 in pop)
+        self.assertEqual(ind.id, 7)
+        self.assertEqual((ind.x, ind.y, ind.radius), (1.0, 2.0, .5))
+        self.assertEqual(ind.start_radius, .5)
+        self.assertEqual(ind.seed_size, 1)
+        self.assertIs(ind.genome, genome)
+        self.assertTrue(ind.alive)
+
+    def test_remove_recycles_slot(self):
+        pop, genome = make_population()
+        for id in range(3):
+            pop.add(id, genome, np.ones(3), 1.0, 1.0, .5, .25, False)
+        slot = pop.slot(1)
+        del pop[1]
+        self.assertFalse(1 in pop)
+        ind = pop.add(3, genome, np.ones(3), 1.0, 1.0, .5, .25, False)
+        self.assertEqual(ind.slot, slot)
+        self.assertEqual(pop.keys(), [0, 2, 3])
+
+    def test_grow(self):
+        pop, genome = make_population(capacity=2)
+        for id in range(5):
+            pop.add(id, genome, np.ones(3), id, id, .5, .25, False)
+        self.assertEqual(pop.capacity, 8)
+        self.assertEqual([ind.x for ind in pop.values()], [0, 1, 2, 3, 4])
+
+    def test_view_writes_through(self):
+        pop, genome = make_population()
+        ind = pop.add(0, genome, np.ones(3), 1.0, 1.0, .5, .25, False)
+        ind.radius = 2.0
+        ind.blocked = True
+        self.assertEqual(pop.radius[ind.slot], 2.0)
+        self.assertTrue(pop[0].blocked)
+
+    def test_batch_update_matches_view_update(self):
+        rng = np.random.RandomState(0)
+        batch, genome = make_population()
+        single, _ = make_population()
+        for pop in (batch, single):
+            for id in range(50):
+                pop.add(id, genome, np.ones(3), 1.0, 1.0, .6, .5, False)
+            pop.radius[:50] = rng.rand(50) * 20
+            pop.grow[:50] = rng.rand(50)
+            pop.seed[:50] = rng.rand(50)
+            rng.seed(0)
+
+        for _ in range(10):
+            batch.update(batch.live_slots())
+            for ind in single.values():
+                ind.update()
+
+        self.assertTrue(np.array_equal(batch.radius, single.radius))
+        self.assertTrue(np.array_equal(batch.energy, single.energy))
+        self.assertTrue(np.array_equal(batch.next_seeds, single.next_seeds))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+
+from ecosim.collisiongrid.collision_gridx import CollisionGrid
+from ecosim.collisiongrid.multi_gridx import MultiGrid
+from ecosim.profiling import PHASES, COUNTERS, StepProfile
+
+class TestStepProfile(unittest.TestCase):
+    def test_phases_and_counters(self):
+        profile = StepProfile()
+        profile.start('grow')
+        profile.start('combat')
+        profile.count('queries', 3)
+        profile.count('queries')
+        profile.stop()
+
+        self.assertEqual(profile.counts['queries'], 4)
+        self.assertTrue(profile.seconds['grow'] >= 0)
+        self.assertEqual(profile.seconds['destroy'], 0)
+        self.assertAlmostEqual(profile.total(), sum(profile.seconds.values()))
+
+        row = profile.csv_row(7).split(',')
+        self.assertEqual(len(row), len(profile.csv_header().split(',')))
+        self.assertEqual(row[0], '7')
+        self.assertEqual(int(row[1 + len(PHASES) + COUNTERS.index('queries')]), 4)
+
+        profile.reset()
+        self.assertEqual(profile.counts['queries'], 0)
+        self.assertEqual(profile.total(), 0)
+
+    def test_index_counters(self):
+        world = CollisionGrid(20, 20, 1)
+        world.insertParticle(0, 10.5, 10.5, .4)   # One cell.
+        world.insertParticle(1, 5.0, 5.0, 1.5)    # 4x4 cells.
+        self.assertEqual(world.counters(), (0, 0, 0, 17))
+
+        world.queryCircle(10.5, 10.5, .2)
+        world.updateRadius(0, .6)                 # 3x3 cells.
+        self.assertEqual(world.counters(), (1, 1, 1, 25))
+
+        multi = MultiGrid(20, 20, 1)
+        multi.insertParticle(0, 10.5, 10.5, .4)
+        multi.insertParticle(1, 5.0, 5.0, 1.5)
+        multi.updateRadius(1, 3)
+        queries, cells, candidates, updates = multi.counters()
+        self.assertEqual((queries, updates), (0, 4))
+
+        profile = StepProfile()
+        before = world.counters()
+        world.isEmpty(5.0, 5.0, .1)
+        profile.count_index(before, world.counters())
+        self.assertEqual(profile.counts['queries'], 1)
+        self.assertEqual(profile.counts['grid_updates'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from ecosim.rasters import RasterMap, load_raster
+
+class TestRasterMap(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filepath = os.path.join(self.directory, 'map.npy')
+        np.save(self.filepath, np.arange(12.0).reshape(3, 4))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_lookup(self):
+        raster = RasterMap.open(self.filepath, 40, 30)
+        self.assertIs(raster.raster, load_raster(self.filepath))
+
+        xs = np.random.random_sample(100) * 40
+        ys = np.random.random_sample(100) * 30
+        values = raster.lookup(xs, ys)
+        for x, y, value in zip(xs, ys, values):
+            self.assertEqual(raster[raster.cell(x, y)], value)
+            self.assertEqual(value, int(y // 10) * 4 + int(x // 10))
+
+    def test_pickle(self):
+        raster = RasterMap.open(self.filepath, 40, 30)
+        copy = pickle.loads(pickle.dumps(raster))
+        self.assertIs(copy.raster, raster.raster)
+
+        uniform = pickle.loads(pickle.dumps(RasterMap.uniform(.5, 40, 30)))
+        self.assertEqual(uniform.lookup(np.array([39.0]), np.array([0.0])).tolist(), [.5])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from ecosim.render import FrameArchive, FrameWriter, rasterize, \
+                          read_frame_archive
+
+class TestRender(unittest.TestCase):
+    def test_rasterize(self):
+        image = rasterize(20, 10, [2.0, 15.0], [5.0, 5.0], [1.0, 3.0],
+                          [(255, 0, 0), (0, 0, 255)], flip_y=False)
+        self.assertEqual(image.shape, (10, 20, 3))
+        self.assertEqual(image[5, 2].tolist(), [255, 0, 0])
+        self.assertEqual(image[5, 18].tolist(), [0, 0, 255])
+        self.assertEqual(image[5, 8].tolist(), [255, 255, 255])
+
+        # Disks are symmetric and clipped at the edges.
+        red = (image == [255, 0, 0]).all(axis=2)
+        self.assertEqual(red.sum(), 5)
+        partial = rasterize(4, 4, [0.0], [0.0], [2.0], [(0, 0, 0)], flip_y=False)
+        self.assertEqual((partial == 0).all(axis=2).sum(), 8)
+
+    def test_frame_writer(self):
+        written = []
+        writer = FrameWriter(max_pending=1, save=lambda image, path: \
+                                                 written.append(path))
+        for i in range(5):
+            writer.submit(np.zeros((2, 2, 3), dtype='uint8'), i)
+        writer.close()
+        self.assertEqual(written, list(range(5)))
+
+        def fail(image, path):
+            raise IOError(path)
+
+        writer = FrameWriter(save=fail)
+        writer.submit(None, 'x')
+        self.assertRaises(IOError, writer.close)
+
+    def test_frame_archive(self):
+        directory = tempfile.mkdtemp()
+        try:
+            sink = FrameArchive(directory, frames_per_chunk=2, decimate=2, downscale=2)
+            for step in range(7):
+                sink.write(np.full((4, 6, 3), step, dtype='uint8'), step)
+            sink.close()
+
+            frames = list(read_frame_archive(directory))
+            self.assertEqual([step for step, _ in frames], [0, 2, 4, 6])
+            self.assertEqual(frames[1][1].shape, (2, 3, 3))
+            self.assertTrue((frames[1][1] == 2).all())
+        finally:
+            shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    unittest.main()
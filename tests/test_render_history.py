@@ -0,0 +1,46 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+import numpy as np
+from ecosim.main import main
+from ecosim.render import read_frame_archive
+from test_simulation import small_config
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class TestRenderHistory(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def render(self, archive_path, frames_dir, processes):
+        subprocess.check_call([sys.executable, os.path.join('bin', 'render_history.py'),
+                               archive_path, frames_dir, '--scale', '1', '--every', '4',
+                               '--archive', '--processes', str(processes)], cwd=ROOT)
+        return list(read_frame_archive(frames_dir))
+
+    def test_render(self):
+        # Full stores float16 positions and delta quantized ones, so each is
+        # checked against itself rendered in a single process.
+        for history in ('full', 'delta'):
+            out_dir = os.path.join(self.dir, history)
+            main(small_config(), 20, out_dir, -1, -1, 1.0, -1, history=history)
+            archive_path = os.path.join(out_dir, 'archive_final')
+
+            frames = self.render(archive_path, os.path.join(out_dir, 'frames'), 2)
+            single = self.render(archive_path, os.path.join(out_dir, 'single'), 1)
+
+            self.assertEqual([step for step, _ in frames], [0, 4, 8, 12, 16])
+            self.assertEqual([step for step, _ in single], [0, 4, 8, 12, 16])
+            for (_, a), (_, b) in zip(frames, single):
+                self.assertEqual(a.shape, (100, 100, 3))
+                self.assertTrue((a != 255).any())
+                self.assertTrue(np.array_equal(a, b))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,24 @@
+import unittest
+import numpy as np
+from ecosim.rng import RandomStream, RandomStreams
+
+class TestRandomStream(unittest.TestCase):
+    def test_array_draws_match_scalar_draws(self):
+        scalar = RandomStream(np.random.default_rng(1), buffer_size=16)
+        batch = RandomStream(np.random.default_rng(1), buffer_size=16)
+        expected = [scalar.random() for _ in range(100)]
+        drawn = [batch.random()]
+        for n in (3, 20, 0, 40, 5):
+            drawn.extend(batch.random(n).tolist())
+        drawn.extend(batch.random() for _ in range(31))
+        self.assertEqual(drawn, expected)
+
+    def test_streams_are_seeded(self):
+        a, b = RandomStreams(7), RandomStreams(7)
+        self.assertEqual(a.seed, 7)
+        self.assertEqual(a.combat.random(5).tolist(), b.combat.random(5).tolist())
+        self.assertNotEqual(a.death.random(), a.seeding.random())
+        self.assertIsNotNone(RandomStreams().seed)
+
+if __name__ == '__main__':
+    unittest.main()
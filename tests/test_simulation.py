@@ -0,0 +1,144 @@
+import os
+import shutil
+import tempfile
+import unittest
+from collections import Counter
+import numpy as np
+from ecosim.checkpoint import load_checkpoint, save_checkpoint
+from ecosim.history import History
+from ecosim.population import Population
+from ecosim.simulation import Simulation
+
+def small_config(**options):
+    """ Config of a 100x100 world without start or bias map.
+    """
+    config = {'width': 100, 'height': 100, 'n_start': 100, 'p_death': .0078125,
+              'n_randseed': 4, 'bias_map': '', 'p_disturbance': 0.0,
+              'disturbance_power': 0, 'seed_cost_multiplier': 40,
+              'growth_cost_multiplier': 20, 'n_attributes': 5,
+              'seed_size_range': (1.0, 3.0), 'population': 'objects', 'seed': 1}
+    config.update(options)
+    return config
+
+def run(config, steps=100, sim=None, log=None):
+    """ Step a new (or the given) simulation, logging every step to a
+        History. Returns both.
+    """
+    sim = Simulation(config) if sim is None else sim
+    log = History() if log is None else log
+    for _ in range(steps):
+        sim.step()
+        log.addGeneration(sim)
+    return sim, log
+
+def state(sim):
+    return sorted((ind.id, ind.genome.id, ind.x, ind.y, ind.radius, ind.energy)
+                  for ind in sim.individuals.values())
+
+def population_arrays(sim):
+    """ The live rows of every Population column, in id order.
+    """
+    pop = sim.population
+    slots = pop.live_slots()
+    return dict((name, getattr(pop, name)[slots]) for name in Population._fields)
+
+class TestSimulation(unittest.TestCase):
+    def assertSamePopulation(self, a, b):
+        a, b = population_arrays(a), population_arrays(b)
+        for name in a:
+            self.assertTrue(np.array_equal(a[name], b[name]), name)
+
+    def assertSameHistory(self, a, b):
+        self.assertEqual(a.data, b.data)
+        self.assertEqual(sorted(a.genomes), sorted(b.genomes))
+
+    def test_backends(self):
+        for step_order in ('interleaved', 'batched'):
+            objects, objects_log = run(small_config(step_order=step_order))
+            arrays, arrays_log = run(small_config(step_order=step_order, \
+                                                  population='arrays'))
+            self.assertGreater(len(objects.individuals), 100)
+            self.assertEqual(state(objects), state(arrays))
+            self.assertSameHistory(objects_log, arrays_log)
+
+    def test_genome_totals(self):
+        for config in (small_config(), small_config(population='arrays')):
+            sim = Simulation(config)
+            log = History()
+
+            for _ in range(300):
+                sim.step()
+                log.addGeneration(sim)
+
+                # What History logged before the running totals.
+                area, count = Counter(), Counter()
+                for ind in sim.individuals.values():
+                    area[ind.genome.id] += ind.area()
+                    count[ind.genome.id] += 1
+                self.assertEqual(log.data[-1], [(id, n, area[id]/n) for id, n in count.items()])
+
+                # The running totals agree with the fresh count.
+                ids, counts, areas = sim.genomeTotals()
+                self.assertEqual(sorted(ids.tolist()), sim.liveGenomes().tolist())
+                self.assertEqual(sim.genome_count[ids].tolist(), counts.tolist())
+                self.assertTrue(np.allclose(sim.genome_area[ids], areas, rtol=1e-9, atol=0))
+
+    def test_collision_index(self):
+        for config in (small_config(), small_config(population='arrays'), \
+                       small_config(step_order='batched')):
+            grid, grid_log = run(config)
+            config['collision_index'] = 'multigrid'
+            multigrid, multigrid_log = run(config)
+            self.assertEqual(state(grid), state(multigrid))
+            self.assertSameHistory(grid_log, multigrid_log)
+
+    def test_tiled_combat(self):
+        sim, log = run(small_config(population='arrays', step_order='batched', \
+                                    n_workers=1, tile_size=100))
+        self.assertTrue(sim.isValid())
+
+        for n_workers, tile_size in ((2, 50), (4, 25), (3, 30)):
+            other, other_log = run(small_config(population='arrays', \
+                                   step_order='batched', n_workers=n_workers, \
+                                   tile_size=tile_size))
+            self.assertSamePopulation(sim, other)
+            self.assertSameHistory(log, other_log)
+
+    def test_resume(self):
+        directory = tempfile.mkdtemp()
+        try:
+            for config in (small_config(), small_config(population='arrays'), \
+                           small_config(population='arrays', step_order='batched', \
+                                        n_workers=2)):
+                sim, log = run(config)
+
+                checkpoint_path = os.path.join(directory, 'checkpoint.pkl')
+                save_checkpoint(checkpoint_path, *run(config, 60), step=60)
+                checkpoint = load_checkpoint(checkpoint_path)
+                self.assertEqual(checkpoint['step'], 60)
+                resumed, resumed_log = run(config, 40, checkpoint['sim'], checkpoint['log'])
+
+                self.assertEqual(state(sim), state(resumed))
+                self.assertSameHistory(log, resumed_log)
+                if sim.population is not None:
+                    self.assertSamePopulation(sim, resumed)
+        finally:
+            shutil.rmtree(directory)
+
+    def test_step_order(self):
+        sim, _ = run(small_config())
+        self.assertEqual(sim.step_order, 'interleaved')
+        self.assertTrue(sim.isValid())
+        self.assertEqual(state(sim), state(run(small_config())[0]))
+
+        # Batched growth is a different model.
+        batched, _ = run(small_config(step_order='batched'))
+        self.assertTrue(batched.isValid())
+        self.assertNotEqual(state(sim), state(batched))
+
+        self.assertRaises(ValueError, Simulation, small_config(step_order='other'))
+        self.assertRaises(ValueError, Simulation, \
+                          small_config(population='arrays', n_workers=2))
+
+if __name__ == '__main__':
+    unittest.main()
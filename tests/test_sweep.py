@@ -0,0 +1,62 @@
+import os
+import shutil
+import tempfile
+import unittest
+from ecosim.sweep import expand_grid, parse_param, run_dir, sweep
+from test_simulation import small_config
+
+class TestSweep(unittest.TestCase):
+    def test_parse_param(self):
+        config = small_config(n_workers=0)
+        self.assertEqual(parse_param(config, 'p_death=.1,1'), ('p_death', [.1, 1.0]))
+        self.assertEqual(parse_param(config, 'population=objects,arrays'),
+                         ('population', ['objects', 'arrays']))
+        self.assertEqual(parse_param(config, 'seed_size_range=(1, 2),(2.5, 3)'),
+                         ('seed_size_range', [(1, 2), (2.5, 3)]))
+        self.assertEqual(parse_param(config, 'seed=None,4'), ('seed', [None, 4]))
+        self.assertRaises(KeyError, parse_param, config, 'nothing=1')
+        self.assertRaises(ValueError, parse_param, config, 'n_workers=two')
+
+    def test_seeds(self):
+        config = small_config()
+        runs = expand_grid(config, [('p_death', [.1, .2])], 2, seed=7)
+        seeds = dict(((name, replicate), seed) for name, replicate, seed, _ in runs)
+        self.assertEqual(seeds, {('p_death=0.1', 0): 7, ('p_death=0.1', 1): 8,
+                                 ('p_death=0.2', 0): 7, ('p_death=0.2', 1): 8})
+
+        # Adding grid values keeps the seeds of the existing runs.
+        more = expand_grid(config, [('p_death', [.05, .1, .2])], 2, seed=7)
+        for name, replicate, seed, _ in more:
+            self.assertEqual(seeds.get((name, replicate), seed), seed)
+
+        self.assertRaises(ValueError, expand_grid, config, [('seed', [1, 2])], 1)
+
+    def test_skips_finished(self):
+        out_dir = tempfile.mkdtemp()
+        try:
+            config = small_config()
+            rows = sweep(config, [('p_death', [.01])], 20, out_dir, processes=1)
+            self.assertEqual([row['status'] for row in rows], ['done'])
+            summary = os.path.join(run_dir(out_dir, 'p_death=0.01', 0), 'summary.json')
+            with open(summary) as fsummary:
+                finished = fsummary.read()
+            os.utime(summary, (0, 0))
+
+            rows = sweep(config, [('p_death', [.01, .02])], 20, out_dir, processes=1)
+            self.assertEqual([row['status'] for row in rows], ['done', 'done'])
+            self.assertEqual(os.path.getmtime(summary), 0)
+            with open(summary) as fsummary:
+                self.assertEqual(fsummary.read(), finished)
+            self.assertTrue(os.path.exists(os.path.join(
+                run_dir(out_dir, 'p_death=0.02', 0), 'summary.json')))
+            with open(os.path.join(out_dir, 'summary.csv')) as fcsv:
+                self.assertEqual(len(fcsv.readlines()), 3)
+
+            # A new base seed reruns it.
+            sweep(config, [('p_death', [.01])], 20, out_dir, seed=5, processes=1)
+            self.assertNotEqual(os.path.getmtime(summary), 0)
+        finally:
+            shutil.rmtree(out_dir)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,9 +2,10 @@ from math import sqrt
 import time
 import random
 # import aabb
-from ecosim.collisiongrid import collision_gridx, collision_grid
+from ecosim.collisiongrid import collision_gridx, collision_grid, multi_gridx
 
 worldx = collision_gridx.CollisionGrid(20, 20, 1)
+worldm = multi_gridx.MultiGrid(20, 20, 1)
 world = collision_grid.CollisionGrid(20, 20, 1)
 
 def overlaps(x1, y1, r1, x2, y2, r2):
@@ -66,9 +67,39 @@ def time_world(world):
 	print(len(collisions), time.time() - start)
 	assert(collisions == collisions_brute(points))
 
+def time_mixed_sizes(world, n=20000):
+	""" Seed sized particles with a long tail of large ones, as in a mature
+		800x800 simulation, growing and being queried each round.
+	"""
+	random.seed(123)
+	points = dict()
+	start = time.time()
+
+	for idx in range(n):
+		x = random.random() * 800
+		y = random.random() * 800
+		r = min(100, 0.6 * random.paretovariate(1.2))
+		world.insertParticle(idx, x, y, r)
+		points[idx] = (x, y, r)
+
+	for _ in range(10):
+		for id, (x, y, r) in points.items():
+			r *= 1.05
+			world.updateRadius(id, r)
+			points[id] = (x, y, r)
+
+		for id, (x, y, r) in points.items():
+			world.queryCircle(x, y, r)
+
+	print('mixed sizes', n, time.time() - start)
+
 time_world(worldx)
+time_world(worldm)
 time_world(world)
 
+time_mixed_sizes(collision_gridx.CollisionGrid(800, 800, 2))
+time_mixed_sizes(multi_gridx.MultiGrid(800, 800, 2))
+
 # for _ in range(100):
 # 	w = random.random() * 2
 # 	x = random.random() * 18